@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 压测脚本
+在临时数据库上启动 API 服务，注册一批用户并导入交易，随后由多个并发客户端按比例
+请求交易列表、翻页、月度统计、预算和新增交易，统计各接口的 p50/p99 延迟和每秒请求数
+
+用法: python api_benchmark.py [--users 20] [--clients 8] [--seconds 10] [--transactions 2000]
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from api_server import ApiServer
+from database import db_manager
+from transaction import Transaction
+
+
+# 请求组合：(名称, 权重)
+REQUEST_MIX = [
+    ('交易列表', 40),
+    ('交易翻页', 15),
+    ('月度统计', 25),
+    ('预算', 10),
+    ('新增交易', 10),
+]
+
+
+def percentile(values, percent):
+    """最近秩法计算百分位数
+
+    Args:
+        values: 已排序的数值列表
+        percent: 百分位，如 50、99
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+class ApiClient:
+    """保持长连接的简单 JSON 客户端，每个压测线程一个"""
+
+    def __init__(self, host, port, token=None):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.token = token
+
+    def request(self, method, path, body=None):
+        """发送请求
+
+        Returns:
+            tuple: (状态码, 响应JSON)
+        """
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        self.connection.request(method, path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read() or b'{}')
+
+    def close(self):
+        self.connection.close()
+
+
+def _seed_user(host, port, index, transactions):
+    """注册并登录一个用户，导入历史交易
+
+    Returns:
+        str: 登录令牌
+    """
+    client = ApiClient(host, port)
+    username = f"bench_{index}"
+    client.request('POST', '/api/register', {'username': username, 'password': 'pw', 'monthly_budget': 3000})
+    status, body = client.request('POST', '/api/login', {'username': username, 'password': 'pw'})
+    client.close()
+    if status != 200:
+        raise RuntimeError(f"登录失败: {body}")
+
+    start = datetime.now() - timedelta(days=365)
+    Transaction.bulk_add({
+        'amount': 5 + i % 300,
+        'type': '收入' if i % 12 == 0 else '支出',
+        'category_id': 'cat_9' if i % 12 == 0 else f"cat_{i % 8 + 1}",
+        'date': (start + timedelta(minutes=i * 365 * 24 * 60 // max(transactions, 1))).strftime('%Y-%m-%d %H:%M:%S'),
+        'note': f"历史 {i}",
+        'user_id': body['user_id'],
+    } for i in range(transactions))
+    return body['token']
+
+
+def _worker(host, port, tokens, deadline, results, errors, seed):
+    """压测线程：按 REQUEST_MIX 随机发送请求直到截止时间"""
+    rng = random.Random(seed)
+    names = [name for name, _ in REQUEST_MIX]
+    weights = [weight for _, weight in REQUEST_MIX]
+    month = datetime.now().strftime('%Y-%m')
+    clients = {}
+    latencies = defaultdict(list)
+    failed = defaultdict(int)
+
+    try:
+        while time.perf_counter() < deadline:
+            token = rng.choice(tokens)
+            client = clients.get(token)
+            if client is None:
+                client = clients[token] = ApiClient(host, port, token)
+            name = rng.choices(names, weights)[0]
+
+            started = time.perf_counter()
+            if name == '交易列表':
+                status, _ = client.request('GET', '/api/transactions?limit=50')
+            elif name == '交易翻页':
+                status, body = client.request('GET', '/api/transactions?limit=50')
+                if status == 200 and body['next_cursor']:
+                    status, _ = client.request('GET', f"/api/transactions?limit=50&cursor={body['next_cursor']}")
+            elif name == '月度统计':
+                status, _ = client.request('GET', f"/api/stats/monthly?period={month}")
+            elif name == '预算':
+                status, _ = client.request('GET', f"/api/budgets/{month}")
+            else:
+                status, _ = client.request('POST', '/api/transactions', {
+                    'amount': rng.randint(1, 200), 'type': '支出', 'category_id': 'cat_1', 'note': '压测'})
+            elapsed = time.perf_counter() - started
+
+            if status < 400:
+                latencies[name].append(elapsed)
+            else:
+                failed[name] += 1
+    finally:
+        for client in clients.values():
+            client.close()
+        results.append(latencies)
+        errors.append(failed)
+
+
+def run(users, clients, seconds, transactions, verbose=False):
+    """启动服务、准备数据并压测
+
+    Returns:
+        dict: 名称 -> (请求数, 失败数, 每秒请求数, p50毫秒, p99毫秒)，'合计' 为全部请求
+    """
+    server = ApiServer(('127.0.0.1', 0), verbose=verbose)
+    host, port = server.server_address
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        print(f"准备 {users} 个用户，每人 {transactions} 条交易...")
+        tokens = [_seed_user(host, port, i, transactions) for i in range(users)]
+
+        print(f"{clients} 个并发客户端压测 {seconds} 秒...")
+        results, errors = [], []
+        deadline = time.perf_counter() + seconds
+        workers = [threading.Thread(target=_worker, args=(host, port, tokens, deadline, results, errors, i))
+                   for i in range(clients)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    merged = defaultdict(list)
+    failed = defaultdict(int)
+    for latencies in results:
+        for name, values in latencies.items():
+            merged[name].extend(values)
+            merged['合计'].extend(values)
+    for counts in errors:
+        for name, count in counts.items():
+            failed[name] += count
+            failed['合计'] += count
+
+    report = {}
+    for name in [name for name, _ in REQUEST_MIX] + ['合计']:
+        values = sorted(merged[name])
+        report[name] = (len(values), failed[name], len(values) / elapsed,
+                        percentile(values, 50) * 1000, percentile(values, 99) * 1000)
+    return report
+
+
+def main():
+    """解析参数，运行压测并打印结果"""
+    parser = argparse.ArgumentParser(description="记账软件 API 压测")
+    parser.add_argument('--users', type=int, default=20, help="用户数")
+    parser.add_argument('--clients', type=int, default=8, help="并发客户端数")
+    parser.add_argument('--seconds', type=float, default=10, help="压测时长（秒）")
+    parser.add_argument('--transactions', type=int, default=2000, help="每个用户导入的历史交易数")
+    parser.add_argument('--db', help="数据库文件路径，默认在临时目录中新建")
+    parser.add_argument('--verbose', action='store_true', help="输出访问日志")
+    args = parser.parse_args()
+
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            db_manager.db_path = args.db or os.path.join(directory, 'api_benchmark.db')
+            db_manager.init_database()
+            report = run(args.users, args.clients, args.seconds, args.transactions, args.verbose)
+        finally:
+            db_manager.close()
+            db_manager.db_path = original_path
+
+    print(f"\n{'接口':<10}{'请求数':>8}{'失败':>6}{'请求/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for name, (count, failed, rate, p50, p99) in report.items():
+        print(f"{name:<10}{count:>8}{failed:>6}{rate:>10.1f}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+REST API 服务模块
+不启动图形界面，以 HTTP/JSON 接口多用户共享同一套业务逻辑（User、Transaction、Budget、Category、Statistics）。
+
+基于标准库 ThreadingHTTPServer，每个请求一个线程，数据库访问复用 db_manager 的连接池。
+登录后获得令牌，之后的请求以 Authorization: Bearer <令牌> 标识用户，
+所有数据都只在该用户范围内读写。
+
+用法: python api_server.py [--host 127.0.0.1] [--port 8000] [--db finance_app.db]
+"""
+import argparse
+import base64
+import json
+import re
+import secrets
+import socket
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from budget import Budget
+from category import Category
+from database import db_manager
+from finance_stats import Statistics
+from money import parse_money
+from period import period_range
+from transaction import Transaction, parse_date
+from user import User
+
+
+# 列表接口默认和最大的每页条数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 登录令牌有效期（秒）
+SESSION_TTL = 12 * 60 * 60
+
+# 请求体大小上限（字节）
+MAX_BODY_SIZE = 1024 * 1024
+
+# 各统计类型的周期格式：日'YYYY-MM-DD'、月'YYYY-MM'、年'YYYY'
+PERIOD_FORMATS = {'daily': 'YYYY-MM-DD', 'monthly': 'YYYY-MM', 'yearly': 'YYYY'}
+
+
+class ApiError(Exception):
+    """接口错误，转换为对应状态码的JSON响应"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SessionStore:
+    """登录令牌存储，令牌 -> (用户ID, 过期时间)"""
+
+    def __init__(self, ttl=SESSION_TTL):
+        """初始化令牌存储
+
+        Args:
+            ttl: 令牌有效期（秒）
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def create(self, user_id):
+        """为用户创建新令牌
+
+        Returns:
+            str: 令牌
+        """
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = (user_id, time.monotonic() + self.ttl)
+        return token
+
+    def resolve(self, token):
+        """查找令牌对应的用户
+
+        Returns:
+            str: 用户ID，令牌无效或已过期时返回None
+        """
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session[1] < time.monotonic():
+                del self._sessions[token]
+                return None
+            return session[0]
+
+    def revoke(self, token):
+        """注销令牌"""
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+def _json_default(value):
+    """JSON 序列化金额等非标准类型"""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def _encode_cursor(record):
+    """把一页最后一条交易编码为下一页的游标"""
+    raw = json.dumps([record.date, record.transaction_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """解析游标
+
+    Returns:
+        tuple: (after_date, after_id)
+    """
+    try:
+        after_date, after_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(after_date), str(after_id)
+    except (ValueError, TypeError):
+        raise ApiError(400, "无效的分页游标")
+
+
+def _transaction_item(record):
+    """交易记录转换为响应字典"""
+    return {
+        'id': record.transaction_id,
+        'date': record.date,
+        'amount': record.amount,
+        'type': record.type,
+        'category_id': record.category_id,
+        'category': record.category_name,
+        'icon': record.category_icon,
+        'note': record.note,
+    }
+
+
+def _category_item(category):
+    """分类记录转换为响应字典"""
+    return {'id': category.category_id, 'name': category.name, 'type': category.type,
+            'icon': category.icon, 'is_custom': bool(category.is_custom)}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """API 请求处理
+
+    ROUTES 中的每一项为 (方法, 路径正则, 处理方法名, 是否需要登录)，
+    路径中的命名分组作为关键字参数传给处理方法。
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FinanceAPI/1.0'
+
+    ROUTES = [
+        ('POST', r'/api/register', 'register', False),
+        ('POST', r'/api/login', 'login', False),
+        ('POST', r'/api/logout', 'logout', True),
+        ('GET', r'/api/transactions', 'list_transactions', True),
+        ('POST', r'/api/transactions', 'add_transaction', True),
+        ('DELETE', r'/api/transactions/(?P<transaction_id>[^/]+)', 'delete_transaction', True),
+        ('GET', r'/api/categories', 'list_categories', True),
+        ('GET', r'/api/stats/(?P<kind>daily|monthly|yearly)', 'stats', True),
+        ('GET', r'/api/budgets', 'list_budgets', True),
+        ('GET', r'/api/budgets/(?P<month>\d{4}-\d{2})', 'get_budget', True),
+    ]
+
+    def setup(self):
+        """关闭 Nagle 算法，避免长连接上响应头和响应体分两次发送时被延迟确认拖慢约40毫秒"""
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        """只在服务设置 verbose 时输出访问日志"""
+        if getattr(self.server, 'verbose', False):
+            super().log_message(format, *args)
+
+    # -------------------- 请求分发 --------------------
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        """按路由表调用处理方法，统一生成JSON响应"""
+        url = urlparse(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.user_id = None
+        try:
+            # 先读完请求体，出错提前返回时也不会影响同一连接上的下一个请求
+            self.body = self._read_body()
+            path_found = False
+            for route_method, pattern, name, auth in self.ROUTES:
+                match = re.fullmatch(pattern, url.path)
+                if not match:
+                    continue
+                path_found = True
+                if route_method != method:
+                    continue
+                if auth:
+                    self.user_id = self._authenticate()
+                status, body = getattr(self, name)(**match.groupdict())
+                break
+            else:
+                raise ApiError(405 if path_found else 404, "不支持的请求方法" if path_found else "接口不存在")
+        except ApiError as e:
+            status, body = e.status, {'error': e.message}
+        except Exception as e:
+            print(f"处理请求失败: {method} {self.path}: {e}")
+            status, body = 500, {'error': "服务器内部错误"}
+        self._send(status, body)
+
+    def _authenticate(self):
+        """从 Authorization 头解析当前用户
+
+        Returns:
+            str: 用户ID
+        """
+        header = self.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else None
+        user_id = self.server.sessions.resolve(token) if token else None
+        if user_id is None:
+            raise ApiError(401, "未登录或登录已过期")
+        self.token = token
+        return user_id
+
+    def _read_body(self):
+        """读取原始请求体"""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_SIZE:
+            self.body = b''
+            self.close_connection = True
+            raise ApiError(413, "请求体过大")
+        return self.rfile.read(length) if length else b''
+
+    def _read_json(self):
+        """解析JSON请求体
+
+        Returns:
+            dict: 请求参数
+        """
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            raise ApiError(400, "请求体不是有效的JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "请求体必须是JSON对象")
+        return data
+
+    def _send(self, status, body):
+        """发送JSON响应"""
+        payload = json.dumps(body, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _page_size(self):
+        """解析 limit 参数"""
+        try:
+            limit = int(self.query.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, "limit 必须是整数")
+        return max(1, min(limit, MAX_PAGE_SIZE))
+
+    # -------------------- 用户 --------------------
+
+    def register(self):
+        data = self._read_json()
+        username, password = data.get('username'), data.get('password')
+        if not username or not password:
+            raise ApiError(400, "用户名和密码不能为空")
+        try:
+            monthly_budget = parse_money(data.get('monthly_budget', 0))
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+        user = User(username=username, password=password, monthly_budget=monthly_budget)
+        if not user.register():
+            raise ApiError(409, "用户名已存在")
+        return 201, {'user_id': user.user_id}
+
+    def login(self):
+        data = self._read_json()
+        user = User(username=data.get('username'), password=data.get('password') or '')
+        if not user.username or not user.login():
+            raise ApiError(401, "用户名或密码错误")
+        return 200, {'token': self.server.sessions.create(user.user_id), 'user_id': user.user_id}
+
+    def logout(self):
+        self.server.sessions.revoke(self.token)
+        return 200, {}
+
+    # -------------------- 交易 --------------------
+
+    def list_transactions(self):
+        """游标分页列出交易，响应中的 next_cursor 传回 cursor 参数获取下一页"""
+        limit = self._page_size()
+        after_date = after_id = None
+        if self.query.get('cursor'):
+            after_date, after_id = _decode_cursor(self.query['cursor'])
+
+        # 多取一条判断是否还有下一页
+        records = Transaction.get_transactions_with_category(
+            self.user_id,
+            start_date=self.query.get('start_date'),
+            end_date=self.query.get('end_date'),
+            transaction_type=self.query.get('type'),
+            category_id=self.query.get('category_id'),
+            limit=limit + 1,
+            after_date=after_date,
+            after_id=after_id,
+        )
+        has_more = len(records) > limit
+        records = records[:limit]
+        return 200, {
+            'items': [_transaction_item(record) for record in records],
+            'next_cursor': _encode_cursor(records[-1]) if has_more else None,
+        }
+
+    def add_transaction(self):
+        data = self._read_json()
+        if data.get('type') not in ('收入', '支出'):
+            raise ApiError(400, "type 必须是 收入 或 支出")
+        try:
+            amount = parse_money(data.get('amount'))
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        if amount <= 0:
+            raise ApiError(400, "金额必须大于0")
+        category = Category.get_category_by_id(data.get('category_id'))
+        if category is None or (category.user_id and category.user_id != self.user_id):
+            raise ApiError(400, "分类不存在")
+        date = data.get('date')
+        if date is not None:
+            date = parse_date(date)
+            if date is None:
+                raise ApiError(400, "日期格式无效")
+
+        transaction = Transaction(amount=amount, type=data['type'], category_id=category.category_id,
+                                  date=date, note=data.get('note', ''), user_id=self.user_id)
+        if not transaction.add_transaction():
+            raise ApiError(500, "添加交易记录失败")
+        return 201, {'id': transaction.transaction_id, 'date': transaction.date}
+
+    def delete_transaction(self, transaction_id):
+        transaction = Transaction.get_transaction_by_id(transaction_id)
+        if transaction is None or transaction.user_id != self.user_id:
+            raise ApiError(404, "交易记录不存在")
+        if not transaction.delete_transaction():
+            raise ApiError(500, "删除交易记录失败")
+        return 200, {}
+
+    # -------------------- 分类、统计、预算 --------------------
+
+    def list_categories(self):
+        categories = Category.get_all_categories(self.user_id, self.query.get('type'))
+        return 200, {'items': [_category_item(category) for category in categories]}
+
+    def stats(self, kind):
+        statistics = Statistics(self.user_id)
+        period = self.query.get('period')
+        if period is not None:
+            try:
+                if len(period) != len(PERIOD_FORMATS[kind]):
+                    raise ValueError(period)
+                period_range(period)
+            except ValueError:
+                raise ApiError(400, f"无效的统计周期，格式应为 {PERIOD_FORMATS[kind]}")
+        if kind == 'daily':
+            result = statistics.calculate_daily_stats(period)
+        elif kind == 'monthly':
+            result = statistics.calculate_monthly_stats(period)
+        else:
+            result = statistics.calculate_yearly_stats(period)
+        if result is None:
+            raise ApiError(400, "无效的统计周期")
+        return 200, result
+
+    def list_budgets(self):
+        budgets = Budget.get_all_budgets(self.user_id)
+        return 200, {'items': [{'month': budget.month, 'amount': budget.amount, 'spent': budget.spent,
+                                'remaining': budget.get_remaining()} for budget in budgets]}
+
+    def get_budget(self, month):
+        budget = Budget(user_id=self.user_id, month=month)
+        return 200, {'month': month, 'amount': budget.amount, 'spent': budget.spent,
+                     'remaining': budget.get_remaining()}
+
+
+class ApiServer(ThreadingHTTPServer):
+    """多线程 API 服务，各请求线程共享令牌存储和数据库连接池"""
+
+    daemon_threads = True
+
+    def __init__(self, address, verbose=False):
+        """初始化服务
+
+        Args:
+            address: (主机, 端口)，端口为0时由系统分配
+            verbose: 是否输出访问日志
+        """
+        super().__init__(address, ApiHandler)
+        self.sessions = SessionStore()
+        self.verbose = verbose
+
+
+def main():
+    """启动API服务"""
+    parser = argparse.ArgumentParser(description="记账软件 REST API 服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--db', help="数据库文件路径，默认使用 finance_app.db")
+    parser.add_argument('--verbose', action='store_true', help="输出访问日志")
+    args = parser.parse_args()
+
+    if args.db:
+        db_manager.db_path = args.db
+    db_manager.init_database()
+
+    server = ApiServer((args.host, args.port), verbose=args.verbose)
+    print(f"API 服务已启动: http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
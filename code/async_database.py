@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步数据库模块
+为基于 asyncio 的服务提供不阻塞事件循环的数据库访问。
+
+SQLite 调用在有界线程池中执行：只读查询使用与只读连接池同样大小的线程池，
+写操作和工作单元在唯一的写线程上执行，与 DatabaseManager 的单一写连接对应。
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itertools import islice
+
+from budget import Budget
+from database import db_manager
+from finance_stats import Statistics
+from transaction import Transaction
+
+
+class AsyncTransaction:
+    """异步工作单元，范围内的操作都在写线程上执行并加入同一个数据库事务"""
+
+    def __init__(self, database):
+        """初始化工作单元，通过 AsyncDatabaseManager.transaction 创建"""
+        self._database = database
+
+    async def execute(self, query, params=()):
+        """执行写语句，退出工作单元时统一提交"""
+        manager = self._database.manager
+        await self._database._run_writer(manager.execute_query, query, params, commit=True)
+
+    async def fetch(self, query, params=(), row_factory=None):
+        """执行查询，能读到本工作单元尚未提交的修改
+
+        Returns:
+            list: 查询结果
+        """
+        manager = self._database.manager
+        return await self._database._run_writer(manager.execute_query, query, params,
+                                                row_factory=row_factory)
+
+    async def run(self, func, *args, **kwargs):
+        """在工作单元中调用同步的业务方法，如 Budget(...).update_spent
+
+        Returns:
+            func 的返回值
+        """
+        return await self._database._run_writer(func, *args, **kwargs)
+
+
+class AsyncDatabaseManager:
+    """异步数据库管理器，包装 DatabaseManager 的同步接口
+
+    业务接口调用的 Transaction、Statistics、Budget 使用全局 db_manager。
+    一个实例只服务于一个事件循环：写锁在首次使用时绑定到当前循环，
+    多个循环共用唯一的写线程时无法互相排队。
+    """
+
+    def __init__(self, manager=None, max_workers=None):
+        """初始化线程池
+
+        Args:
+            manager: 同步的 DatabaseManager，默认使用全局 db_manager
+            max_workers: 只读查询的线程数，默认等于只读连接池大小，
+                更多的并发请求在线程池队列中等待，不会额外占用连接
+        """
+        self.manager = manager or db_manager
+        self.max_workers = max_workers or self.manager.pool_size
+        self._reader = ThreadPoolExecutor(self.max_workers, thread_name_prefix='db-read')
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='db-write')
+        self._write_lock = None
+        self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """关闭线程池，等待已提交的数据库操作完成"""
+        self._reader.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+
+    def _lock(self):
+        """写锁：工作单元在写线程上独占，避免其他写操作并入它的事务
+
+        Raises:
+            RuntimeError: 在创建写锁以外的事件循环中使用
+        """
+        loop = asyncio.get_running_loop()
+        if self._write_lock is None:
+            self._write_lock, self._loop = asyncio.Lock(), loop
+        elif self._loop is not loop:
+            raise RuntimeError("AsyncDatabaseManager 只能在一个事件循环中使用")
+        return self._write_lock
+
+    async def _run(self, executor, func, *args, **kwargs):
+        """在指定线程池中执行同步函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def _run_reader(self, func, *args, **kwargs):
+        """在只读线程池中执行同步函数"""
+        return await self._run(self._reader, func, *args, **kwargs)
+
+    async def _run_writer(self, func, *args, **kwargs):
+        """在写线程上执行同步函数，调用方需持有写锁"""
+        return await self._run(self._writer, func, *args, **kwargs)
+
+    async def write(self, func, *args, **kwargs):
+        """在写线程上以一个工作单元执行同步函数
+
+        Returns:
+            func 的返回值
+        """
+        async with self.transaction() as tx:
+            return await tx.run(func, *args, **kwargs)
+
+    async def execute(self, query, params=()):
+        """执行写语句并提交"""
+        async with self._lock():
+            await self._run_writer(self.manager.execute_query, query, params, commit=True)
+
+    async def fetch(self, query, params=(), row_factory=None):
+        """执行只读查询
+
+        Returns:
+            list: 查询结果
+        """
+        return await self._run_reader(self.manager.execute_query, query, params,
+                                      row_factory=row_factory)
+
+    async def fetch_iter(self, query, params=(), batch_size=500, row_factory=None):
+        """流式读取查询结果
+
+        每次在线程池中取一批，迭代期间占用一个只读连接，迭代结束或关闭时归还。
+        读取的是已提交的数据，工作单元内请使用 AsyncTransaction.fetch。
+
+        Yields:
+            tuple: 每行结果
+        """
+        rows = self.manager.iter_query(query, params, batch_size=batch_size, row_factory=row_factory)
+        try:
+            while True:
+                batch = await self._run_reader(lambda: list(islice(rows, batch_size)))
+                if not batch:
+                    break
+                for row in batch:
+                    yield row
+        finally:
+            await self._run_reader(rows.close)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """异步工作单元：范围内的操作都在写线程上执行，退出时只提交一次，出现异常则整体回滚
+
+        取消不会中断写线程上已经开始的操作：开始事务时被取消，回滚排在 BEGIN 之后执行；
+        退出时被取消，提交或回滚仍会在写线程上完成。写线程只有一个，按提交顺序执行，
+        之后的写操作不会并入未结束的事务。
+
+        Yields:
+            AsyncTransaction: 工作单元
+        """
+        async with self._lock():
+            scope = self.manager.transaction()
+            try:
+                await self._run_writer(scope.__enter__)
+            except asyncio.CancelledError as e:
+                self._writer.submit(scope.__exit__, type(e), e, e.__traceback__)
+                raise
+            try:
+                yield AsyncTransaction(self)
+            except BaseException as e:
+                await self._exit(scope, type(e), e, e.__traceback__)
+                raise
+            await self._exit(scope, None, None, None)
+
+    async def _exit(self, scope, *exc_info):
+        """在写线程上结束工作单元，调用方被取消时仍会执行完"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._writer, scope.__exit__, *exc_info)
+        await asyncio.shield(future)
+
+    # -------------------- 业务接口 --------------------
+
+    async def get_transactions_by_user(self, user_id, **filters):
+        """异步获取用户的交易记录，参数同 Transaction.get_transactions_by_user
+
+        Returns:
+            list: TransactionRecord 列表
+        """
+        return await self._run_reader(Transaction.get_transactions_by_user, user_id, **filters)
+
+    async def calculate_monthly_stats(self, user_id, month=None):
+        """异步计算月统计数据，参见 Statistics.calculate_monthly_stats
+
+        Returns:
+            dict: 统计结果
+        """
+        return await self._run_reader(Statistics(user_id).calculate_monthly_stats, month)
+
+    async def update_spent(self, user_id, month):
+        """异步重新汇总预算已花费金额，参见 Budget.update_spent
+
+        Returns:
+            bool: 更新是否成功
+        """
+        # 构造 Budget 时会查询数据库，也放到写线程上执行
+        return await self.write(lambda: Budget(user_id=user_id, month=month).update_spent())
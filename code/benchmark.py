@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能对比脚本
+在临时数据库上分别使用 SQLite 默认配置（LEGACY_PRAGMAS）和 WAL 配置（DEFAULT_PRAGMAS），
+测量逐笔提交、批量导入、统计报表以及写入期间读取的吞吐量
+
+用法: python benchmark.py [逐笔提交条数] [批量导入条数]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from database import db_manager, DEFAULT_PRAGMAS, LEGACY_PRAGMAS
+from finance_stats import Statistics, stats_cache
+from transaction import Transaction
+
+
+PROFILES = [
+    ('默认配置', LEGACY_PRAGMAS),
+    ('WAL配置', DEFAULT_PRAGMAS),
+]
+
+# 统计报表测试的持续秒数
+REPORT_SECONDS = 2.0
+
+
+def _create_user():
+    """插入一个测试用户，返回用户ID"""
+    user_id = str(uuid.uuid4())
+    db_manager.execute_query(
+        "INSERT INTO users (user_id, username, password, monthly_budget) VALUES (?, ?, ?, ?)",
+        (user_id, f"bench_{user_id[:8]}", '', 500000), commit=True
+    )
+    return user_id
+
+
+def _rows(user_id, count, start):
+    """生成批量导入使用的交易字典，日期从 start 起每笔间隔一小时"""
+    for i in range(count):
+        yield {
+            'amount': 10 + i % 500,
+            'type': '收入' if i % 10 == 0 else '支出',
+            'category_id': f"cat_{i % 8 + 1}",
+            'date': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'),
+            'note': f"批量 {i}",
+            'user_id': user_id,
+        }
+
+
+def bench_single_inserts(user_id, count):
+    """逐笔添加交易，每笔单独提交
+
+    Returns:
+        float: 每秒提交条数
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    started = time.perf_counter()
+    for i in range(count):
+        Transaction(amount=12.5, type='支出', category_id='cat_1', date=now,
+                    note=f"逐笔 {i}", user_id=user_id).add_transaction()
+    return count / (time.perf_counter() - started)
+
+
+def bench_bulk_insert(user_id, count):
+    """批量导入交易
+
+    Returns:
+        float: 每秒导入条数
+    """
+    started = time.perf_counter()
+    imported = Transaction.bulk_add(_rows(user_id, count, datetime(2020, 1, 1)))
+    return imported / (time.perf_counter() - started)
+
+
+def bench_reports(user_id, seconds=REPORT_SECONDS, stop=None, cached=False):
+    """反复计算月度统计
+
+    Args:
+        stop: threading.Event，设置后提前结束
+        cached: 为False时每次计算前清空统计缓存，测量查询数据库的耗时；
+            为True时除第一次外都命中缓存
+
+    Returns:
+        float: 每秒完成的报表数
+    """
+    month = datetime.now().strftime('%Y-%m')
+    stats = Statistics(user_id)
+    done = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline and not (stop and stop.is_set()):
+        if not cached:
+            stats_cache.clear()
+        stats.calculate_monthly_stats(month)
+        done += 1
+    return done / (time.perf_counter() - started)
+
+
+def bench_reads_during_writes(user_id, seconds=REPORT_SECONDS):
+    """后台线程持续逐笔写入时，前台计算月度统计
+
+    回滚日志模式下写事务提交时会阻塞读取，WAL 模式下读写互不阻塞。
+
+    Returns:
+        tuple: (每秒报表数, 每秒写入条数)
+    """
+    stop = threading.Event()
+    written = [0]
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def writer():
+        while not stop.is_set():
+            Transaction(amount=8, type='支出', category_id='cat_2', date=now,
+                        note='并发写入', user_id=user_id).add_transaction()
+            written[0] += 1
+
+    thread = threading.Thread(target=writer, daemon=True)
+    started = time.perf_counter()
+    thread.start()
+    try:
+        reports = bench_reports(user_id, seconds)
+    finally:
+        stop.set()
+        thread.join()
+    return reports, written[0] / (time.perf_counter() - started)
+
+
+def run_profile(name, pragmas, single_count, bulk_count, directory):
+    """在新的临时数据库上使用指定配置运行全部测试
+
+    Returns:
+        dict: 各项吞吐量
+    """
+    db_manager.pragmas = dict(pragmas)
+    db_manager.db_path = os.path.join(directory, f"bench_{len(os.listdir(directory))}.db")
+    db_manager.init_database()
+    user_id = _create_user()
+
+    results = {
+        '逐笔提交(条/秒)': bench_single_inserts(user_id, single_count),
+        '批量导入(条/秒)': bench_bulk_insert(user_id, bulk_count),
+        '月度报表(次/秒)': bench_reports(user_id),
+        '月度报表缓存命中(次/秒)': bench_reports(user_id, cached=True),
+    }
+    reports, writes = bench_reads_during_writes(user_id)
+    results['写入期间报表(次/秒)'] = reports
+    results['写入期间写入(条/秒)'] = writes
+    db_manager.close()
+    print(f"{name} 完成")
+    return results
+
+
+def main():
+    """运行对比并打印结果"""
+    single_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    bulk_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    original_path, original_pragmas = db_manager.db_path, db_manager.pragmas
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            results = [(name, run_profile(name, pragmas, single_count, bulk_count, directory))
+                       for name, pragmas in PROFILES]
+    finally:
+        db_manager.pragmas = original_pragmas
+        db_manager.db_path = original_path
+
+    (base_name, base), (name, tuned) = results
+    print(f"\n{'指标':<16}{base_name:>12}{name:>12}{'提升':>10}")
+    for metric, before in base.items():
+        after = tuned[metric]
+        ratio = after / before if before else float('inf')
+        print(f"{metric:<16}{before:>12.1f}{after:>12.1f}{ratio:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
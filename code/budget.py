@@ -6,13 +6,20 @@
 """
 import uuid
 from database import db_manager
+from period import period_range
+from records import BudgetRecord, row_factory
+from money import to_cents, from_cents
+
+
+# 预算列表查询的行构造函数
+_budget_row = row_factory(BudgetRecord)
 
 
 class Budget:
     """预算类，负责预算信息管理"""
 
     def __init__(self, budget_id=None, user_id=None, month=None, amount=0, spent=0):
-        """初始化预算对象"""
+        """初始化预算对象，金额单位为元"""
         self.budget_id = budget_id
         self.user_id = user_id
         self.month = month
@@ -33,8 +40,8 @@ class Budget:
             
             if budget_data:
                 self.budget_id = budget_data[0][0]
-                self.amount = budget_data[0][1]
-                self.spent = budget_data[0][2]
+                self.amount = from_cents(budget_data[0][1])
+                self.spent = from_cents(budget_data[0][2])
         except Exception as e:
             print(f"加载预算失败: {e}")
 
@@ -45,23 +52,27 @@ class Budget:
             bool: 保存是否成功
         """
         try:
-            if self.budget_id:
-                # 更新现有预算
-                db_manager.execute_query(
-                    "UPDATE budgets SET amount = ? WHERE budget_id = ?",
-                    (self.amount, self.budget_id),
-                    commit=True
-                )
-            else:
-                # 创建新预算
-                self.budget_id = str(uuid.uuid4())
-                db_manager.execute_query(
-                    '''INSERT OR REPLACE INTO budgets 
-                    (budget_id, user_id, month, amount, spent) 
-                    VALUES (?, ?, ?, ?, ?)''',
-                    (self.budget_id, self.user_id, self.month, self.amount, self.spent),
-                    commit=True
-                )
+            # 金额统一为两位小数的 Decimal
+            self.amount = from_cents(to_cents(self.amount))
+            self.spent = from_cents(to_cents(self.spent))
+            with db_manager.transaction():
+                if self.budget_id:
+                    # 更新现有预算
+                    db_manager.execute_query(
+                        "UPDATE budgets SET amount = ? WHERE budget_id = ?",
+                        (to_cents(self.amount), self.budget_id),
+                        commit=True
+                    )
+                else:
+                    # 创建新预算
+                    self.budget_id = str(uuid.uuid4())
+                    db_manager.execute_query(
+                        '''INSERT OR REPLACE INTO budgets 
+                        (budget_id, user_id, month, amount, spent) 
+                        VALUES (?, ?, ?, ?, ?)''',
+                        (self.budget_id, self.user_id, self.month, to_cents(self.amount), to_cents(self.spent)),
+                        commit=True
+                    )
             
             return True
         except Exception as e:
@@ -76,13 +87,14 @@ class Budget:
         """
         try:
             # 计算该月总支出
+            start, end = period_range(self.month)
             total_spent = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '支出' AND date LIKE ?''',
-                (self.user_id, f"{self.month}%"),
+                '''SELECT COALESCE(SUM(total), 0) FROM daily_rollups 
+                WHERE user_id = ? AND type = '支出' AND day >= ? AND day < ?''',
+                (self.user_id, start, end),
             )[0][0]
             
-            self.spent = total_spent
+            self.spent = from_cents(total_spent)
             
             # 更新数据库
             if self.budget_id:
@@ -112,13 +124,13 @@ class Budget:
                         (self.user_id,)
                     )
                     if user_data:
-                        self.amount = user_data[0][0]
+                        self.amount = from_cents(user_data[0][0])
                         self.budget_id = str(uuid.uuid4())
                         db_manager.execute_query(
                             '''INSERT INTO budgets 
                             (budget_id, user_id, month, amount, spent) 
                             VALUES (?, ?, ?, ?, ?)''',
-                            (self.budget_id, self.user_id, self.month, self.amount, total_spent),
+                            (self.budget_id, self.user_id, self.month, user_data[0][0], total_spent),
                             commit=True
                         )
             
@@ -127,14 +139,90 @@ class Budget:
             print(f"更新预算支出失败: {e}")
             return False
 
+    @staticmethod
+    def apply_spent_delta(user_id, month, delta):
+        """按差值调整已花费金额
+
+        交易写入路径调用此方法，只更新一行预算，不重新汇总整月支出。
+        该月还没有预算记录时，退回到 update_spent 创建记录。
+
+        Args:
+            user_id: 用户ID
+            month: 月份，格式为'YYYY-MM'
+            delta: 支出变化量（元），新增为正、删除为负
+
+        Returns:
+            bool: 更新是否成功
+        """
+        try:
+            budget_data = db_manager.execute_query(
+                "SELECT budget_id FROM budgets WHERE user_id = ? AND month = ?",
+                (user_id, month)
+            )
+            
+            if not budget_data:
+                return Budget(user_id=user_id, month=month).update_spent()
+            
+            db_manager.execute_query(
+                "UPDATE budgets SET spent = spent + ? WHERE budget_id = ?",
+                (to_cents(delta), budget_data[0][0]),
+                commit=True
+            )
+            return True
+        except Exception as e:
+            print(f"调整预算支出失败: {e}")
+            return False
+
+    @staticmethod
+    def reconcile(user_id=None):
+        """核对预算已花费金额与交易记录，修复偏差
+
+        金额以整数分存储，两边必须完全相等。
+
+        Args:
+            user_id: 用户ID，为None时核对所有用户
+
+        Returns:
+            list: 被修复的预算，每项为 (budget_id, month, 原金额, 实际金额)，金额单位为元
+        """
+        try:
+            query = '''SELECT b.budget_id, b.month, b.spent, 
+                (SELECT COALESCE(SUM(t.amount), 0) FROM transactions t 
+                 WHERE t.user_id = b.user_id AND t.type = '支出' 
+                 AND t.date >= b.month || '-01' AND t.date < date(b.month || '-01', '+1 month')) 
+            FROM budgets b'''
+            params = []
+            if user_id:
+                query += " WHERE b.user_id = ?"
+                params.append(user_id)
+            
+            repaired = [row for row in db_manager.execute_query(query, params)
+                        if (row[2] or 0) != row[3]]
+            
+            if repaired:
+                with db_manager.transaction():
+                    db_manager.execute_many(
+                        "UPDATE budgets SET spent = ? WHERE budget_id = ?",
+                        [(actual, budget_id) for budget_id, _, _, actual in repaired]
+                    )
+            
+            return [(budget_id, month, from_cents(spent or 0), from_cents(actual))
+                    for budget_id, month, spent, actual in repaired]
+        except Exception as e:
+            print(f"核对预算失败: {e}")
+            return []
+
     def is_overspent(self):
         """检查是否超支
         
         Returns:
             bool: 是否超支
         """
-        # 确保已更新支出金额
-        self.update_spent()
+        # 已花费金额由交易写入路径增量维护，只需重新读取
+        if self.budget_id:
+            self._load_budget()
+        else:
+            self.update_spent()
         return self.spent > self.amount
 
     @staticmethod
@@ -158,26 +246,14 @@ class Budget:
             user_id: 用户ID
         
         Returns:
-            list: 预算对象列表
+            list: BudgetRecord 只读预算记录列表
         """
         try:
-            budgets_data = db_manager.execute_query(
-                "SELECT budget_id, month, amount, spent FROM budgets WHERE user_id = ? ORDER BY month DESC",
-                (user_id,)
+            return db_manager.execute_query(
+                "SELECT budget_id, user_id, month, amount, spent FROM budgets WHERE user_id = ? ORDER BY month DESC",
+                (user_id,),
+                row_factory=_budget_row
             )
-            
-            budgets = []
-            for data in budgets_data:
-                budget = Budget(
-                    budget_id=data[0],
-                    user_id=user_id,
-                    month=data[1],
-                    amount=data[2],
-                    spent=data[3]
-                )
-                budgets.append(budget)
-            
-            return budgets
         except Exception as e:
             print(f"获取预算列表失败: {e}")
             return []
@@ -186,7 +262,7 @@ class Budget:
         """获取剩余预算
         
         Returns:
-            float: 剩余金额
+            Decimal: 剩余金额
         """
         return self.amount - self.spent
 
@@ -4,8 +4,14 @@
 分类模块
 实现分类相关的业务逻辑
 """
+import threading
 import uuid
 from database import db_manager
+from records import CategoryRecord, row_factory
+
+
+# 分类查询的行构造函数
+_category_row = row_factory(CategoryRecord)
 
 
 class Category:
@@ -38,6 +44,7 @@ class Category:
                 (self.category_id, self.name, self.type, self.icon, 1, self.user_id),
                 commit=True
             )
+            category_registry.invalidate(self.user_id)
             
             return True
         except Exception as e:
@@ -52,30 +59,10 @@ class Category:
             type: 分类类型过滤，可以是'收入类'或'支出类'
         
         Returns:
-            list: 分类对象列表
+            list: CategoryRecord 只读分类记录列表
         """
         try:
-            query = "SELECT category_id, name, type, icon FROM categories WHERE is_custom = 0"
-            params = []
-            
-            if type:
-                query += " AND type = ?"
-                params.append(type)
-            
-            categories_data = db_manager.execute_query(query, params)
-            
-            categories = []
-            for data in categories_data:
-                category = Category(
-                    category_id=data[0],
-                    name=data[1],
-                    type=data[2],
-                    icon=data[3],
-                    is_custom=False
-                )
-                categories.append(category)
-            
-            return categories
+            return [category for category in category_registry.list(None, type) if not category.is_custom]
         except Exception as e:
             print(f"获取预设分类失败: {e}")
             return []
@@ -89,39 +76,10 @@ class Category:
             type: 分类类型过滤
         
         Returns:
-            list: 分类对象列表
+            list: CategoryRecord 只读分类记录列表
         """
         try:
-            # 构建查询
-            query = "SELECT category_id, name, type, icon, is_custom FROM categories WHERE 1=1"
-            params = []
-            
-            # 添加用户条件
-            if user_id:
-                query += " AND (user_id IS NULL OR user_id = ?)"
-                params.append(user_id)
-            else:
-                query += " AND user_id IS NULL"
-            
-            # 添加类型条件
-            if type:
-                query += " AND type = ?"
-                params.append(type)
-            
-            categories_data = db_manager.execute_query(query, params)
-            
-            categories = []
-            for data in categories_data:
-                category = Category(
-                    category_id=data[0],
-                    name=data[1],
-                    type=data[2],
-                    icon=data[3],
-                    is_custom=bool(data[4])
-                )
-                categories.append(category)
-            
-            return categories
+            return category_registry.list(user_id, type)
         except Exception as e:
             print(f"获取分类列表失败: {e}")
             return []
@@ -142,6 +100,7 @@ class Category:
                 (self.name, self.icon, self.category_id, self.user_id),
                 commit=True
             )
+            category_registry.invalidate(self.user_id)
             
             return True
         except Exception as e:
@@ -173,6 +132,7 @@ class Category:
                 (self.category_id, self.user_id),
                 commit=True
             )
+            category_registry.invalidate(self.user_id)
             
             return True
         except Exception as e:
@@ -187,26 +147,128 @@ class Category:
             category_id: 分类ID
         
         Returns:
-            Category: 分类对象
+            CategoryRecord: 只读分类记录，不存在时返回None
         """
         try:
+            return category_registry.get(category_id)
+        except Exception as e:
+            print(f"获取分类信息失败: {e}")
+            return None
+
+
+class CategoryRegistry:
+    """分类缓存
+
+    分类极少变化，每个用户的分类（预设+自定义）只查询一次，之后的
+    ID查找和按类型列出都在内存中完成。分类写入后由 Category 调用
+    invalidate 使缓存失效；切换数据库文件时整体清空。
+
+    缓存的是只读的 CategoryRecord，可以安全地在调用方之间共享；
+    修改分类需构造 Category 对象后调用 update/delete。
+    """
+
+    def __init__(self):
+        """初始化分类缓存"""
+        self._lock = threading.RLock()
+        self._db_path = None
+        self._by_id = {}
+        # 用户ID -> {分类类型 -> 分类列表}，None 表示只有预设分类
+        self._by_user = {}
+
+    def _check_db_path(self):
+        """数据库文件变化时清空缓存"""
+        if self._db_path != db_manager.db_path:
+            self._by_id.clear()
+            self._by_user.clear()
+            self._db_path = db_manager.db_path
+
+    def _load(self, user_id):
+        """加载某个用户可见的全部分类
+
+        Returns:
+            dict: 分类类型 -> 分类列表
+        """
+        if user_id:
+            rows = db_manager.execute_query(
+                """SELECT category_id, name, type, icon, is_custom, user_id FROM categories 
+                WHERE user_id IS NULL OR user_id = ?""",
+                (user_id,),
+                row_factory=_category_row
+            )
+        else:
+            rows = db_manager.execute_query(
+                "SELECT category_id, name, type, icon, is_custom, user_id FROM categories WHERE user_id IS NULL",
+                row_factory=_category_row
+            )
+        
+        by_type = {}
+        for category in rows:
+            self._by_id[category.category_id] = category
+            by_type.setdefault(category.type, []).append(category)
+        
+        self._by_user[user_id] = by_type
+        return by_type
+
+    def list(self, user_id=None, type=None):
+        """列出用户可见的分类
+
+        Args:
+            user_id: 用户ID，为None时只列出预设分类
+            type: 分类类型过滤
+
+        Returns:
+            list: CategoryRecord 只读分类记录列表
+        """
+        with self._lock:
+            self._check_db_path()
+            by_type = self._by_user.get(user_id)
+            if by_type is None:
+                by_type = self._load(user_id)
+        
+        if type:
+            return list(by_type.get(type, []))
+        return [category for categories in by_type.values() for category in categories]
+
+    def get(self, category_id):
+        """根据ID查找分类，未命中时查询数据库并缓存
+
+        Returns:
+            CategoryRecord: 分类记录，不存在时返回None
+        """
+        with self._lock:
+            self._check_db_path()
+            category = self._by_id.get(category_id)
+            if category is not None:
+                return category
+            
             category_data = db_manager.execute_query(
                 "SELECT category_id, name, type, icon, is_custom, user_id FROM categories WHERE category_id = ?",
-                (category_id,)
+                (category_id,),
+                row_factory=_category_row
             )
-            
             if not category_data:
                 return None
             
-            data = category_data[0]
-            return Category(
-                category_id=data[0],
-                name=data[1],
-                type=data[2],
-                icon=data[3],
-                is_custom=bool(data[4]),
-                user_id=data[5]
-            )
-        except Exception as e:
-            print(f"获取分类信息失败: {e}")
-            return None
\ No newline at end of file
+            category = category_data[0]
+            self._by_id[category_id] = category
+            return category
+
+    def invalidate(self, user_id=None):
+        """使缓存失效
+
+        Args:
+            user_id: 分类发生变化的用户ID，为None时清空全部缓存
+        """
+        with self._lock:
+            if user_id is None:
+                self._by_id.clear()
+                self._by_user.clear()
+                return
+            
+            self._by_user.pop(user_id, None)
+            for category_id in [key for key, category in self._by_id.items() if category.user_id == user_id]:
+                del self._by_id[category_id]
+
+
+# 全局分类缓存
+category_registry = CategoryRegistry()
@@ -4,90 +4,785 @@
 记账软件数据库模块
 负责本地数据存储和访问
 """
+import os
 import sqlite3
 import json
+import queue
+import threading
+from urllib.request import pathname2url
+from contextlib import contextmanager
 from datetime import datetime
 
+from records import ChangeRecord, row_factory
+
+
+# 变更日志查询的行构造函数
+_change_row = row_factory(ChangeRecord)
+
+
+# 托管索引集合：随表结构一起创建
+# 统计、预算和交易列表查询都按 user_id/type/date 过滤，索引按此访问模式设计
+MANAGED_INDEXES = [
+    # 覆盖索引：按类型和日期汇总金额、按分类分组时无需回表
+    ('idx_transactions_user_type_date',
+     'transactions (user_id, type, date, category_id, amount)'),
+    # 交易列表按日期、交易ID倒序分页，LIMIT 和游标可直接在索引上定位
+    ('idx_transactions_user_date_id',
+     'transactions (user_id, date, transaction_id)'),
+    # 删除分类前检查是否仍有交易引用
+    ('idx_transactions_category',
+     'transactions (category_id)'),
+]
+
+
+# 已被替换或不再被查询使用的索引，初始化时删除
+RETIRED_INDEXES = [
+    'idx_transactions_user_date',
+    # 周期汇总改为读取 daily_rollups 后不再使用，写入时仍需维护
+    'idx_transactions_user_date_category',
+]
+
+
+# 表结构定义，按创建顺序排列；金额列均为整数“分”，参见 money 模块
+TABLES = [
+    ('users', '''
+        user_id TEXT PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        monthly_budget INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    '''),
+    ('categories', '''
+        category_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,  -- 收入类/支出类
+        icon TEXT,
+        is_custom INTEGER DEFAULT 0,
+        user_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+    '''),
+    ('transactions', '''
+        transaction_id TEXT PRIMARY KEY,
+        amount INTEGER NOT NULL,
+        type TEXT NOT NULL,  -- 收入/支出
+        category_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        note TEXT,
+        user_id TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        fingerprint TEXT,  -- 导入去重指纹，手工记账为空
+        FOREIGN KEY (category_id) REFERENCES categories (category_id),
+        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+    '''),
+    ('budgets', '''
+        budget_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        spent INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+        UNIQUE (user_id, month)
+    '''),
+]
+
+
+# 各表中以“分”存储的金额列
+MONEY_COLUMNS = {
+    'users': ['monthly_budget'],
+    'transactions': ['amount'],
+    'budgets': ['amount', 'spent'],
+}
+
+
+# 每日汇总表结构：按 (用户, 日期, 类型, 分类) 保存金额合计（分）和笔数
+ROLLUP_TABLE = '''
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    type TEXT NOT NULL,
+    category_id TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,  -- 金额合计（分）
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, type, category_id)
+'''
+
+
+# 维护每日汇总表的触发器
+ROLLUP_TRIGGERS = [
+    # 新增交易：累加到对应的汇总行
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO daily_rollups (user_id, day, type, category_id, total, count)
+        VALUES (NEW.user_id, SUBSTR(NEW.date, 1, 10), NEW.type, NEW.category_id, NEW.amount, 1)
+        ON CONFLICT (user_id, day, type, category_id)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END
+    ''',
+    # 删除交易：从对应的汇总行扣减，笔数归零时删除该行
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete
+    AFTER DELETE ON transactions
+    BEGIN
+        UPDATE daily_rollups SET total = total - OLD.amount, count = count - 1
+        WHERE user_id = OLD.user_id AND day = SUBSTR(OLD.date, 1, 10)
+            AND type = OLD.type AND category_id = OLD.category_id;
+        DELETE FROM daily_rollups
+        WHERE user_id = OLD.user_id AND day = SUBSTR(OLD.date, 1, 10)
+            AND type = OLD.type AND category_id = OLD.category_id AND count <= 0;
+    END
+    ''',
+    # 修改交易：先扣减旧值再累加新值
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+    AFTER UPDATE OF amount, type, category_id, date, user_id ON transactions
+    BEGIN
+        UPDATE daily_rollups SET total = total - OLD.amount, count = count - 1
+        WHERE user_id = OLD.user_id AND day = SUBSTR(OLD.date, 1, 10)
+            AND type = OLD.type AND category_id = OLD.category_id;
+        DELETE FROM daily_rollups
+        WHERE user_id = OLD.user_id AND day = SUBSTR(OLD.date, 1, 10)
+            AND type = OLD.type AND category_id = OLD.category_id AND count <= 0;
+        INSERT INTO daily_rollups (user_id, day, type, category_id, total, count)
+        VALUES (NEW.user_id, SUBSTR(NEW.date, 1, 10), NEW.type, NEW.category_id, NEW.amount, 1)
+        ON CONFLICT (user_id, day, type, category_id)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END
+    ''',
+]
+
+
+# 数据版本表：每个用户一行，交易或分类每次写入时由触发器递增，
+# 统计结果缓存以版本号作为键的一部分，版本变化后旧结果自然失效。
+# 预设分类（user_id 为NULL）的变化记在 user_id 为空字符串的全局行上
+DATA_VERSION_TABLE = '''
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+'''
+
+
+def _version_bump(user_id_expr):
+    """生成递增某个用户数据版本的语句"""
+    return (f"INSERT INTO data_versions (user_id, version) VALUES ({user_id_expr}, 1) "
+            f"ON CONFLICT (user_id) DO UPDATE SET version = version + 1;")
+
+
+# 维护数据版本的触发器：(名称, 表, 事件, 需要递增版本的用户ID表达式)
+DATA_VERSION_TRIGGERS = [
+    ('trg_transactions_version_insert', 'transactions', 'INSERT', ['NEW.user_id']),
+    ('trg_transactions_version_update', 'transactions', 'UPDATE', ['OLD.user_id', 'NEW.user_id']),
+    ('trg_transactions_version_delete', 'transactions', 'DELETE', ['OLD.user_id']),
+    ('trg_categories_version_insert', 'categories', 'INSERT', ["COALESCE(NEW.user_id, '')"]),
+    ('trg_categories_version_update', 'categories', 'UPDATE',
+     ["COALESCE(OLD.user_id, '')", "COALESCE(NEW.user_id, '')"]),
+    ('trg_categories_version_delete', 'categories', 'DELETE', ["COALESCE(OLD.user_id, '')"]),
+]
+
+
+# 变更日志表：只追加，记录交易、预算和分类的每次增删改。
+# seq 为 AUTOINCREMENT 主键，严格递增且不会复用，消费方记住已处理的最大 seq，
+# 之后只读取其后的变更
+CHANGE_LOG_TABLE = '''
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    operation TEXT NOT NULL,  -- insert/update/delete
+    user_id TEXT,             -- 预设分类为NULL
+    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+'''
+
+# 写入变更日志的表：表名 -> 主键列
+CHANGE_LOG_SOURCES = {
+    'transactions': 'transaction_id',
+    'budgets': 'budget_id',
+    'categories': 'category_id',
+}
+
+
+# 结构迁移：(目标版本, 迁移方法名)，按版本顺序执行，完成后写入 PRAGMA user_version
+# 修改表结构、索引或触发器时追加新的迁移并提高 SCHEMA_VERSION，不要修改已发布的迁移
+MIGRATIONS = [
+    (1, '_migration_base_schema'),
+    (2, '_migration_fingerprint'),
+    (3, '_migration_money_cents'),
+    (4, '_migration_indexes'),
+    (5, '_migration_rollups'),
+    (6, '_migration_data_versions'),
+    (7, '_migration_change_log'),
+    (8, '_migration_retire_indexes'),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# 迁移中分批复制/回填时每批的行数，每批一个短事务
+MIGRATION_BATCH_SIZE = 5000
+
+
+# 连接参数配置，每个连接创建时依次执行 PRAGMA name = value
+# WAL 模式下读写互不阻塞，synchronous=NORMAL 只在检查点时同步磁盘，
+# 断电时可能丢失最近提交的事务，但不会损坏数据库
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,           # 页缓存约16MB（负数单位为KB）
+    'mmap_size': 64 * 1024 * 1024,  # 内存映射读取前64MB
+    'temp_store': 'MEMORY',         # 排序、分组的临时表放在内存中
+    'busy_timeout': 5000,           # 遇到写锁时最多等待5秒
+    # 检查点策略：WAL 超过1000页时由提交的连接自动执行被动检查点，
+    # 检查点后 WAL 文件截断到64MB以内
+    'wal_autocheckpoint': 1000,
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+# 只读连接的内存映射大小：多年账目的统计直接从操作系统页缓存读取数据库页，
+# 不再逐页复制到 SQLite 自己的页缓存；设为0关闭内存映射
+READ_MMAP_SIZE = 256 * 1024 * 1024
+
+# 内存映射不可用（平台不支持或 SQLite 编译时禁用）时，只读连接改用的页缓存大小（KB）
+READ_CACHE_SIZE = 64 * 1024
+
+# 以这些关键字开头的语句视为只读查询，交给只读连接池执行
+READ_STATEMENTS = ('SELECT', 'WITH', 'EXPLAIN', 'VALUES')
+
+# 等待唯一写连接的超时时间（秒），写操作在进程内排队，不会争抢数据库写锁
+WRITE_TIMEOUT = 30.0
+
+# SQLite 默认配置（回滚日志、synchronous=FULL），用于对比测试
+LEGACY_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+
+class ConnectionPool:
+    """SQLite连接池，在多次查询之间复用连接
+
+    连接以 check_same_thread=False 创建，每次只借给一个线程使用，
+    归还后可被任意线程再次借出。借出前会做健康检查，失效连接会被丢弃重建。
+    """
+
+    def __init__(self, db_path, size=5, timeout=5.0, pragmas=None, setup=None, read_only=False):
+        """初始化连接池
+
+        Args:
+            db_path: 数据库文件路径
+            size: 连接池最大连接数
+            timeout: 等待空闲连接和数据库锁的超时时间（秒）
+            pragmas: 每个新连接执行的 PRAGMA 配置，参见 DEFAULT_PRAGMAS
+            setup: 应用 PRAGMA 后对新连接的额外设置，setup(conn)
+            read_only: 是否以 mode=ro 打开只读连接，数据库文件必须已存在
+        """
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or {})
+        self.setup = setup
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _create_connection(self):
+        """创建新的数据库连接并应用 PRAGMA 配置"""
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        try:
+            for name, value in self.pragmas.items():
+                if not name.isidentifier():
+                    raise ValueError(f"无效的PRAGMA名称: {name}")
+                conn.execute(f"PRAGMA {name} = {value}")
+            if self.setup is not None:
+                self.setup(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        """检查连接是否可用"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        """关闭并丢弃连接"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self):
+        """借出一个连接，池满时等待其他线程归还
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        while True:
+            if self._closed:
+                raise sqlite3.ProgrammingError("连接池已关闭")
+
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._create_connection()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError("等待数据库连接超时")
+
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        if self._closed:
+            self._discard(conn)
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """以上下文管理器方式借用连接"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """关闭连接池中的所有空闲连接，借出中的连接在归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
 
 class DatabaseManager:
-    """数据库管理器，负责所有数据的存储和检索"""
+    """数据库管理器，负责所有数据的存储和检索
 
-    def __init__(self, db_path='finance_app.db'):
-        """初始化数据库连接"""
+    读写分离：只读查询由 mode=ro 的只读连接池并发执行，
+    写操作和工作单元共用唯一的写连接，在进程内排队串行执行，
+    配合 WAL 模式，报表读取与写入互不阻塞，写入之间也不会争抢数据库写锁。
+    """
+
+    def __init__(self, db_path='finance_app.db', pool_size=5, pragmas=DEFAULT_PRAGMAS,
+                 read_mmap_size=READ_MMAP_SIZE):
+        """初始化数据库连接
+
+        Args:
+            db_path: 数据库文件路径
+            pool_size: 只读连接池大小，写连接始终只有一个
+            pragmas: 连接参数配置，默认使用 DEFAULT_PRAGMAS（WAL）
+            read_mmap_size: 只读连接的内存映射大小（字节），0表示不使用内存映射
+        """
+        self.pool_size = pool_size
+        self.pragmas = dict(pragmas or {})
+        self.read_mmap_size = read_mmap_size
+        # 只读连接实际是否启用了内存映射，首次创建只读连接后确定
+        self.mmap_enabled = None
+        self._write_pool = None
+        self._read_pool = None
+        self._local = threading.local()
         self.db_path = db_path
         self._init_database()
+
+    @property
+    def db_path(self):
+        """数据库文件路径"""
+        return self._db_path
+
+    @db_path.setter
+    def db_path(self, value):
+        """切换数据库文件时重建连接池，避免复用指向旧文件的连接"""
+        self._db_path = value
+        self._reset_pools()
+
+    def _reset_pools(self):
+        """关闭现有连接并按当前配置重建写连接池和只读连接池"""
+        for pool in (self._write_pool, self._read_pool):
+            if pool:
+                pool.close()
+        self._write_pool = ConnectionPool(self.db_path, size=1, timeout=WRITE_TIMEOUT,
+                                          pragmas=self.pragmas)
+        self._read_pool = ConnectionPool(self.db_path, size=self.pool_size,
+                                         pragmas=self._read_pragmas(),
+                                         setup=self._setup_read_connection, read_only=True)
+
+    def _read_pragmas(self):
+        """只读连接的 PRAGMA 配置：按 read_mmap_size 开启内存映射"""
+        pragmas = {name: value for name, value in self.pragmas.items()
+                   if name in ('busy_timeout', 'temp_store', 'cache_size')}
+        pragmas['query_only'] = 'ON'
+        pragmas['mmap_size'] = int(self.read_mmap_size or 0)
+        return pragmas
+
+    def _setup_read_connection(self, conn):
+        """检查内存映射是否生效，不可用时退回为只读连接分配更大的页缓存"""
+        actual = conn.execute("PRAGMA mmap_size").fetchone()
+        self.mmap_enabled = bool(actual and actual[0] > 0)
+        if not self.mmap_enabled:
+            conn.execute(f"PRAGMA cache_size = -{int(READ_CACHE_SIZE)}")
+
+    def close(self):
+        """关闭连接池中的所有连接，WAL 模式下先把日志写回数据库文件"""
+        if self.pragmas.get('journal_mode', '').upper() == 'WAL':
+            try:
+                self.checkpoint('TRUNCATE')
+            except sqlite3.Error:
+                pass
+        self._reset_pools()
+
+    def checkpoint(self, mode='PASSIVE'):
+        """执行 WAL 检查点
+
+        自动检查点只在提交时按页数触发，且有读事务时可能无法完成。
+        大批量写入后或关闭前调用，可及时把 WAL 写回数据库并控制 WAL 文件大小。
+
+        Args:
+            mode: PASSIVE（不等待读写）、FULL、RESTART 或 TRUNCATE（完成后清空 WAL 文件）
+
+        Returns:
+            tuple: (是否因锁未完成, WAL 总页数, 已写回页数)；非 WAL 模式时为 (0, -1, -1)
+        """
+        if mode.upper() not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"无效的检查点模式: {mode}")
+        with self._write_pool.connection() as conn:
+            return conn.execute(f"PRAGMA wal_checkpoint({mode.upper()})").fetchone()
         
     def init_database(self):
-        """初始化数据库，创建必要的数据表"""
+        """初始化数据库，执行尚未应用的结构迁移"""
         # 调用现有的私有初始化方法
         self._init_database()
 
     def _init_database(self):
-        """初始化数据库表结构"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """按 PRAGMA user_version 执行结构迁移
 
-        # 创建用户表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL,
-            monthly_budget REAL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+        结构已是最新版本时只读取一次 user_version，不执行任何DDL。
+        """
+        with self._write_pool.connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            self._migrate(conn, version)
 
-        # 创建分类表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categories (
-            category_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,  -- 收入类/支出类
-            icon TEXT,
-            is_custom INTEGER DEFAULT 0,
-            user_id TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
-        )
-        ''')
+    def _migrate(self, conn, version):
+        """从指定版本依次执行迁移
 
-        # 创建交易记录表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            transaction_id TEXT PRIMARY KEY,
-            amount REAL NOT NULL,
-            type TEXT NOT NULL,  -- 收入/支出
-            category_id TEXT NOT NULL,
-            date TEXT NOT NULL,
-            note TEXT,
-            user_id TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (category_id) REFERENCES categories (category_id),
-            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+        每个迁移完成后立即写入新的 user_version，中途退出时下次启动从未完成的迁移继续。
+        迁移本身必须可重复执行：升级前的数据库 user_version 为0，但可能已有部分结构。
+
+        Args:
+            conn: 数据库连接
+            version: 当前结构版本
+        """
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS migration_progress (name TEXT PRIMARY KEY, position INTEGER NOT NULL)"
         )
-        ''')
+        conn.commit()
+        for target, name in MIGRATIONS:
+            if target <= version:
+                continue
+            getattr(self, name)(conn)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+
+    @contextmanager
+    def _write_batch(self, conn):
+        """迁移中的一个写批次：立即获取写锁，成功提交、失败回滚"""
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn.cursor()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _migration_base_schema(self, conn):
+        """迁移1：创建用户、分类、交易记录、预算表并写入预设分类"""
+        with self._write_batch(conn) as cursor:
+            for table, definition in TABLES:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+            self._insert_default_categories(cursor)
+
+    def _migration_fingerprint(self, conn):
+        """迁移2：旧数据库补充导入指纹列"""
+        with self._write_batch(conn) as cursor:
+            cursor.execute("PRAGMA table_info(transactions)")
+            columns = {row[1] for row in cursor.fetchall()}
+            if 'fingerprint' not in columns:
+                cursor.execute("ALTER TABLE transactions ADD COLUMN fingerprint TEXT")
+
+    def _migration_money_cents(self, conn):
+        """迁移3：把 REAL 类型的金额列迁移为整数分
+
+        SQLite 不能修改列类型，需按新结构建表、分批复制数据（金额乘100取整）、
+        删除旧表再改名；表上的索引和触发器随旧表删除，由之后的迁移重新创建。
+        汇总表直接删除，由迁移5重新回填。
+        """
+        converted = False
+        for table, definition in TABLES:
+            cursor = conn.execute(f"PRAGMA table_info({table})")
+            types = {row[1]: row[2].upper() for row in cursor.fetchall()}
+            if any(types.get(column) == 'REAL' for column in MONEY_COLUMNS.get(table, [])):
+                self._rebuild_table(conn, table, definition, set(types), MONEY_COLUMNS[table])
+                converted = True
+
+        if converted:
+            with self._write_batch(conn) as cursor:
+                cursor.execute("DROP TABLE IF EXISTS daily_rollups")
+
+    def _rebuild_table(self, conn, table, definition, old_columns, money_columns):
+        """按新结构分批重建表
+
+        数据按 rowid 分批复制到 {table}_new，每批一个短事务，迁移期间不会长时间占用写锁；
+        复制保留 rowid，中断后从 {table}_new 的最大 rowid 继续。
+        最后一批与删除旧表、改名在同一个事务中完成，不会遗漏复制期间追加的行。
+
+        Args:
+            conn: 数据库连接
+            table: 表名
+            definition: 新的列定义
+            old_columns: 旧表的列名集合
+            money_columns: 需要由元转换为分的列
+        """
+        with self._write_batch(conn) as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_new ({definition})")
+        cursor = conn.execute(f"PRAGMA table_info({table}_new)")
+        columns = [row[1] for row in cursor.fetchall() if row[1] in old_columns]
+        values = [f"CAST(ROUND({column} * 100) AS INTEGER)" if column in money_columns else column
+                  for column in columns]
+
+        while True:
+            with self._write_batch(conn) as cursor:
+                cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}_new")
+                position = cursor.fetchone()[0]
+                cursor.execute(
+                    f"INSERT INTO {table}_new (rowid, {', '.join(columns)}) "
+                    f"SELECT rowid, {', '.join(values)} FROM {table} "
+                    f"WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (position, MIGRATION_BATCH_SIZE)
+                )
+                if cursor.rowcount < MIGRATION_BATCH_SIZE:
+                    cursor.execute(f"DROP TABLE {table}")
+                    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+                    return
+
+    def _migration_indexes(self, conn):
+        """迁移4：创建托管索引，并删除已被替换的旧索引"""
+        with self._write_batch(conn) as cursor:
+            for name in RETIRED_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            for name, definition in MANAGED_INDEXES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+            # 导入指纹唯一索引：重复导入的记录在插入时被 INSERT OR IGNORE 跳过
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_fingerprint "
+                "ON transactions (user_id, fingerprint) WHERE fingerprint IS NOT NULL"
+            )
+
+    def _migration_rollups(self, conn):
+        """迁移5：创建每日汇总表，分批回填后创建维护触发器
+
+        daily_rollups 按 (用户, 日期, 类型, 分类) 保存金额合计和笔数，
+        由 transactions 上的触发器在每次增删改时按差值增量维护，
+        报表和预算只需读取每天几行汇总，而不必扫描全部交易。
+
+        回填按交易 rowid 分批进行，进度记录在 migration_progress 中，中断后从断点继续；
+        最后一批与创建触发器在同一个事务中完成。
+        """
+        with self._write_batch(conn) as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_rollups'")
+            existed = cursor.fetchone() is not None
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS daily_rollups ({ROLLUP_TABLE}) WITHOUT ROWID")
+            if not existed:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO migration_progress (name, position) VALUES ('daily_rollups', 0)"
+                )
+
+        while True:
+            with self._write_batch(conn) as cursor:
+                cursor.execute("SELECT position FROM migration_progress WHERE name = 'daily_rollups'")
+                row = cursor.fetchone()
+                if row is not None:
+                    # 升级前已存在汇总表时没有进度记录，无需回填
+                    cursor.execute(
+                        "SELECT MAX(rowid), COUNT(*) FROM "
+                        "(SELECT rowid FROM transactions WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                        (row[0], MIGRATION_BATCH_SIZE)
+                    )
+                    last, count = cursor.fetchone()
+                    if count:
+                        cursor.execute('''
+                        INSERT INTO daily_rollups (user_id, day, type, category_id, total, count)
+                        SELECT user_id, SUBSTR(date, 1, 10), type, category_id, SUM(amount), COUNT(*)
+                        FROM transactions WHERE rowid > ? AND rowid <= ?
+                        GROUP BY user_id, SUBSTR(date, 1, 10), type, category_id
+                        ON CONFLICT (user_id, day, type, category_id)
+                        DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+                        ''', (row[0], last))
+                        cursor.execute(
+                            "UPDATE migration_progress SET position = ? WHERE name = 'daily_rollups'", (last,)
+                        )
+                    if count == MIGRATION_BATCH_SIZE:
+                        continue
+                    cursor.execute("DELETE FROM migration_progress WHERE name = 'daily_rollups'")
+
+                for trigger in ROLLUP_TRIGGERS:
+                    cursor.execute(trigger)
+                return
+
+    def _migration_data_versions(self, conn):
+        """迁移6：创建数据版本表和维护版本号的触发器"""
+        with self._write_batch(conn) as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS data_versions ({DATA_VERSION_TABLE}) WITHOUT ROWID")
+            for name, table, event, user_ids in DATA_VERSION_TRIGGERS:
+                statements = ' '.join(_version_bump(user_id) for user_id in user_ids)
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN {statements} END"
+                )
+
+    def _migration_change_log(self, conn):
+        """迁移7：创建变更日志表和写入变更的触发器"""
+        with self._write_batch(conn) as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS change_log ({CHANGE_LOG_TABLE})")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_user_seq ON change_log (user_id, seq)")
+            for table, key in CHANGE_LOG_SOURCES.items():
+                for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                    cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_change_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_id, operation, user_id)
+                        VALUES ('{table}', {row}.{key}, '{event.lower()}', {row}.user_id);
+                    END
+                    ''')
+
+    def _migration_retire_indexes(self, conn):
+        """迁移8：删除不再被查询使用的索引"""
+        with self._write_batch(conn) as cursor:
+            for name in RETIRED_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def changes_since(self, seq=0, user_id=None, tables=None, limit=1000):
+        """读取指定序号之后的变更
+
+        Args:
+            seq: 已处理的最大序号，返回序号大于它的变更
+            user_id: 只返回该用户的变更（含预设分类的变更），为None时返回全部
+            tables: 只返回这些表的变更，如 ['transactions']
+            limit: 最多返回的条数，取完后以最后一条的 seq 继续读取
+
+        Returns:
+            list: ChangeRecord 列表，按序号升序
+        """
+        query = ("SELECT seq, table_name, row_id, operation, user_id, changed_at "
+                 "FROM change_log WHERE seq > ?")
+        params = [seq]
+        if user_id is not None:
+            query += " AND (user_id = ? OR user_id IS NULL)"
+            params.append(user_id)
+        if tables:
+            query += f" AND table_name IN ({', '.join('?' * len(tables))})"
+            params.extend(tables)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        return self.execute_query(query, params, row_factory=_change_row)
+
+    def latest_change_seq(self):
+        """获取当前最大的变更序号，消费方可从此处开始只读取新变更
+
+        Returns:
+            int: 最大序号，没有变更时为0
+        """
+        return self.execute_query("SELECT COALESCE(MAX(seq), 0) FROM change_log")[0][0]
+
+    def prune_change_log(self, before_seq):
+        """删除不再需要的旧变更，序号不会因此复用
+
+        Args:
+            before_seq: 删除序号小于等于它的变更，通常取所有消费方已处理序号中的最小值
+
+        Returns:
+            int: 删除的条数
+        """
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM change_log WHERE seq <= ?", (before_seq,)).rowcount
+
+    def get_data_version(self, user_id):
+        """获取用户的数据版本号
 
-        # 创建预算表
+        包含用户自己的交易、分类以及预设分类的变化，只会增大。
+
+        Returns:
+            int: 版本号
+        """
+        return self.execute_query(
+            "SELECT COALESCE(SUM(version), 0) FROM data_versions WHERE user_id IN (?, '')",
+            (user_id,)
+        )[0][0]
+
+    @staticmethod
+    def _fill_rollups(cursor):
+        """根据交易表重新计算全部汇总行"""
+        cursor.execute("DELETE FROM daily_rollups")
         cursor.execute('''
-        CREATE TABLE IF NOT EXISTS budgets (
-            budget_id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount REAL NOT NULL,
-            spent REAL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
-            UNIQUE (user_id, month)
-        )
+        INSERT INTO daily_rollups (user_id, day, type, category_id, total, count)
+        SELECT user_id, SUBSTR(date, 1, 10), type, category_id, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, SUBSTR(date, 1, 10), type, category_id
         ''')
 
-        # 插入预设分类
-        self._insert_default_categories(cursor)
+    def rebuild_rollups(self):
+        """重建每日汇总表
 
-        conn.commit()
-        conn.close()
+        用于修复汇总数据。
+
+        Returns:
+            int: 重建后的汇总行数
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            self._fill_rollups(cursor)
+            # 汇总数据可能变化，递增全局版本使所有用户的统计缓存失效
+            cursor.execute(_version_bump("''"))
+        return self.execute_query("SELECT COUNT(*) FROM daily_rollups")[0][0]
 
     def _insert_default_categories(self, cursor):
         """插入默认分类"""
@@ -119,31 +814,147 @@ class DatabaseManager:
         """获取数据库连接"""
         return sqlite3.connect(self.db_path)
 
-    def execute_query(self, query, params=(), commit=False):
-        """执行SQL查询"""
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        
-        if commit:
-            conn.commit()
-            result = None
+    def explain_query_plan(self, query, params=()):
+        """获取查询计划
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+
+        Returns:
+            list: 查询计划每一步的描述文本
+        """
+        rows = self.execute_query(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row[3] for row in rows]
+
+    def find_full_scans(self, query, params=()):
+        """找出查询计划中的全表扫描步骤
+
+        SEARCH 表示按索引定位，SCAN 表示逐行扫描整张表或整个索引。
+
+        Returns:
+            list: 全表扫描步骤的描述文本，为空表示查询能走索引
+        """
+        return [detail for detail in self.explain_query_plan(query, params)
+                if detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW']
+
+    def in_transaction(self):
+        """当前线程是否处于工作单元中"""
+        return getattr(self._local, 'conn', None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """工作单元：范围内的所有查询共用同一连接，退出时只提交一次
+
+        范围内 execute_query/execute_many 的 commit 参数不会立即提交，
+        全部成功后统一提交，出现异常则整体回滚。嵌套使用时并入最外层的工作单元。
+
+        Yields:
+            sqlite3.Connection: 工作单元使用的连接
+        """
+        if self.in_transaction():
+            yield self._local.conn
+            return
+
+        with self._write_pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.conn = conn
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.conn = None
+
+    @staticmethod
+    def _is_read(query):
+        """语句是否为只读查询（SELECT、WITH、EXPLAIN、VALUES）"""
+        keyword = query.lstrip().split(None, 1)[:1]
+        return bool(keyword) and keyword[0].upper() in READ_STATEMENTS
+
+    @contextmanager
+    def _connection(self, write=True):
+        """获取当前线程应使用的连接
+
+        工作单元中复用其连接，保证能读到尚未提交的修改；
+        否则只读查询从只读连接池借用，写操作使用唯一的写连接。
+        """
+        if self.in_transaction():
+            yield self._local.conn
         else:
-            result = cursor.fetchall()
-        
-        conn.close()
+            pool = self._write_pool if write else self._read_pool
+            with pool.connection() as conn:
+                yield conn
+
+    def execute_query(self, query, params=(), commit=False, row_factory=None):
+        """执行SQL查询
+
+        commit 为False的只读查询在只读连接上执行，其余语句使用写连接。
+        以 WITH 开头的写语句需要传 commit=True。
+        row_factory 用于把每行直接构造成记录对象，参见 records.row_factory
+
+        Returns:
+            commit 为True时返回受影响的行数，否则返回查询结果列表
+        """
+        with self._connection(write=commit or not self._is_read(query)) as conn:
+            cursor = conn.cursor()
+            if row_factory is not None:
+                cursor.row_factory = row_factory
+            cursor.execute(query, params)
+
+            if commit:
+                if not self.in_transaction():
+                    conn.commit()
+                result = cursor.rowcount
+            else:
+                result = cursor.fetchall()
+
         return result
 
+    def iter_query(self, query, params=(), batch_size=500, row_factory=None):
+        """以游标流式读取查询结果
+
+        每次用 fetchmany 取一批，迭代期间占用一个连接，迭代结束或生成器关闭时归还。
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            batch_size: 每批读取的行数
+            row_factory: 行构造函数，为None时每行是元组
+
+        Yields:
+            tuple: 每行结果
+        """
+        with self._connection(write=not self._is_read(query)) as conn:
+            cursor = conn.cursor()
+            if row_factory is not None:
+                cursor.row_factory = row_factory
+            cursor.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+
     def execute_many(self, query, params_list, commit=True):
-        """批量执行SQL查询"""
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.executemany(query, params_list)
-        
-        if commit:
-            conn.commit()
-        
-        conn.close()
+        """批量执行SQL查询
+
+        Returns:
+            int: 语句直接修改的行数（不含触发器修改的行）
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(query, params_list)
+
+            if commit and not self.in_transaction():
+                conn.commit()
+
+        return cursor.rowcount
 
 
 # 数据库单例实例
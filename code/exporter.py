@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据导出模块
+以流式方式把用户数据写出为JSON文件
+"""
+import json
+import os
+
+from database import db_manager
+from budget import Budget
+from transaction import Transaction
+
+
+def export_json(user, filepath, progress=None, cancel_event=None, batch_size=500):
+    """流式导出用户数据
+
+    交易记录通过一条关联分类的查询逐批读取，每条记录读出后立即写入文件，
+    内存占用与交易数量无关。先写入临时文件，完成后再改名，取消或失败时不会留下半个文件。
+
+    Args:
+        user: 用户对象，需要 user_id、username、monthly_budget 属性
+        filepath: 导出文件路径
+        progress: 进度回调 progress(已导出条数, 总条数)，每批调用一次
+        cancel_event: threading.Event，被设置时中止导出
+        batch_size: 每批读取的交易条数
+
+    Returns:
+        bool: 导出完成返回True，被取消返回False
+    """
+    total = db_manager.execute_query(
+        "SELECT COUNT(*) FROM transactions WHERE user_id = ?",
+        (user.user_id,)
+    )[0][0]
+
+    temp_path = filepath + '.part'
+    completed = False
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            user_data = {'username': user.username, 'monthly_budget': float(user.monthly_budget or 0)}
+            f.write('{\n  "user": ')
+            f.write(json.dumps(user_data, ensure_ascii=False))
+            f.write(',\n  "transactions": [')
+
+            rows = Transaction.iter_transactions(user.user_id, with_category=True, batch_size=batch_size)
+            count = 0
+            try:
+                for trans in rows:
+                    item = {'id': trans.transaction_id, 'date': trans.date, 'amount': float(trans.amount),
+                            'type': trans.type, 'category': trans.category_name or '未知', 'note': trans.note}
+                    f.write(',\n    ' if count else '\n    ')
+                    f.write(json.dumps(item, ensure_ascii=False))
+                    count += 1
+
+                    if count % batch_size == 0:
+                        if cancel_event is not None and cancel_event.is_set():
+                            return False
+                        if progress:
+                            progress(count, total)
+            finally:
+                rows.close()
+
+            f.write('\n  ],\n  "budgets": [')
+            for i, budget in enumerate(Budget.get_all_budgets(user.user_id)):
+                item = {'month': budget.month, 'amount': float(budget.amount), 'spent': float(budget.spent)}
+                f.write(',\n    ' if i else '\n    ')
+                f.write(json.dumps(item, ensure_ascii=False))
+            f.write('\n  ]\n}\n')
+
+        if progress:
+            progress(count, total)
+        os.replace(temp_path, filepath)
+        completed = True
+        return True
+    finally:
+        if not completed and os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -4,10 +4,177 @@
 统计分析模块
 实现统计相关的业务逻辑和图表生成
 """
+import copy
+import sys
+import threading
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from database import db_manager
 from category import Category
+from period import period_range
+from money import from_cents
+from transaction_frame import TransactionFrame
+
+
+# 统计结果缓存的默认容量：最多缓存的结果数和估算占用的内存字节数
+STATS_CACHE_ENTRIES = 256
+STATS_CACHE_BYTES = 8 * 1024 * 1024
+
+
+def _estimate_size(value):
+    """粗略估算结果占用的内存（字节），递归计入字典和列表中的元素"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(key) + _estimate_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(item) for item in value)
+    return size
+
+
+class StatsCache:
+    """统计结果缓存
+
+    以 (用户ID, 统计周期, 统计类型, 数据版本) 为键缓存计算结果。数据版本由数据库触发器
+    在该用户的交易或分类每次写入时递增，写入后的查询使用新的键，不会读到过期结果；
+    旧版本的结果不再被访问，按最近最少使用的顺序淘汰。
+
+    条目数和估算内存都有上限，超出任一上限时淘汰最久未使用的结果。
+    存取时都复制一份，调用方修改返回的结果不会影响缓存。
+    """
+
+    def __init__(self, max_entries=STATS_CACHE_ENTRIES, max_bytes=STATS_CACHE_BYTES):
+        """初始化缓存
+
+        Args:
+            max_entries: 最多缓存的结果数
+            max_bytes: 缓存结果估算占用内存的上限（字节）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db_path = None
+        # 键 -> (结果, 估算字节数)，按使用先后排列，最近使用的在末尾
+        self._entries = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """缓存的结果数"""
+        return len(self._entries)
+
+    def _check_db_path(self):
+        """数据库文件变化时清空缓存"""
+        if self._db_path != db_manager.db_path:
+            self._entries.clear()
+            self.size_bytes = 0
+            self._db_path = db_manager.db_path
+
+    def get(self, key):
+        """读取缓存结果
+
+        Returns:
+            缓存结果的副本，未命中时返回None
+        """
+        with self._lock:
+            self._check_db_path()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+
+    def put(self, key, result):
+        """写入结果，单个结果超过内存上限时不缓存"""
+        if result is None:
+            return
+        size = _estimate_size(result)
+        if size > self.max_bytes:
+            return
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._check_db_path()
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[1]
+            self._entries[key] = (result, size)
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+
+class PeriodAggregator:
+    """单遍汇总器
+
+    逐行消费按 (类型, 分类, 时间桶) 分组后的金额，一次遍历同时得到
+    收支总额、分类拆分和按日/按月的时间序列。
+
+    内部以整数分累加，输出分类统计和时间序列时转换为元。
+    """
+
+    def __init__(self):
+        """初始化汇总器"""
+        self.total_income = 0
+        self.total_expense = 0
+        self._categories = {'收入': {}, '支出': {}}
+        self._buckets = defaultdict(lambda: {'income': 0, 'expense': 0})
+
+    def add(self, trans_type, category_id, name, icon, bucket, amount):
+        """累加一行分组结果
+
+        Args:
+            trans_type: 交易类型（收入/支出）
+            category_id: 分类ID
+            name: 分类名称，分类不存在时为None
+            icon: 分类图标
+            bucket: 时间桶（日期或月份），不需要时间序列时为空字符串
+            amount: 该组金额合计（分）
+        """
+        if trans_type == '收入':
+            self.total_income += amount
+            self._buckets[bucket]['income'] += amount
+        else:
+            if trans_type == '支出':
+                self.total_expense += amount
+            self._buckets[bucket]['expense'] += amount
+
+        # 分类已被删除的交易计入总额，但不出现在分类统计中
+        if name is None or trans_type not in self._categories:
+            return
+        categories = self._categories[trans_type]
+        if category_id in categories:
+            categories[category_id]['amount'] += amount
+        else:
+            categories[category_id] = {'category_id': category_id, 'name': name, 'icon': icon, 'amount': amount}
+
+    def category_stats(self):
+        """获取分类统计，按金额从高到低排序"""
+        def ranked(categories):
+            items = sorted(categories.values(), key=lambda d: d['amount'], reverse=True)
+            return [{**item, 'amount': from_cents(item['amount'])} for item in items]
+
+        return {
+            'expense': ranked(self._categories['支出']),
+            'income': ranked(self._categories['收入'])
+        }
+
+    def bucket_series(self, key):
+        """获取按时间桶排序的收支序列
+
+        Args:
+            key: 结果中时间桶字段名，如'date'或'month'
+        """
+        return [{key: bucket, 'income': from_cents(stats['income']), 'expense': from_cents(stats['expense'])}
+                for bucket, stats in sorted(self._buckets.items())]
 
 
 class Statistics:
@@ -24,6 +191,67 @@ class Statistics:
         self.total_expense = 0
         self.balance = 0
 
+    def _aggregate(self, period, bucket_length=0):
+        """用一条分组查询汇总指定周期的数据
+
+        数据来自每日汇总表，一年最多读取约 365×分类数 行。
+
+        Args:
+            period: 统计周期，'YYYY-MM-DD'、'YYYY-MM'或'YYYY'
+            bucket_length: 时间桶取日期前几位，10为按日、7为按月、0为不分桶
+
+        Returns:
+            PeriodAggregator: 汇总结果
+        """
+        start, end = period_range(period)
+        rows = db_manager.execute_query(
+            f'''SELECT r.type, r.category_id, c.name, c.icon, 
+                SUBSTR(r.day, 1, {int(bucket_length)}) AS bucket, SUM(r.total) 
+            FROM daily_rollups r 
+            LEFT JOIN categories c ON r.category_id = c.category_id 
+            WHERE r.user_id = ? AND r.day >= ? AND r.day < ? 
+            GROUP BY r.type, r.category_id, bucket''',
+            (self.user_id, start, end),
+        )
+
+        aggregator = PeriodAggregator()
+        for row in rows:
+            aggregator.add(*row)
+        return aggregator
+
+    def _cached(self, kind, period, compute):
+        """读取或计算统计结果
+
+        先读取数据版本再计算：计算期间发生的写入会使版本变化，
+        下次查询不会命中这次的结果。
+
+        Args:
+            kind: 统计类型，如'daily'、'monthly'
+            period: 统计周期
+            compute: 未命中时调用 compute(period) 计算结果
+
+        Returns:
+            统计结果
+        """
+        key = (self.user_id, period, kind, db_manager.get_data_version(self.user_id))
+        result = stats_cache.get(key)
+        if result is None:
+            result = compute(period)
+            stats_cache.put(key, result)
+        return result
+
+    def _apply_result(self, result):
+        """记录统计结果中的收支总额和余额"""
+        self.total_income = result['total_income']
+        self.total_expense = result['total_expense']
+        self.balance = result['balance']
+
+    def _apply_totals(self, aggregator):
+        """记录汇总得到的收支总额和余额（元）"""
+        self.total_income = from_cents(aggregator.total_income)
+        self.total_expense = from_cents(aggregator.total_expense)
+        self.balance = self.total_income - self.total_expense
+
     def calculate_daily_stats(self, date=None):
         """计算日统计数据
         
@@ -38,39 +266,26 @@ class Statistics:
             if not date:
                 date = datetime.now().strftime('%Y-%m-%d')
             
-            # 查询收入
-            income_result = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '收入' AND date LIKE ?''',
-                (self.user_id, f"{date}%"),
-            )
-            self.total_income = income_result[0][0]
-            
-            # 查询支出
-            expense_result = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '支出' AND date LIKE ?''',
-                (self.user_id, f"{date}%"),
-            )
-            self.total_expense = expense_result[0][0]
-            
-            # 计算余额
-            self.balance = self.total_income - self.total_expense
-            
-            # 获取分类统计
-            category_stats = self._get_category_stats(date)
-            
-            return {
-                'date': date,
-                'total_income': self.total_income,
-                'total_expense': self.total_expense,
-                'balance': self.balance,
-                'category_stats': category_stats
-            }
+            result = self._cached('daily', date, self._daily_stats)
+            self._apply_result(result)
+            return result
         except Exception as e:
             print(f"计算日统计失败: {e}")
             return None
 
+    def _daily_stats(self, date):
+        """一次查询得到收支总额和分类统计"""
+        aggregator = self._aggregate(date)
+        self._apply_totals(aggregator)
+        
+        return {
+            'date': date,
+            'total_income': self.total_income,
+            'total_expense': self.total_expense,
+            'balance': self.balance,
+            'category_stats': aggregator.category_stats()
+        }
+
     def calculate_monthly_stats(self, month=None):
         """计算月统计数据
         
@@ -85,43 +300,27 @@ class Statistics:
             if not month:
                 month = datetime.now().strftime('%Y-%m')
             
-            # 查询收入
-            income_result = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '收入' AND date LIKE ?''',
-                (self.user_id, f"{month}%"),
-            )
-            self.total_income = income_result[0][0]
-            
-            # 查询支出
-            expense_result = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '支出' AND date LIKE ?''',
-                (self.user_id, f"{month}%"),
-            )
-            self.total_expense = expense_result[0][0]
-            
-            # 计算余额
-            self.balance = self.total_income - self.total_expense
-            
-            # 获取每日统计
-            daily_stats = self._get_daily_stats_by_month(month)
-            
-            # 获取分类统计
-            category_stats = self._get_category_stats_by_month(month)
-            
-            return {
-                'month': month,
-                'total_income': self.total_income,
-                'total_expense': self.total_expense,
-                'balance': self.balance,
-                'daily_stats': daily_stats,
-                'category_stats': category_stats
-            }
+            result = self._cached('monthly', month, self._monthly_stats)
+            self._apply_result(result)
+            return result
         except Exception as e:
             print(f"计算月统计失败: {e}")
             return None
 
+    def _monthly_stats(self, month):
+        """一次查询得到收支总额、每日统计和分类统计"""
+        aggregator = self._aggregate(month, bucket_length=10)
+        self._apply_totals(aggregator)
+        
+        return {
+            'month': month,
+            'total_income': self.total_income,
+            'total_expense': self.total_expense,
+            'balance': self.balance,
+            'daily_stats': aggregator.bucket_series('date'),
+            'category_stats': aggregator.category_stats()
+        }
+
     def calculate_yearly_stats(self, year=None):
         """计算年统计数据
         
@@ -136,72 +335,31 @@ class Statistics:
             if not year:
                 year = datetime.now().strftime('%Y')
             
-            # 查询收入
-            income_result = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '收入' AND date LIKE ?''',
-                (self.user_id, f"{year}%"),
-            )
-            self.total_income = income_result[0][0]
-            
-            # 查询支出
-            expense_result = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '支出' AND date LIKE ?''',
-                (self.user_id, f"{year}%"),
-            )
-            self.total_expense = expense_result[0][0]
-            
-            # 计算余额
-            self.balance = self.total_income - self.total_expense
-            
-            # 获取月度统计
-            monthly_stats = self._get_monthly_stats_by_year(year)
-            
-            # 获取分类统计
-            category_stats = self._get_category_stats_by_year(year)
-            
-            return {
-                'year': year,
-                'total_income': self.total_income,
-                'total_expense': self.total_expense,
-                'balance': self.balance,
-                'monthly_stats': monthly_stats,
-                'category_stats': category_stats
-            }
+            result = self._cached('yearly', year, self._yearly_stats)
+            self._apply_result(result)
+            return result
         except Exception as e:
             print(f"计算年统计失败: {e}")
             return None
 
+    def _yearly_stats(self, year):
+        """一次查询得到收支总额、月度统计和分类统计"""
+        aggregator = self._aggregate(year, bucket_length=7)
+        self._apply_totals(aggregator)
+        
+        return {
+            'year': year,
+            'total_income': self.total_income,
+            'total_expense': self.total_expense,
+            'balance': self.balance,
+            'monthly_stats': aggregator.bucket_series('month'),
+            'category_stats': aggregator.category_stats()
+        }
+
     def _get_category_stats(self, date):
         """获取指定日期的分类统计"""
         try:
-            # 查询分类支出统计
-            expense_data = db_manager.execute_query(
-                '''SELECT c.category_id, c.name, c.icon, SUM(t.amount) 
-                FROM transactions t 
-                JOIN categories c ON t.category_id = c.category_id 
-                WHERE t.user_id = ? AND t.type = '支出' AND t.date LIKE ? 
-                GROUP BY c.category_id, c.name, c.icon 
-                ORDER BY SUM(t.amount) DESC''',
-                (self.user_id, f"{date}%"),
-            )
-            
-            # 查询分类收入统计
-            income_data = db_manager.execute_query(
-                '''SELECT c.category_id, c.name, c.icon, SUM(t.amount) 
-                FROM transactions t 
-                JOIN categories c ON t.category_id = c.category_id 
-                WHERE t.user_id = ? AND t.type = '收入' AND t.date LIKE ? 
-                GROUP BY c.category_id, c.name, c.icon 
-                ORDER BY SUM(t.amount) DESC''',
-                (self.user_id, f"{date}%"),
-            )
-            
-            return {
-                'expense': [{'category_id': d[0], 'name': d[1], 'icon': d[2], 'amount': d[3]} for d in expense_data],
-                'income': [{'category_id': d[0], 'name': d[1], 'icon': d[2], 'amount': d[3]} for d in income_data]
-            }
+            return self._aggregate(date).category_stats()
         except Exception as e:
             print(f"获取分类统计失败: {e}")
             return {'expense': [], 'income': []}
@@ -209,32 +367,7 @@ class Statistics:
     def _get_category_stats_by_month(self, month):
         """获取指定月份的分类统计"""
         try:
-            # 查询分类支出统计
-            expense_data = db_manager.execute_query(
-                '''SELECT c.category_id, c.name, c.icon, SUM(t.amount) 
-                FROM transactions t 
-                JOIN categories c ON t.category_id = c.category_id 
-                WHERE t.user_id = ? AND t.type = '支出' AND t.date LIKE ? 
-                GROUP BY c.category_id, c.name, c.icon 
-                ORDER BY SUM(t.amount) DESC''',
-                (self.user_id, f"{month}%"),
-            )
-            
-            # 查询分类收入统计
-            income_data = db_manager.execute_query(
-                '''SELECT c.category_id, c.name, c.icon, SUM(t.amount) 
-                FROM transactions t 
-                JOIN categories c ON t.category_id = c.category_id 
-                WHERE t.user_id = ? AND t.type = '收入' AND t.date LIKE ? 
-                GROUP BY c.category_id, c.name, c.icon 
-                ORDER BY SUM(t.amount) DESC''',
-                (self.user_id, f"{month}%"),
-            )
-            
-            return {
-                'expense': [{'category_id': d[0], 'name': d[1], 'icon': d[2], 'amount': d[3]} for d in expense_data],
-                'income': [{'category_id': d[0], 'name': d[1], 'icon': d[2], 'amount': d[3]} for d in income_data]
-            }
+            return self._aggregate(month).category_stats()
         except Exception as e:
             print(f"获取月度分类统计失败: {e}")
             return {'expense': [], 'income': []}
@@ -242,32 +375,7 @@ class Statistics:
     def _get_category_stats_by_year(self, year):
         """获取指定年份的分类统计"""
         try:
-            # 查询分类支出统计
-            expense_data = db_manager.execute_query(
-                '''SELECT c.category_id, c.name, c.icon, SUM(t.amount) 
-                FROM transactions t 
-                JOIN categories c ON t.category_id = c.category_id 
-                WHERE t.user_id = ? AND t.type = '支出' AND t.date LIKE ? 
-                GROUP BY c.category_id, c.name, c.icon 
-                ORDER BY SUM(t.amount) DESC''',
-                (self.user_id, f"{year}%"),
-            )
-            
-            # 查询分类收入统计
-            income_data = db_manager.execute_query(
-                '''SELECT c.category_id, c.name, c.icon, SUM(t.amount) 
-                FROM transactions t 
-                JOIN categories c ON t.category_id = c.category_id 
-                WHERE t.user_id = ? AND t.type = '收入' AND t.date LIKE ? 
-                GROUP BY c.category_id, c.name, c.icon 
-                ORDER BY SUM(t.amount) DESC''',
-                (self.user_id, f"{year}%"),
-            )
-            
-            return {
-                'expense': [{'category_id': d[0], 'name': d[1], 'icon': d[2], 'amount': d[3]} for d in expense_data],
-                'income': [{'category_id': d[0], 'name': d[1], 'icon': d[2], 'amount': d[3]} for d in income_data]
-            }
+            return self._aggregate(year).category_stats()
         except Exception as e:
             print(f"获取年度分类统计失败: {e}")
             return {'expense': [], 'income': []}
@@ -275,32 +383,7 @@ class Statistics:
     def _get_daily_stats_by_month(self, month):
         """获取指定月份的每日统计"""
         try:
-            # 查询每日收入和支出
-            daily_data = db_manager.execute_query(
-                '''SELECT SUBSTR(date, 1, 10) as day, type, SUM(amount) 
-                FROM transactions 
-                WHERE user_id = ? AND date LIKE ? 
-                GROUP BY day, type 
-                ORDER BY day''',
-                (self.user_id, f"{month}%"),
-            )
-            
-            # 整理数据
-            daily_dict = defaultdict(lambda: {'income': 0, 'expense': 0})
-            for data in daily_data:
-                day = data[0]
-                trans_type = data[1]
-                amount = data[2]
-                
-                if trans_type == '收入':
-                    daily_dict[day]['income'] = amount
-                else:
-                    daily_dict[day]['expense'] = amount
-            
-            # 转换为列表并按日期排序
-            daily_list = [{'date': day, **stats} for day, stats in sorted(daily_dict.items())]
-            
-            return daily_list
+            return self._aggregate(month, bucket_length=10).bucket_series('date')
         except Exception as e:
             print(f"获取每日统计失败: {e}")
             return []
@@ -308,32 +391,7 @@ class Statistics:
     def _get_monthly_stats_by_year(self, year):
         """获取指定年份的月度统计"""
         try:
-            # 查询月度收入和支出
-            monthly_data = db_manager.execute_query(
-                '''SELECT SUBSTR(date, 1, 7) as month, type, SUM(amount) 
-                FROM transactions 
-                WHERE user_id = ? AND date LIKE ? 
-                GROUP BY month, type 
-                ORDER BY month''',
-                (self.user_id, f"{year}%"),
-            )
-            
-            # 整理数据
-            monthly_dict = defaultdict(lambda: {'income': 0, 'expense': 0})
-            for data in monthly_data:
-                month = data[0]
-                trans_type = data[1]
-                amount = data[2]
-                
-                if trans_type == '收入':
-                    monthly_dict[month]['income'] = amount
-                else:
-                    monthly_dict[month]['expense'] = amount
-            
-            # 转换为列表并按月份排序
-            monthly_list = [{'month': month, **stats} for month, stats in sorted(monthly_dict.items())]
-            
-            return monthly_list
+            return self._aggregate(year, bucket_length=7).bucket_series('month')
         except Exception as e:
             print(f"获取月度统计失败: {e}")
             return []
@@ -448,6 +506,20 @@ class Statistics:
             print(f"生成图表数据失败: {e}")
             return None
 
+    def load_frame(self, start_date=None, end_date=None):
+        """把用户交易载入列式数据，用于多年趋势、累计余额等向量化分析
+
+        需要安装 numpy，参见 transaction_frame 模块。
+
+        Args:
+            start_date: 开始日期（含）
+            end_date: 结束日期（不含）
+
+        Returns:
+            TransactionFrame: 列式数据
+        """
+        return TransactionFrame.load(self.user_id, start_date, end_date)
+
     def get_trends(self, months=6):
         """获取收支趋势
         
@@ -462,9 +534,9 @@ class Statistics:
             start_date = end_date - timedelta(days=months*30)
             
             trends_data = db_manager.execute_query(
-                '''SELECT SUBSTR(date, 1, 7) as month, type, SUM(amount) 
-                FROM transactions 
-                WHERE user_id = ? AND date >= ? 
+                '''SELECT SUBSTR(day, 1, 7) as month, type, SUM(total) 
+                FROM daily_rollups 
+                WHERE user_id = ? AND day >= ? 
                 GROUP BY month, type 
                 ORDER BY month''',
                 (self.user_id, start_date.strftime('%Y-%m-%d')),
@@ -475,7 +547,7 @@ class Statistics:
             for data in trends_data:
                 month = data[0]
                 trans_type = data[1]
-                amount = data[2]
+                amount = from_cents(data[2])
                 
                 if trans_type == '收入':
                     monthly_dict[month]['income'] = amount
@@ -497,4 +569,8 @@ class Statistics:
             return trend_list
         except Exception as e:
             print(f"获取趋势数据失败: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+# 统计结果缓存单例，所有 Statistics 实例共享
+stats_cache = StatsCache()
@@ -8,15 +8,18 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from tkinter import font as tkfont
 from datetime import datetime
-import json
 import os
+import queue
+import threading
 
 from database import db_manager
 from user import User
 from category import Category
 from transaction import Transaction, SearchCriteria
 from budget import Budget
-from statistics import Statistics
+from money import parse_money
+from finance_stats import Statistics
+from exporter import export_json
 
 
 class FinanceApp(tk.Tk):
@@ -45,6 +48,9 @@ class FinanceApp(tk.Tk):
         
         # 显示登录界面
         self.show_login()
+        
+        # 关闭窗口时释放数据库连接
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def font_config(self):
         """配置字体"""
@@ -168,7 +174,7 @@ class FinanceApp(tk.Tk):
         # 获取预算
         budget_str = simpledialog.askstring("设置预算", "请输入月度预算（可选）:", parent=self)
         try:
-            budget = float(budget_str) if budget_str else 0
+            budget = parse_money(budget_str) if budget_str else 0
         except ValueError:
             budget = 0
         
@@ -310,16 +316,15 @@ class FinanceApp(tk.Tk):
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # 获取最近的20条交易记录
-        transactions = Transaction.get_transactions_by_user(
-            user_id=self.current_user.user_id
-        )[:20]
+        # 获取最近的20条交易记录（已关联分类名称）
+        transactions = Transaction.get_transactions_with_category(
+            user_id=self.current_user.user_id,
+            limit=20
+        )
         
         # 填充数据
         for trans in transactions:
-            # 获取分类名称
-            category = Category.get_category_by_id(trans.category_id)
-            category_name = category.name if category else "未知"
+            category_name = trans.category_name or "未知"
             
             # 设置金额颜色
             amount_str = f"¥{trans.amount:.2f}"
@@ -342,16 +347,15 @@ class FinanceApp(tk.Tk):
             for item in self.transaction_tree.get_children():
                 self.transaction_tree.delete(item)
             
-            # 获取最新的交易记录
-            transactions = Transaction.get_transactions_by_user(
-                user_id=self.current_user.user_id
-            )[:20]
+            # 获取最新的交易记录（已关联分类名称）
+            transactions = Transaction.get_transactions_with_category(
+                user_id=self.current_user.user_id,
+                limit=20
+            )
             
             # 重新填充数据
             for trans in transactions:
-                # 获取分类名称
-                category = Category.get_category_by_id(trans.category_id)
-                category_name = category.name if category else "未知"
+                category_name = trans.category_name or "未知"
                 
                 # 设置金额
                 amount_str = f"¥{trans.amount:.2f}"
@@ -449,7 +453,7 @@ class FinanceApp(tk.Tk):
             """保存交易记录"""
             # 验证金额
             try:
-                amount = float(amount_var.get())
+                amount = parse_money(amount_var.get())
                 if amount <= 0:
                     raise ValueError
             except ValueError:
@@ -556,13 +560,13 @@ class FinanceApp(tk.Tk):
             """保存预算设置"""
             try:
                 # 保存默认预算
-                default_budget = float(default_budget_var.get())
+                default_budget = parse_money(default_budget_var.get())
                 if default_budget < 0:
                     raise ValueError
                 self.current_user.set_budget(default_budget)
                 
                 # 保存本月预算
-                month_budget = float(month_budget_var.get())
+                month_budget = parse_money(month_budget_var.get())
                 if month_budget < 0:
                     raise ValueError
                 current_budget.amount = month_budget
@@ -929,6 +933,10 @@ class FinanceApp(tk.Tk):
         button_frame = ttk.Frame(dialog, padding=10)
         button_frame.pack(fill=tk.X)
         
+        # 每页条数与翻页游标（上一页最后一条记录的日期和交易ID）
+        page_size = 100
+        search_state = {"filters": None, "cursor": None}
+        
         def perform_search():
             """执行搜索"""
             # 清空现有数据
@@ -942,13 +950,13 @@ class FinanceApp(tk.Tk):
             
             # 解析金额
             try:
-                min_amount = float(min_amount_var.get()) if min_amount_var.get() else None
+                min_amount = parse_money(min_amount_var.get()) if min_amount_var.get() else None
             except ValueError:
                 messagebox.showerror("错误", "最小金额格式错误")
                 return
             
             try:
-                max_amount = float(max_amount_var.get()) if max_amount_var.get() else None
+                max_amount = parse_money(max_amount_var.get()) if max_amount_var.get() else None
             except ValueError:
                 messagebox.showerror("错误", "最大金额格式错误")
                 return
@@ -961,8 +969,8 @@ class FinanceApp(tk.Tk):
                 max_amount=max_amount
             )
             
-            # 执行搜索
-            transactions = Transaction.get_transactions_by_user(
+            # 执行搜索，只加载第一页
+            search_state["filters"] = dict(
                 user_id=self.current_user.user_id,
                 start_date=start_date,
                 end_date=end_date,
@@ -970,12 +978,23 @@ class FinanceApp(tk.Tk):
                 min_amount=min_amount,
                 max_amount=max_amount
             )
+            search_state["cursor"] = None
+            load_more()
+        
+        def load_more():
+            """从上一页末尾继续加载下一页结果"""
+            if search_state["filters"] is None:
+                return
+            
+            cursor = search_state["cursor"] or {}
+            # 一条查询同时取得分类名称
+            transactions = Transaction.get_transactions_with_category(
+                limit=page_size, **search_state["filters"], **cursor
+            )
             
             # 填充结果
             for trans in transactions:
-                # 获取分类名称
-                category = Category.get_category_by_id(trans.category_id)
-                category_name = category.name if category else "未知"
+                category_name = trans.category_name or "未知"
                 
                 tree.insert("", tk.END, values=(
                     trans.date,
@@ -984,60 +1003,91 @@ class FinanceApp(tk.Tk):
                     category_name,
                     trans.note or ""
                 ))
+            
+            if transactions:
+                search_state["cursor"] = {
+                    "after_date": transactions[-1].date,
+                    "after_id": transactions[-1].transaction_id
+                }
+            # 不足一页说明已经全部加载
+            more_btn.config(state=tk.NORMAL if len(transactions) == page_size else tk.DISABLED)
+        
+        # 加载更多按钮
+        more_btn = ttk.Button(button_frame, text="加载更多", command=load_more, state=tk.DISABLED)
+        more_btn.pack(side=tk.LEFT, padx=10)
         
         # 关闭按钮
         ttk.Button(button_frame, text="关闭", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
 
     def export_data(self):
-        """导出数据"""
-        try:
-            # 获取所有交易记录
-            transactions = Transaction.get_transactions_by_user(user_id=self.current_user.user_id)
-            
-            # 获取所有预算
-            budgets = Budget.get_all_budgets(user_id=self.current_user.user_id)
-            
-            # 整理数据
-            export_data = {
-                'user': {
-                    'username': self.current_user.username,
-                    'monthly_budget': self.current_user.monthly_budget
-                },
-                'transactions': [],
-                'budgets': []
-            }
-            
-            # 添加交易记录
-            for trans in transactions:
-                category = Category.get_category_by_id(trans.category_id)
-                export_data['transactions'].append({
-                    'id': trans.transaction_id,
-                    'date': trans.date,
-                    'amount': trans.amount,
-                    'type': trans.type,
-                    'category': category.name if category else "未知",
-                    'note': trans.note
-                })
-            
-            # 添加预算
-            for budget in budgets:
-                export_data['budgets'].append({
-                    'month': budget.month,
-                    'amount': budget.amount,
-                    'spent': budget.spent
-                })
-            
-            # 生成文件名
-            filename = f"finance_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(os.getcwd(), filename)
-            
-            # 保存数据
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
-            
-            messagebox.showinfo("成功", f"数据已导出至: {filepath}")
-        except Exception as e:
-            messagebox.showerror("错误", f"导出数据失败: {str(e)}")
+        """导出数据
+
+        导出在后台线程中流式进行，对话框显示进度并可取消，主窗口保持响应。
+        """
+        # 生成文件名
+        filename = f"finance_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filepath = os.path.join(os.getcwd(), filename)
+        
+        # 创建进度对话框
+        dialog = tk.Toplevel(self)
+        dialog.title("导出数据")
+        dialog.geometry("400x150")
+        dialog.resizable(False, False)
+        dialog.transient(self)
+        
+        status_var = tk.StringVar(value="正在导出...")
+        ttk.Label(dialog, textvariable=status_var).pack(pady=10)
+        progress_bar = ttk.Progressbar(dialog, length=320, mode="determinate")
+        progress_bar.pack(pady=5)
+        
+        cancel_event = threading.Event()
+        messages = queue.Queue()
+        
+        def worker():
+            """后台线程：执行导出，通过队列把进度和结果交给界面线程"""
+            try:
+                completed = export_json(
+                    self.current_user,
+                    filepath,
+                    progress=lambda done, total: messages.put(('progress', done, total)),
+                    cancel_event=cancel_event
+                )
+                messages.put(('done', completed, None))
+            except Exception as e:
+                messages.put(('error', e, None))
+        
+        def poll():
+            """界面线程：定时处理后台线程发来的消息"""
+            try:
+                while True:
+                    kind, value, total = messages.get_nowait()
+                    if kind == 'progress':
+                        progress_bar['maximum'] = max(total, 1)
+                        progress_bar['value'] = value
+                        status_var.set(f"正在导出... {value}/{total}")
+                    elif kind == 'done':
+                        dialog.destroy()
+                        if value:
+                            messagebox.showinfo("成功", f"数据已导出至: {filepath}")
+                        return
+                    else:
+                        dialog.destroy()
+                        messagebox.showerror("错误", f"导出数据失败: {str(value)}")
+                        return
+            except queue.Empty:
+                pass
+            dialog.after(100, poll)
+        
+        def cancel():
+            """取消导出"""
+            cancel_event.set()
+            status_var.set("正在取消...")
+        
+        ttk.Button(dialog, text="取消", command=cancel).pack(pady=10)
+        dialog.protocol("WM_DELETE_WINDOW", cancel)
+        
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
 
     def show_about(self):
         """显示关于对话框"""
@@ -1053,6 +1103,11 @@ class FinanceApp(tk.Tk):
             "© 2025 个人记账软件"
         )
 
+    def on_close(self):
+        """关闭窗口：关闭数据库连接（WAL 内容写回数据库文件）后退出"""
+        db_manager.close()
+        self.destroy()
+
     def handle_logout(self):
         """处理退出登录"""
         if messagebox.askyesno("确认", "确定要退出登录吗？"):
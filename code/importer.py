@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+银行流水导入模块
+以流式方式解析CSV/OFX/QIF账单，按规则匹配分类，指纹去重后批量写入
+"""
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from money import MAX_CENTS
+from transaction import Transaction, parse_date
+
+
+# CSV 各字段可识别的表头名称
+CSV_COLUMNS = {
+    'date': ['日期', '交易日期', '记账日期', 'date', 'posted date', 'transaction date'],
+    'amount': ['金额', '交易金额', 'amount'],
+    'type': ['类型', '收支类型', 'type'],
+    'note': ['备注', '摘要', '说明', '交易对方', 'note', 'memo', 'description', 'payee'],
+    'ref': ['流水号', '交易流水号', 'reference', 'id'],
+}
+
+# 交易类型列中表示收入/支出的取值
+INCOME_WORDS = {'收入', 'income', 'credit', 'cr'}
+EXPENSE_WORDS = {'支出', 'expense', 'debit', 'dr'}
+
+
+class CategoryRules:
+    """分类匹配规则
+
+    按顺序用关键字匹配备注，命中第一条规则即使用其分类；
+    都不命中时按收支类型使用默认分类。
+    """
+
+    def __init__(self, rules=None, default_expense='cat_8', default_income='cat_12'):
+        """初始化规则
+
+        Args:
+            rules: (关键字, 分类ID) 列表，关键字以're:'开头时按正则表达式匹配
+            default_expense: 未命中时支出使用的分类ID
+            default_income: 未命中时收入使用的分类ID
+        """
+        self.default_expense = default_expense
+        self.default_income = default_income
+        self._rules = []
+        for keyword, category_id in rules or []:
+            if keyword.startswith('re:'):
+                pattern = re.compile(keyword[3:], re.IGNORECASE)
+            else:
+                pattern = re.compile(re.escape(keyword), re.IGNORECASE)
+            self._rules.append((pattern, category_id))
+
+    def match(self, note, type):
+        """为一条记录选择分类
+
+        Args:
+            note: 备注/摘要
+            type: 交易类型（收入/支出）
+
+        Returns:
+            str: 分类ID
+        """
+        if note:
+            for pattern, category_id in self._rules:
+                if pattern.search(note):
+                    return category_id
+        return self.default_income if type == '收入' else self.default_expense
+
+
+def _parse_amount(value):
+    """解析金额文本，支持千分位、货币符号和括号表示的负数
+
+    NaN、无穷大以及超出数据库存储范围的金额视为无法解析，返回None。
+    """
+    text = str(value).strip().replace(',', '').replace('¥', '').replace('￥', '').replace('$', '')
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or abs(amount) * 100 > MAX_CENTS:
+        return None
+    return -amount if negative else amount
+
+
+def _record(date, amount, note=None, type=None, ref=None):
+    """组装统一的流水记录，金额为负表示支出
+
+    日期或金额无法解析时对应字段为None，由 _to_transactions 跳过并计数，
+    单条坏记录不会中断整个导入。
+    """
+    try:
+        amount = _parse_amount(amount) if amount is not None else None
+    except (ValueError, ArithmeticError):
+        amount = None
+    if amount is None:
+        return {'date': date, 'amount': None, 'type': type, 'note': note or '', 'ref': ref}
+    if type is None:
+        type = '支出' if amount < 0 else '收入'
+    return {'date': date, 'amount': abs(amount), 'type': type, 'note': note or '', 'ref': ref}
+
+
+def parse_csv(path, encoding='utf-8-sig', columns=None):
+    """流式解析CSV账单
+
+    Args:
+        path: 文件路径
+        encoding: 文件编码
+        columns: 字段名到表头名的映射，覆盖默认的 CSV_COLUMNS
+
+    Yields:
+        dict: 流水记录，包含 date/amount/type/note/ref，无法解析的日期或金额为None
+    """
+    aliases = dict(CSV_COLUMNS)
+    if columns:
+        aliases.update({field: [name] for field, name in columns.items()})
+
+    with open(path, newline='', encoding=encoding) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        normalized = [name.strip().lower() for name in header]
+        index = {}
+        for field, names in aliases.items():
+            for name in names:
+                if name.lower() in normalized:
+                    index[field] = normalized.index(name.lower())
+                    break
+        if 'date' not in index or 'amount' not in index:
+            raise ValueError(f"CSV缺少日期或金额列: {header}")
+
+        def get(row, field):
+            position = index.get(field)
+            return row[position].strip() if position is not None and position < len(row) else None
+
+        for row in reader:
+            if not row:
+                continue
+            type = None
+            type_text = (get(row, 'type') or '').lower()
+            if type_text in INCOME_WORDS:
+                type = '收入'
+            elif type_text in EXPENSE_WORDS:
+                type = '支出'
+            yield _record(get(row, 'date'), get(row, 'amount'), get(row, 'note'), type, get(row, 'ref'))
+
+
+def _ofx_date(value):
+    """把OFX日期（YYYYMMDDHHMMSS[.XXX][时区]）转换为标准格式，无法解析时返回None"""
+    digits = re.match(r'\d+', value or '')
+    if not digits or len(digits.group()) < 8:
+        return None
+    text = digits.group()[:14].ljust(14, '0')
+    try:
+        return datetime.strptime(text, '%Y%m%d%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def parse_ofx(path, encoding='utf-8'):
+    """流式解析OFX账单（兼容SGML与XML两种写法）
+
+    Yields:
+        dict: 流水记录，OFX的FITID作为ref，无法解析的日期或金额为None
+    """
+    tag_pattern = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+    current = None
+    with open(path, encoding=encoding, errors='replace') as f:
+        for line in f:
+            for closing, tag, value in tag_pattern.findall(line):
+                tag = tag.upper()
+                value = value.strip()
+                if tag == 'STMTTRN':
+                    if closing:
+                        if current is not None:
+                            yield _record(_ofx_date(current.get('DTPOSTED')), current.get('TRNAMT'),
+                                          current.get('NAME') or current.get('MEMO'), ref=current.get('FITID'))
+                        current = None
+                    else:
+                        current = {}
+                elif current is not None and not closing and value:
+                    current[tag] = value
+
+
+def _qif_date(value):
+    """解析QIF日期，如 01/05/2024、1/5'24"""
+    text = value.strip().replace("'", '/').replace(' ', '')
+    for fmt in ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    return None
+
+
+def parse_qif(path, encoding='utf-8'):
+    """流式解析QIF账单
+
+    Yields:
+        dict: 流水记录，无法解析的日期或金额为None
+    """
+    current = {}
+    with open(path, encoding=encoding, errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('!'):
+                continue
+            code, value = line[0], line[1:]
+            if code == '^':
+                if current:
+                    yield _record(_qif_date(current.get('D', '')), current.get('T') or current.get('U'),
+                                  current.get('P') or current.get('M'), ref=current.get('N'))
+                current = {}
+            else:
+                current[code] = value.strip()
+
+
+PARSERS = {
+    '.csv': parse_csv,
+    '.ofx': parse_ofx,
+    '.qfx': parse_ofx,
+    '.qif': parse_qif,
+}
+
+
+def parse_statement(path, format=None, encoding=None):
+    """按文件格式选择解析器
+
+    Args:
+        path: 文件路径
+        format: 文件格式，如'csv'、'ofx'、'qif'，默认按扩展名判断
+        encoding: 文件编码，默认使用各解析器的默认编码
+
+    Yields:
+        dict: 流水记录
+    """
+    extension = f".{format.lower()}" if format else os.path.splitext(path)[1].lower()
+    parser = PARSERS.get(extension)
+    if parser is None:
+        raise ValueError(f"不支持的账单格式: {extension}")
+    return parser(path, encoding=encoding) if encoding else parser(path)
+
+
+def fingerprint(user_id, date, type, amount, note, ref=None, occurrence=0):
+    """计算流水记录的去重指纹
+
+    有银行流水号时以流水号为准；否则使用日期、类型、带符号金额和备注哈希，
+    同金额的退款与消费不会冲突，并用 occurrence 区分完全相同的多笔交易。
+
+    Returns:
+        str: 十六进制指纹
+    """
+    if ref:
+        key = f"{user_id}|ref|{ref}"
+    else:
+        signed = amount if type == '收入' else -amount
+        note_hash = hashlib.sha1((note or '').encode('utf-8')).hexdigest()
+        key = f"{user_id}|{date}|{type}|{signed:.2f}|{note_hash}|{occurrence}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class _OccurrenceCounter:
+    """统计相同记录在本次导入中已出现的次数
+
+    当前日期的计数保存在内存中，日期变化时转存到临时数据库（以空文件名打开，
+    页面缓存大小固定，关闭后自动删除）。按日期排序的账单只写不读；
+    乱序账单再次出现已转存的日期时从临时数据库读取，内存占用与文件大小无关。
+    """
+
+    def __init__(self):
+        self._date = None
+        self._counts = {}
+        self._spilled = set()
+        self._store = None
+
+    def next(self, date, type, amount, note):
+        """记录一次出现
+
+        Returns:
+            int: 此前相同记录出现的次数，首次出现为0
+        """
+        if date != self._date:
+            self._spill()
+            self._date = date
+        key = (type, f"{amount:.2f}", note)
+        occurrence = self._counts.get(key)
+        if occurrence is None:
+            occurrence = self._load(key) if date in self._spilled else 0
+        self._counts[key] = occurrence + 1
+        return occurrence
+
+    def _spill(self):
+        """把当前日期的计数写入临时数据库"""
+        if not self._counts:
+            return
+        if self._store is None:
+            self._store = sqlite3.connect('')
+            self._store.execute(
+                """CREATE TABLE occurrences (date TEXT, type TEXT, amount TEXT, note TEXT, count INTEGER,
+                PRIMARY KEY (date, type, amount, note)) WITHOUT ROWID"""
+            )
+        self._store.executemany(
+            "INSERT OR REPLACE INTO occurrences VALUES (?, ?, ?, ?, ?)",
+            ((self._date, type, amount, note, count) for (type, amount, note), count in self._counts.items())
+        )
+        self._spilled.add(self._date)
+        self._counts = {}
+
+    def _load(self, key):
+        """读取已转存日期中某条记录的计数"""
+        row = self._store.execute(
+            "SELECT count FROM occurrences WHERE date = ? AND type = ? AND amount = ? AND note = ?",
+            (self._date,) + key
+        ).fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        """关闭并删除临时数据库"""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+def _to_transactions(records, user_id, rules, skipped):
+    """把流水记录转换为 bulk_add 使用的字典
+
+    日期按原始文本解析一次后复用。重复交易的计数在整个导入期间按
+    (日期, 类型, 金额, 备注) 累计，文件中不相邻的相同记录也能得到不同的序号，
+    参见 _OccurrenceCounter。日期或金额无法解析的记录跳过，条数累加到 skipped[0]。
+    """
+    last_raw, last_date = None, None
+    occurrences = _OccurrenceCounter()
+    try:
+        for record in records:
+            if record['date'] != last_raw:
+                last_raw, last_date = record['date'], parse_date(record['date'])
+            date = last_date
+            if date is None or record['amount'] is None:
+                skipped[0] += 1
+                continue
+            if record['amount'] == 0:
+                continue
+
+            occurrence = 0
+            if not record['ref']:
+                occurrence = occurrences.next(date, record['type'], record['amount'], record['note'])
+
+            yield {
+                'amount': record['amount'],
+                'type': record['type'],
+                'category_id': rules.match(record['note'], record['type']),
+                'date': date,
+                'note': record['note'],
+                'user_id': user_id,
+                'fingerprint': fingerprint(user_id, date, record['type'], record['amount'],
+                                           record['note'], record['ref'], occurrence),
+            }
+    finally:
+        occurrences.close()
+
+
+def import_statement(path, user_id, format=None, rules=None, encoding=None,
+                     chunk_size=1000, progress=None):
+    """导入银行账单
+
+    解析、分类、指纹计算全部以生成器串联，批量写入时每次只持有一个块，
+    大于内存的文件也能以固定内存导入。已导入过的记录会被跳过。
+
+    Args:
+        path: 账单文件路径
+        user_id: 用户ID
+        format: 文件格式，默认按扩展名判断
+        rules: CategoryRules 分类规则，默认全部归入其他收入/其他支出
+        encoding: 文件编码
+        chunk_size: 每批写入的条数
+        progress: 进度回调，参见 Transaction.bulk_add
+
+    Returns:
+        int: 新导入的条数
+
+    Raises:
+        ValueError: 不支持的格式或缺少必要的列
+        OSError: 文件读取失败，出错前已解析的记录仍会导入，参见 Transaction.bulk_add
+    """
+    skipped = [0]
+    records = parse_statement(path, format=format, encoding=encoding)
+    rows = _to_transactions(records, user_id, rules or CategoryRules(), skipped)
+    imported = Transaction.bulk_add(rows, chunk_size=chunk_size, progress=progress)
+    if skipped[0]:
+        print(f"账单中有 {skipped[0]} 条记录的日期或金额无法解析，已跳过")
+    return imported
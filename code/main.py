@@ -6,6 +6,7 @@
 import os
 import sys
 from database import db_manager
+from budget import Budget
 from gui import FinanceApp
 
 
@@ -14,9 +15,21 @@ def main():
     # 初始化数据库
     init_database()
     
-    # 启动应用
-    app = FinanceApp()
-    app.mainloop()
+    try:
+        # 命令行维护操作：重建每日汇总表或核对预算后退出
+        if '--rebuild-rollups' in sys.argv[1:]:
+            rebuild_rollups()
+            return
+        if '--reconcile-budgets' in sys.argv[1:]:
+            reconcile_budgets()
+            return
+        
+        # 启动应用
+        app = FinanceApp()
+        app.mainloop()
+    finally:
+        # 退出前关闭数据库连接
+        db_manager.close()
 
 
 def init_database():
@@ -27,7 +40,7 @@ def init_database():
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
         
-        # 初始化数据库
+        # 执行尚未应用的结构迁移（导入 database 模块时已初始化过，结构最新时只检查版本号）
         db_manager.init_database()
         print("数据库初始化成功")
     except Exception as e:
@@ -35,5 +48,23 @@ def init_database():
         sys.exit(1)
 
 
+def rebuild_rollups():
+    """重建每日汇总表"""
+    try:
+        count = db_manager.rebuild_rollups()
+        print(f"每日汇总表重建完成，共 {count} 行")
+    except Exception as e:
+        print(f"每日汇总表重建失败: {e}")
+        sys.exit(1)
+
+
+def reconcile_budgets():
+    """核对并修复所有预算的已花费金额"""
+    repaired = Budget.reconcile()
+    for budget_id, month, spent, actual in repaired:
+        print(f"预算 {month} ({budget_id}): {spent} -> {actual}")
+    print(f"预算核对完成，修复 {len(repaired)} 条")
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
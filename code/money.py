@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+金额模块
+数据库中金额以整数“分”存储，Python 代码中以 Decimal“元”表示，
+二者只在读写数据库时通过本模块转换，汇总不会产生浮点误差。
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+# 保留两位小数
+CENT = Decimal('0.01')
+
+# 数据库能存储的最大金额（分），即 SQLite INTEGER 的上限
+MAX_CENTS = 2 ** 63 - 1
+
+
+def to_cents(value):
+    """把金额（元）转换为整数分，四舍五入到分
+
+    Args:
+        value: 金额，可以是 Decimal、int、float 或数字字符串
+
+    Returns:
+        int: 分；value 为None时返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        # 先转为最短的十进制表示，避免 0.1 之类的二进制误差
+        value = repr(value)
+    return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """把整数分转换为金额（元）
+
+    Args:
+        cents: 分
+
+    Returns:
+        Decimal: 两位小数的金额；cents 为None时返回None
+    """
+    if cents is None:
+        return None
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def parse_money(text):
+    """解析用户输入的金额文本
+
+    Args:
+        text: 金额文本，如'12.5'
+
+    Returns:
+        Decimal: 两位小数的金额
+
+    Raises:
+        ValueError: 不是有效的金额
+    """
+    try:
+        value = Decimal(str(text).strip())
+    except InvalidOperation:
+        raise ValueError(f"无效的金额: {text}")
+    if not value.is_finite():
+        raise ValueError(f"无效的金额: {text}")
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
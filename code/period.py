@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统计周期模块
+把日、月、年周期转换为可走索引的日期范围
+"""
+from datetime import datetime, timedelta
+
+
+def period_range(period):
+    """把统计周期转换为左闭右开的日期范围 [start, end)
+
+    交易日期以'YYYY-MM-DD HH:MM:SS'文本存储，按字符串比较即按时间先后，
+    因此 date >= start AND date < end 可以直接使用 (user_id, type, date) 索引，
+    而 date LIKE 'YYYY-MM%' 在默认不区分大小写的 LIKE 下无法使用索引。
+
+    Args:
+        period: 'YYYY-MM-DD'（日）、'YYYY-MM'（月）或'YYYY'（年）
+
+    Returns:
+        tuple: (start, end)，均为'YYYY-MM-DD'格式
+
+    Raises:
+        ValueError: 周期格式无法识别
+    """
+    if len(period) == 10:
+        start = datetime.strptime(period, '%Y-%m-%d')
+        end = start + timedelta(days=1)
+    elif len(period) == 7:
+        start = datetime.strptime(period, '%Y-%m')
+        end = start.replace(year=start.year + 1, month=1) if start.month == 12 \
+            else start.replace(month=start.month + 1)
+    elif len(period) == 4:
+        start = datetime.strptime(period, '%Y')
+        end = start.replace(year=start.year + 1)
+    else:
+        raise ValueError(f"无法识别的统计周期: {period}")
+
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+只读记录模块
+查询结果使用基于元组的轻量记录类型，不带实例字典，
+大量读取时的内存占用和构造开销都远小于普通对象。
+需要修改数据时使用 Transaction、Category、Budget 等可变业务对象。
+
+金额字段保存数据库中的整数分（*_cents），同名属性按需转换为 Decimal 元。
+"""
+from collections import namedtuple
+
+from money import from_cents
+
+
+class TransactionRecord(namedtuple('TransactionRecord', [
+        'transaction_id', 'amount_cents', 'type', 'category_id', 'date', 'note', 'user_id',
+        'category_name', 'category_icon'])):
+    """交易记录，未关联分类查询时 category_name、category_icon 为None"""
+    __slots__ = ()
+
+    @property
+    def amount(self):
+        """金额（元）"""
+        return from_cents(self.amount_cents)
+
+
+class CategoryRecord(namedtuple('CategoryRecord', [
+        'category_id', 'name', 'type', 'icon', 'is_custom', 'user_id'])):
+    """分类记录"""
+    __slots__ = ()
+
+
+class BudgetRecord(namedtuple('BudgetRecord', [
+        'budget_id', 'user_id', 'month', 'amount_cents', 'spent_cents'])):
+    """预算记录"""
+    __slots__ = ()
+
+    @property
+    def amount(self):
+        """预算金额（元）"""
+        return from_cents(self.amount_cents)
+
+    @property
+    def spent(self):
+        """已花费金额（元）"""
+        return from_cents(self.spent_cents)
+
+    def get_remaining(self):
+        """获取剩余预算
+
+        Returns:
+            Decimal: 剩余金额
+        """
+        return self.amount - self.spent
+
+    def get_spent_percentage(self):
+        """获取已花费百分比
+
+        Returns:
+            float: 百分比值（0-100）
+        """
+        if self.amount_cents <= 0:
+            return 0
+        return self.spent_cents / self.amount_cents * 100
+
+
+class ChangeRecord(namedtuple('ChangeRecord', [
+        'seq', 'table_name', 'row_id', 'operation', 'user_id', 'changed_at'])):
+    """变更日志记录，operation 为 insert/update/delete"""
+    __slots__ = ()
+
+
+def row_factory(record_type):
+    """生成 sqlite3 的 row_factory，由游标直接把每行构造成记录
+
+    查询的列顺序和数量必须与记录字段一致。
+
+    Args:
+        record_type: 记录类型，如 TransactionRecord
+
+    Returns:
+        callable: row_factory(cursor, row)
+    """
+    new = tuple.__new__
+    return lambda cursor, row: new(record_type, row)
@@ -0,0 +1,47 @@
+import sys
+import os
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from database import db_manager
+from transaction import Transaction
+
+"""
+测试公共夹具
+"""
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """让全局 db_manager 使用临时数据库，测试结束后关闭连接"""
+    monkeypatch.setattr(db_manager, "db_path", str(tmp_path / "test.db"))
+    db_manager.init_database()
+    yield db_manager
+    db_manager.close()
+
+
+@pytest.fixture
+def test_db(temp_db):
+    """在临时数据库中创建测试用户 u_1，每月预算1000元"""
+    temp_db.execute_query(
+        "INSERT INTO users (user_id, username, password, monthly_budget) VALUES (?, ?, ?, ?)",
+        ("u_1", "tester", "pw", 100000),
+        commit=True
+    )
+    return temp_db
+
+
+@pytest.fixture
+def add_transaction(test_db):
+    """返回为测试用户 u_1 添加一笔交易的函数，添加失败时断言失败"""
+    def add(amount, date, type='支出', category_id='cat_1'):
+        transaction = Transaction(amount=amount, type=type, category_id=category_id,
+                                  date=date, note="", user_id="u_1")
+        assert transaction.add_transaction()
+        return transaction
+    return add
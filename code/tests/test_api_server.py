@@ -0,0 +1,174 @@
+import sys
+import os
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from api_benchmark import ApiClient, percentile
+from api_server import ApiServer
+
+"""
+REST API 服务测试
+验证：
+1. 注册、登录与令牌校验
+2. 交易的新增、游标分页与删除
+3. 数据按登录用户隔离
+4. 统计与预算接口
+"""
+
+
+@pytest.fixture
+def server(temp_db):
+    """在临时数据库上启动 API 服务"""
+    api = ApiServer(('127.0.0.1', 0))
+    thread = threading.Thread(target=api.serve_forever, daemon=True)
+    thread.start()
+    yield api.server_address
+    api.shutdown()
+    api.server_close()
+
+
+def _login(address, username):
+    client = ApiClient(*address)
+    status, _ = client.request('POST', '/api/register',
+                               {'username': username, 'password': 'pw', 'monthly_budget': '1000'})
+    assert status == 201
+    status, body = client.request('POST', '/api/login', {'username': username, 'password': 'pw'})
+    assert status == 200
+    client.token = body['token']
+    return client
+
+
+def _add(client, amount, date, type='支出', category_id='cat_1'):
+    status, body = client.request('POST', '/api/transactions', {
+        'amount': amount, 'type': type, 'category_id': category_id, 'date': date, 'note': ''})
+    assert status == 201
+    return body['id']
+
+
+def test_requires_login(server):
+    client = ApiClient(*server)
+    assert client.request('GET', '/api/transactions')[0] == 401
+
+    client.token = 'invalid'
+    assert client.request('GET', '/api/transactions')[0] == 401
+    assert client.request('POST', '/api/login', {'username': 'nobody', 'password': 'x'})[0] == 401
+    client.close()
+
+
+def test_register_rejects_duplicate(server):
+    _login(server, 'alice').close()
+    client = ApiClient(*server)
+    assert client.request('POST', '/api/register', {'username': 'alice', 'password': 'pw'})[0] == 409
+    client.close()
+
+
+def test_logout_revokes_token(server):
+    client = _login(server, 'alice')
+    assert client.request('POST', '/api/logout')[0] == 200
+    assert client.request('GET', '/api/categories')[0] == 401
+    client.close()
+
+
+def test_transactions_paginate_with_cursor(server):
+    client = _login(server, 'alice')
+    ids = [_add(client, 10 + i, f"2024-01-{i + 1:02d} 12:00:00") for i in range(5)]
+
+    status, first = client.request('GET', '/api/transactions?limit=2')
+    assert status == 200
+    assert [item['id'] for item in first['items']] == ids[:-3:-1]
+    assert first['items'][0]['amount'] == 14
+    assert first['items'][0]['category'] is not None
+
+    seen = [item['id'] for item in first['items']]
+    cursor = first['next_cursor']
+    while cursor:
+        status, page = client.request('GET', f"/api/transactions?limit=2&cursor={cursor}")
+        seen += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+    assert seen == ids[::-1]
+
+    assert client.request('GET', '/api/transactions?cursor=bad')[0] == 400
+    client.close()
+
+
+def test_add_transaction_validates_input(server):
+    client = _login(server, 'alice')
+    body = {'amount': '12.5', 'type': '支出', 'category_id': 'cat_1'}
+
+    assert client.request('POST', '/api/transactions', dict(body, amount='abc'))[0] == 400
+    assert client.request('POST', '/api/transactions', dict(body, amount='-1'))[0] == 400
+    assert client.request('POST', '/api/transactions', dict(body, type='其他'))[0] == 400
+    assert client.request('POST', '/api/transactions', dict(body, category_id='missing'))[0] == 400
+    assert client.request('POST', '/api/transactions', dict(body, date='2024-13-45'))[0] == 400
+    assert client.request('POST', '/api/transactions', dict(body, date='昨天'))[0] == 400
+    assert client.request('POST', '/api/transactions', dict(body, date=20240105))[0] == 400
+    assert client.request('POST', '/api/transactions', body)[0] == 201
+    assert client.request('POST', '/api/transactions', dict(body, date='2024-01-05'))[1]['date'] == '2024-01-05 00:00:00'
+    client.close()
+
+
+def test_data_scoped_to_user(server):
+    alice = _login(server, 'alice')
+    bob = _login(server, 'bob')
+    transaction_id = _add(alice, 30, "2024-01-05 12:00:00")
+
+    assert bob.request('GET', '/api/transactions')[1]['items'] == []
+    assert bob.request('DELETE', f"/api/transactions/{transaction_id}")[0] == 404
+    assert len(alice.request('GET', '/api/transactions')[1]['items']) == 1
+
+    assert alice.request('DELETE', f"/api/transactions/{transaction_id}")[0] == 200
+    assert alice.request('GET', '/api/transactions')[1]['items'] == []
+    alice.close()
+    bob.close()
+
+
+def test_stats_and_budget(server):
+    client = _login(server, 'alice')
+    _add(client, 30, "2024-01-05 12:00:00")
+    _add(client, '20.5', "2024-01-06 12:00:00")
+    _add(client, 500, "2024-01-07 12:00:00", type='收入', category_id='cat_9')
+
+    status, stats = client.request('GET', '/api/stats/monthly?period=2024-01')
+    assert status == 200
+    assert stats['total_expense'] == 50.5
+    assert stats['total_income'] == 500
+
+    status, budget = client.request('GET', '/api/budgets/2024-01')
+    assert status == 200
+    assert (budget['amount'], budget['spent'], budget['remaining']) == (1000, 50.5, 949.5)
+    assert client.request('GET', '/api/budgets')[1]['items'][0]['month'] == '2024-01'
+    client.close()
+
+
+def test_stats_rejects_invalid_period(server):
+    client = _login(server, 'alice')
+
+    for path in ('/api/stats/monthly?period=2024-01-05', '/api/stats/daily?period=2024-01',
+                 '/api/stats/yearly?period=24', '/api/stats/monthly?period=2024-13',
+                 '/api/stats/daily?period=2024-02-30'):
+        status, body = client.request('GET', path)
+        assert status == 400, path
+        assert body['error']
+    assert client.request('GET', '/api/stats/daily?period=2024-02-29')[0] == 200
+    assert client.request('GET', '/api/stats/yearly')[0] == 200
+    client.close()
+
+
+def test_unknown_route_and_method(server):
+    client = _login(server, 'alice')
+    assert client.request('GET', '/api/unknown')[0] == 404
+    assert client.request('DELETE', '/api/categories')[0] == 405
+    client.close()
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,172 @@
+import sys
+import os
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from async_database import AsyncDatabaseManager
+from database import db_manager
+from transaction import Transaction
+
+"""
+异步数据库模块测试
+验证：
+1. 查询、写入与流式读取在线程池中执行
+2. 异步工作单元的统一提交与回滚
+3. 业务接口的异步版本与同步版本结果一致
+"""
+
+
+def _run(coro_func):
+    """在新的事件循环中运行，结束后关闭线程池"""
+    async def main():
+        async with AsyncDatabaseManager(max_workers=2) as adb:
+            return await coro_func(adb)
+    return asyncio.run(main())
+
+
+def _insert_user_query(user_id):
+    return ("INSERT INTO users (user_id, username, password) VALUES (?, ?, ?)", (user_id, user_id, "pw"))
+
+
+def test_execute_and_fetch(test_db):
+    async def scenario(adb):
+        await adb.execute(*_insert_user_query("u_2"))
+        return await adb.fetch("SELECT user_id FROM users ORDER BY user_id")
+
+    assert _run(scenario) == [("u_1",), ("u_2",)]
+
+
+def test_fetch_iter_streams_all_rows(test_db):
+    async def scenario(adb):
+        for i in range(25):
+            await adb.execute(*_insert_user_query(f"u_x{i:02d}"))
+        return [row[0] async for row in adb.fetch_iter(
+            "SELECT user_id FROM users WHERE user_id LIKE 'u_x%' ORDER BY user_id", batch_size=10)]
+
+    assert _run(scenario) == [f"u_x{i:02d}" for i in range(25)]
+
+
+def test_transaction_commits_and_sees_pending_writes(test_db):
+    async def scenario(adb):
+        async with adb.transaction() as tx:
+            await tx.execute(*_insert_user_query("u_2"))
+            await tx.execute(*_insert_user_query("u_3"))
+            inside = await tx.fetch("SELECT COUNT(*) FROM users")
+            # 未提交前，其他读取看不到工作单元中的修改
+            outside = await adb.fetch("SELECT COUNT(*) FROM users")
+        return inside, outside, await adb.fetch("SELECT COUNT(*) FROM users")
+
+    assert _run(scenario) == ([(3,)], [(1,)], [(3,)])
+
+
+def test_transaction_rolls_back_on_error(test_db):
+    async def scenario(adb):
+        with pytest.raises(RuntimeError):
+            async with adb.transaction() as tx:
+                await tx.execute(*_insert_user_query("u_2"))
+                raise RuntimeError("boom")
+        return await adb.fetch("SELECT COUNT(*) FROM users")
+
+    assert _run(scenario) == [(1,)]
+
+
+def test_concurrent_writes_are_serialized(test_db):
+    async def scenario(adb):
+        async def add(n):
+            async with adb.transaction() as tx:
+                await tx.execute(*_insert_user_query(f"u_c{n}"))
+                count = (await tx.fetch("SELECT COUNT(*) FROM users WHERE user_id = ?", (f"u_c{n}",)))[0][0]
+                assert count == 1
+        await asyncio.gather(*(add(n) for n in range(50)),
+                             *(adb.fetch("SELECT COUNT(*) FROM users") for _ in range(50)))
+        return await adb.fetch("SELECT COUNT(*) FROM users")
+
+    assert _run(scenario) == [(51,)]
+
+
+def test_transaction_cancelled_while_beginning_is_rolled_back(test_db):
+    # 另一个连接持有写锁，使写线程上的 BEGIN IMMEDIATE 等待，在此期间取消工作单元
+    blocker = sqlite3.connect(db_manager.db_path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+
+    async def scenario(adb):
+        async def unit():
+            async with adb.transaction() as tx:
+                await tx.execute(*_insert_user_query("u_cancelled"))
+
+        task = asyncio.create_task(unit())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        blocker.rollback()
+
+        # 之后的写入必须单独提交，不能并入被取消的事务
+        await adb.execute(*_insert_user_query("u_2"))
+        return await adb.fetch("SELECT user_id FROM users ORDER BY user_id")
+
+    try:
+        assert _run(scenario) == [("u_1",), ("u_2",)]
+    finally:
+        blocker.close()
+
+
+def test_transaction_cancelled_while_committing_still_commits(test_db):
+    async def scenario(adb):
+        async def unit():
+            async with adb.transaction() as tx:
+                await tx.execute(*_insert_user_query("u_2"))
+                # 让写线程忙碌，提交排在其后等待时取消
+                adb._writer.submit(time.sleep, 0.3)
+
+        task = asyncio.create_task(unit())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await adb.execute(*_insert_user_query("u_3"))
+        return await adb.fetch("SELECT user_id FROM users ORDER BY user_id")
+
+    assert _run(scenario) == [("u_1",), ("u_2",), ("u_3",)]
+
+
+def test_lock_is_bound_to_one_event_loop(test_db):
+    adb = AsyncDatabaseManager(max_workers=1)
+    try:
+        asyncio.run(adb.execute(*_insert_user_query("u_2")))
+        with pytest.raises(RuntimeError):
+            asyncio.run(adb.execute(*_insert_user_query("u_3")))
+    finally:
+        adb.close()
+
+
+def test_business_counterparts(test_db):
+    for amount, date in [(30, "2024-01-05 12:00:00"), (20, "2024-01-06 09:00:00")]:
+        assert Transaction(amount=amount, type='支出', category_id='cat_1',
+                           date=date, user_id="u_1").add_transaction()
+    # 人为制造偏差，由 update_spent 重新汇总修复
+    db_manager.execute_query("UPDATE budgets SET spent = 0", commit=True)
+
+    async def scenario(adb):
+        records, stats, updated = await asyncio.gather(
+            adb.get_transactions_by_user("u_1", limit=1),
+            adb.calculate_monthly_stats("u_1", "2024-01"),
+            adb.update_spent("u_1", "2024-01"),
+        )
+        spent = await adb.fetch("SELECT spent FROM budgets WHERE user_id = ? AND month = ?", ("u_1", "2024-01"))
+        return records, stats, updated, spent
+
+    records, stats, updated, spent = _run(scenario)
+    assert [record.amount for record in records] == [20]
+    assert stats['total_expense'] == 50
+    assert updated is True
+    assert spent == [(5000,)]
@@ -0,0 +1,77 @@
+import sys
+import os
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from database import db_manager
+from category import Category, category_registry
+
+"""
+分类模块测试
+验证分类缓存只查询一次，并在分类写入后失效
+"""
+
+
+@pytest.fixture
+def query_log(temp_db, monkeypatch):
+    """在临时数据库上统计查询次数"""
+    calls = []
+    original = db_manager.execute_query
+    monkeypatch.setattr(db_manager, "execute_query",
+                        lambda *args, **kwargs: calls.append(args[0]) or original(*args, **kwargs))
+    yield calls
+
+
+def test_categories_loaded_once(query_log):
+    expense = Category.get_all_categories("u_1", "支出类")
+    income = Category.get_all_categories("u_1", "收入类")
+    for category in expense + income:
+        assert Category.get_category_by_id(category.category_id) is category
+
+    assert len(query_log) == 1
+    assert {c.type for c in expense} == {"支出类"}
+    assert {c.type for c in income} == {"收入类"}
+    assert Category.get_category_by_id("cat_missing") is None
+
+
+def test_preset_categories_exclude_custom(query_log):
+    custom = Category(name="宠物", type="支出类", icon="🐶", user_id="u_1")
+    assert custom.add_custom_category()
+
+    assert custom.category_id not in {c.category_id for c in Category.get_preset_categories("支出类")}
+    assert custom.category_id in {c.category_id for c in Category.get_all_categories("u_1", "支出类")}
+    assert custom.category_id not in {c.category_id for c in Category.get_all_categories("u_2", "支出类")}
+
+
+def test_writes_invalidate_cache(query_log):
+    Category.get_all_categories("u_1")
+
+    custom = Category(name="宠物", type="支出类", icon="🐶", user_id="u_1")
+    assert custom.add_custom_category()
+    assert Category.get_category_by_id(custom.category_id).name == "宠物"
+
+    custom.name = "猫粮"
+    assert custom.update()
+    assert Category.get_category_by_id(custom.category_id).name == "猫粮"
+    assert "猫粮" in [c.name for c in Category.get_all_categories("u_1", "支出类")]
+
+    assert custom.delete()
+    assert Category.get_category_by_id(custom.category_id) is None
+    assert custom.category_id not in {c.category_id for c in Category.get_all_categories("u_1")}
+
+
+def test_switch_database_clears_cache(query_log, tmp_path):
+    Category.get_all_categories("u_1")
+    before = len(query_log)
+
+    db_manager.db_path = str(tmp_path / "other.db")
+    db_manager.init_database()
+    Category.get_all_categories("u_1")
+
+    assert len(query_log) > before
+    assert category_registry._db_path == db_manager.db_path
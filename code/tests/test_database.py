@@ -0,0 +1,599 @@
+import sys
+import os
+import sqlite3
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+import database
+from database import ConnectionPool, DatabaseManager, MANAGED_INDEXES, SCHEMA_VERSION, db_manager
+from budget import Budget
+from category import Category
+from finance_stats import Statistics, stats_cache
+from transaction import Transaction
+from user import User
+
+"""
+数据库模块测试
+验证：
+1. 连接池复用、健康检查与多线程借用
+2. 切换数据库文件时连接池重建
+3. 工作单元的统一提交与回滚
+4. 热点查询走索引，不退化为全表扫描
+5. 变更日志按顺序记录交易、预算和分类的写入
+"""
+
+
+@pytest.fixture
+def db(tmp_path):
+    """在临时目录中创建独立的数据库管理器"""
+    manager = DatabaseManager(str(tmp_path / "test_database.db"), pool_size=2)
+    yield manager
+    manager.close()
+
+
+# -------------------- 连接池 --------------------
+
+def test_pool_reuses_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    pool.close()
+
+
+def test_pool_replaces_broken_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+
+    conn = pool.acquire()
+    pool.release(conn)
+    # 模拟连接失效
+    conn.close()
+
+    with pool.connection() as fresh:
+        assert fresh is not conn
+        assert fresh.execute("SELECT 1").fetchone() == (1,)
+    pool.close()
+
+
+def test_pool_waits_when_exhausted(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.1)
+
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+
+    pool.release(conn)
+    assert pool.acquire() is conn
+    pool.close()
+
+
+def test_pool_rolls_back_on_release(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close()
+
+
+def test_pool_applies_pragmas(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, pragmas={'journal_mode': 'WAL', 'busy_timeout': 1234})
+
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert conn.execute("PRAGMA busy_timeout").fetchone() == (1234,)
+    pool.close()
+
+    with pytest.raises(ValueError):
+        ConnectionPool(str(tmp_path / "pool.db"), pragmas={'journal_mode; DROP TABLE users': 'WAL'}).acquire()
+
+
+# -------------------- 数据库管理器 --------------------
+
+def test_default_pragma_profile(db):
+    with db._write_pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert conn.execute("PRAGMA synchronous").fetchone() == (1,)  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone() == (2,)  # MEMORY
+        assert conn.execute("PRAGMA busy_timeout").fetchone() == (5000,)
+
+
+def test_legacy_pragma_profile(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "legacy_journal.db"), pragmas=database.LEGACY_PRAGMAS)
+    assert manager.execute_query("PRAGMA journal_mode") == [("delete",)]
+    assert manager.checkpoint() == (0, -1, -1)
+    manager.close()
+
+
+def test_wal_reader_not_blocked_by_writer(db):
+    _insert_user(db, "u_1")
+    with db.transaction():
+        _insert_user(db, "u_2")
+        # 写事务未提交时，其他线程仍可从只读连接读取已提交的数据
+        counts = []
+        reader = threading.Thread(
+            target=lambda: counts.append(db.execute_query("SELECT COUNT(*) FROM users")[0][0]))
+        reader.start()
+        reader.join()
+        assert counts == [1]
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 2
+
+
+def test_checkpoint_truncates_wal(db, tmp_path):
+    for i in range(50):
+        _insert_user(db, f"u_{i}")
+    wal_path = db.db_path + "-wal"
+    assert os.path.getsize(wal_path) > 0
+
+    busy, _, _ = db.checkpoint('TRUNCATE')
+    assert busy == 0
+    assert os.path.getsize(wal_path) == 0
+
+    with pytest.raises(ValueError):
+        db.checkpoint('NOW')
+
+
+def test_execute_query_across_threads(db):
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                db.execute_query(
+                    "INSERT INTO users (user_id, username, password) VALUES (?, ?, ?)",
+                    (f"u_{n}_{i}", f"name_{n}_{i}", "pw"),
+                    commit=True
+                )
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 80
+
+
+def test_read_connections_use_mmap(db):
+    with db._read_pool.connection() as conn:
+        assert conn.execute("PRAGMA mmap_size").fetchone() == (database.READ_MMAP_SIZE,)
+        assert conn.execute("PRAGMA query_only").fetchone() == (1,)
+        # 只读连接以 mode=ro 打开，不能写入
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM categories")
+    assert db.mmap_enabled is True
+
+
+def test_read_falls_back_to_page_cache(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "no_mmap.db"), read_mmap_size=0)
+
+    assert list(manager.iter_query("SELECT 1")) == [(1,)]
+    assert manager.mmap_enabled is False
+    with manager._read_pool.connection() as conn:
+        assert conn.execute("PRAGMA cache_size").fetchone() == (-database.READ_CACHE_SIZE,)
+    manager.close()
+
+
+def test_queries_routed_by_statement(db, monkeypatch):
+    used = []
+    for name in ('_write_pool', '_read_pool'):
+        pool = getattr(db, name)
+        monkeypatch.setattr(pool, 'acquire', lambda acquire=pool.acquire, name=name: used.append(name) or acquire())
+
+    db.execute_query("SELECT COUNT(*) FROM users")
+    list(db.iter_query("  with t AS (SELECT 1) SELECT * FROM t"))
+    _insert_user(db, "u_1")
+    db.execute_many("UPDATE users SET monthly_budget = ? WHERE user_id = ?", [(1, "u_1")])
+    db.execute_query("PRAGMA user_version")
+
+    assert used == ['_read_pool', '_read_pool', '_write_pool', '_write_pool', '_write_pool']
+
+
+def test_concurrent_writers_and_readers(db):
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(50):
+                with db.transaction():
+                    _insert_user(db, f"u_{n}_{i}")
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(50):
+                db.execute_query("SELECT COUNT(*) FROM users")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 写操作在唯一的写连接上排队，不会出现 database is locked
+    assert errors == []
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 200
+
+
+def test_switch_db_path_rebuilds_pool(db, tmp_path):
+    old_pool = db._write_pool
+    db.db_path = str(tmp_path / "other.db")
+    db.init_database()
+
+    assert db._write_pool is not old_pool
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 0
+
+
+# -------------------- 工作单元 --------------------
+
+def _insert_user(db, user_id):
+    db.execute_query(
+        "INSERT INTO users (user_id, username, password) VALUES (?, ?, ?)",
+        (user_id, user_id, "pw"),
+        commit=True
+    )
+
+
+def test_read_in_transaction_sees_pending_writes(db):
+    with db.transaction():
+        _insert_user(db, "u_1")
+        assert db.execute_query("SELECT COUNT(*) FROM users") == [(1,)]
+
+
+def test_transaction_commits_once(db):
+    with db.transaction() as conn:
+        _insert_user(db, "u_1")
+        _insert_user(db, "u_2")
+        # 范围内的 commit=True 不会提前提交
+        assert conn.in_transaction
+        assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 2
+
+    assert not db.in_transaction()
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 2
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            _insert_user(db, "u_1")
+            raise RuntimeError("boom")
+
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 0
+
+
+def test_nested_transaction_joins_outer(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as outer:
+            with db.transaction() as inner:
+                assert inner is outer
+                _insert_user(db, "u_1")
+            raise RuntimeError("boom")
+
+    assert db.execute_query("SELECT COUNT(*) FROM users")[0][0] == 0
+
+
+def _downgrade_to_pre_rollups(path):
+    """模拟升级前没有汇总表的数据库（结构版本4）"""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        DROP TABLE daily_rollups;
+        DROP TRIGGER IF EXISTS trg_transactions_rollup_insert;
+        DROP TRIGGER IF EXISTS trg_transactions_rollup_delete;
+        DROP TRIGGER IF EXISTS trg_transactions_rollup_update;
+        PRAGMA user_version = 4;
+    ''')
+    conn.close()
+
+
+def _insert_transactions(manager, count):
+    manager.execute_many(
+        "INSERT INTO transactions (transaction_id, amount, type, category_id, date, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"t_{i}", 100 + i, "支出", "cat_1", f"2024-01-{i % 3 + 1:02d} 10:00:00", "u_1") for i in range(count)]
+    )
+
+
+def test_init_backfills_rollups_in_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    manager = DatabaseManager(path)
+    _insert_transactions(manager, 7)
+    expected = manager.execute_query("SELECT * FROM daily_rollups ORDER BY day")
+    manager.close()
+    _downgrade_to_pre_rollups(path)
+
+    monkeypatch.setattr(database, "MIGRATION_BATCH_SIZE", 2)
+    manager = DatabaseManager(path)
+    assert manager.execute_query("SELECT * FROM daily_rollups ORDER BY day") == expected
+    assert manager.execute_query("PRAGMA user_version") == [(SCHEMA_VERSION,)]
+    assert manager.execute_query("SELECT * FROM migration_progress") == []
+    manager.close()
+
+
+def test_interrupted_backfill_resumes(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    manager = DatabaseManager(path)
+    _insert_transactions(manager, 7)
+    expected = manager.execute_query("SELECT * FROM daily_rollups ORDER BY day")
+    manager.close()
+    _downgrade_to_pre_rollups(path)
+
+    # 最后一批失败：之前的批次已提交，进度保留，结构版本不变
+    monkeypatch.setattr(database, "MIGRATION_BATCH_SIZE", 2)
+    monkeypatch.setattr(database, "ROLLUP_TRIGGERS", ["CREATE TRIGGER broken"])
+    with pytest.raises(sqlite3.OperationalError):
+        DatabaseManager(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone() == (4,)
+    assert conn.execute("SELECT position FROM migration_progress").fetchone()[0] > 0
+    conn.close()
+
+    # 再次启动从断点继续，结果与一次性回填相同
+    monkeypatch.undo()
+    monkeypatch.setattr(database, "MIGRATION_BATCH_SIZE", 2)
+    manager = DatabaseManager(path)
+    assert manager.execute_query("SELECT * FROM daily_rollups ORDER BY day") == expected
+    assert manager.execute_query(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_transactions_rollup_%'"
+    ) == [(3,)]
+    manager.close()
+
+
+def test_retired_indexes_dropped_on_upgrade(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    DatabaseManager(path).close()
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE INDEX idx_transactions_user_date_category
+            ON transactions (user_id, date, type, category_id, amount);
+        PRAGMA user_version = 7;
+    ''')
+    conn.close()
+
+    manager = DatabaseManager(path)
+    names = {row[0] for row in manager.execute_query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_transactions_user_date_category" not in names
+    assert manager.execute_query("PRAGMA user_version") == [(SCHEMA_VERSION,)]
+    manager.close()
+
+
+def test_current_schema_skips_migrations(db, monkeypatch):
+    def fail(*args):
+        raise AssertionError("migrations should not run")
+    monkeypatch.setattr(DatabaseManager, "_migrate", fail)
+
+    db.init_database()
+    assert db.execute_query("PRAGMA user_version") == [(SCHEMA_VERSION,)]
+
+
+def _create_legacy_database(path):
+    """按升级前的结构（金额为REAL元、没有指纹列和汇总表）创建数据库"""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE users (user_id TEXT PRIMARY KEY, username TEXT NOT NULL UNIQUE, password TEXT NOT NULL,
+            monthly_budget REAL DEFAULT 0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE transactions (transaction_id TEXT PRIMARY KEY, amount REAL NOT NULL, type TEXT NOT NULL,
+            category_id TEXT NOT NULL, date TEXT NOT NULL, note TEXT, user_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE budgets (budget_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, month TEXT NOT NULL,
+            amount REAL NOT NULL, spent REAL DEFAULT 0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE (user_id, month));
+        CREATE INDEX idx_transactions_user_date ON transactions (user_id, date);
+        INSERT INTO users (user_id, username, password, monthly_budget) VALUES ('u_1', 'tester', 'pw', 1500.5);
+        INSERT INTO transactions (transaction_id, amount, type, category_id, date, note, user_id)
+            VALUES ('t_1', 12.34, '支出', 'cat_1', '2024-01-05 10:00:00', '午饭', 'u_1'),
+                   ('t_2', 0.1, '支出', 'cat_1', '2024-01-05 18:00:00', NULL, 'u_1'),
+                   ('t_3', 8000, '收入', 'cat_9', '2024-01-10 09:00:00', NULL, 'u_1');
+        INSERT INTO budgets (budget_id, user_id, month, amount, spent) VALUES ('b_1', 'u_1', '2024-01', 2000, 12.44);
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def test_init_migrates_real_amounts_to_cents(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy_money.db")
+    _create_legacy_database(path)
+    # 小批次，覆盖分批复制
+    monkeypatch.setattr(database, "MIGRATION_BATCH_SIZE", 2)
+
+    manager = DatabaseManager(path)
+    column_types = {
+        (table, row[1]): row[2]
+        for table in ("users", "transactions", "budgets")
+        for row in manager.execute_query(f"PRAGMA table_info({table})")
+    }
+    assert column_types[("transactions", "amount")] == "INTEGER"
+    assert column_types[("budgets", "spent")] == "INTEGER"
+    assert column_types[("users", "monthly_budget")] == "INTEGER"
+
+    assert manager.execute_query("SELECT transaction_id, amount, note FROM transactions ORDER BY transaction_id") == [
+        ("t_1", 1234, "午饭"), ("t_2", 10, None), ("t_3", 800000, None)
+    ]
+    assert manager.execute_query("SELECT amount, spent FROM budgets") == [(200000, 1244)]
+    assert manager.execute_query("SELECT monthly_budget FROM users") == [(150050,)]
+    assert manager.execute_query("SELECT day, type, total, count FROM daily_rollups ORDER BY day") == [
+        ("2024-01-05", "支出", 1244, 2), ("2024-01-10", "收入", 800000, 1)
+    ]
+
+    # 迁移后触发器和索引重新生效
+    manager.execute_query(
+        "INSERT INTO transactions (transaction_id, amount, type, category_id, date, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ("t_4", 56, "支出", "cat_1", "2024-01-05 20:00:00", "u_1"),
+        commit=True
+    )
+    assert manager.execute_query("SELECT total FROM daily_rollups WHERE day = '2024-01-05'") == [(1300,)]
+    names = {row[0] for row in manager.execute_query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {name for name, _ in MANAGED_INDEXES} <= names
+    assert "idx_transactions_user_date" not in names
+    manager.close()
+
+    # 再次打开时不会重复迁移
+    manager = DatabaseManager(path)
+    assert manager.execute_query("SELECT amount FROM transactions WHERE transaction_id = 't_1'") == [(1234,)]
+    manager.close()
+
+
+# -------------------- 索引与查询计划 --------------------
+
+# 各业务模块中的热点查询：(名称, 调用业务函数)，测试时记录其实际执行的只读语句
+HOT_QUERIES = [
+    # 预算/超支检查：按类型汇总
+    ("预算汇总", lambda: Budget(user_id="u_1", month="2024-01").update_spent()),
+    ("超支检查", lambda: User(user_id="u_1").check_overspending("2024-01")),
+    # 统计：单遍周期汇总
+    ("月度统计", lambda: Statistics("u_1").calculate_monthly_stats("2024-01")),
+    # 趋势
+    ("趋势", lambda: Statistics("u_1").get_trends()),
+    # 交易列表（关联分类，分页）
+    ("交易列表", lambda: Transaction.get_transactions_with_category("u_1", limit=20)),
+    # 交易列表游标翻页
+    ("交易翻页", lambda: Transaction.get_transactions_by_user(
+        "u_1", limit=20, after_date="2024-01-05 10:00:00", after_id="t_1")),
+    # 删除分类前的引用检查
+    ("分类引用检查", lambda: Category(category_id="c_1", is_custom=True, user_id="u_1").delete()),
+]
+
+
+@pytest.fixture
+def hot_db(temp_db, monkeypatch):
+    """在临时数据库上返回记录业务函数实际执行的只读语句的函数"""
+    stats_cache.clear()
+
+    def capture(call):
+        captured = []
+
+        def wrap(original):
+            def wrapper(query, params=(), *args, **kwargs):
+                if db_manager._is_read(query):
+                    captured.append((query, tuple(params)))
+                return original(query, params, *args, **kwargs)
+            return wrapper
+
+        with monkeypatch.context() as patch:
+            patch.setattr(db_manager, "execute_query", wrap(db_manager.execute_query))
+            patch.setattr(db_manager, "iter_query", wrap(db_manager.iter_query))
+            call()
+        assert captured, "业务函数没有执行任何查询"
+        return captured
+
+    return capture
+
+
+def test_managed_indexes_created(db):
+    names = {row[0] for row in db.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions'"
+    )}
+    assert {name for name, _ in MANAGED_INDEXES} <= names
+
+
+@pytest.mark.parametrize("name, call", HOT_QUERIES, ids=[name for name, _ in HOT_QUERIES])
+def test_hot_queries_use_index(hot_db, name, call):
+    for query, params in hot_db(call):
+        assert db_manager.find_full_scans(query, params) == [], query
+
+
+def test_period_filter_uses_index_range(hot_db):
+    query, params = next(q for q in hot_db(HOT_QUERIES[0][1]) if "daily_rollups" in q[0])
+    plan = db_manager.explain_query_plan(query, params)
+    assert "day>? AND day<?" in plan[0]
+
+
+@pytest.mark.parametrize("name, call", HOT_QUERIES[4:6], ids=[name for name, _ in HOT_QUERIES[4:6]])
+def test_transaction_pages_avoid_sort(hot_db, name, call):
+    # 分页查询直接按索引顺序读取，不对用户全部交易排序
+    for query, params in hot_db(call):
+        assert not any("TEMP B-TREE" in step for step in db_manager.explain_query_plan(query, params))
+
+
+def test_find_full_scans_detects_scan(db):
+    scans = db.find_full_scans("SELECT * FROM transactions WHERE note = ?", ("x",))
+    assert scans and scans[0].startswith("SCAN transactions")
+
+
+# -------------------- 变更日志 --------------------
+
+def _changes(db, seq=0, **filters):
+    return [(c.table_name, c.operation) for c in db.changes_since(seq, **filters)]
+
+
+def test_transaction_writes_recorded_in_change_log(test_db, add_transaction):
+    start = test_db.latest_change_seq()
+    transaction = add_transaction(30, "2024-01-05 12:00:00")
+    transaction.amount = 40
+    assert transaction.edit_transaction()
+    assert transaction.delete_transaction()
+
+    changes = test_db.changes_since(start, tables=['transactions'])
+    assert [(c.operation, c.row_id, c.user_id) for c in changes] == [
+        ('insert', transaction.transaction_id, 'u_1'),
+        ('update', transaction.transaction_id, 'u_1'),
+        ('delete', transaction.transaction_id, 'u_1'),
+    ]
+    seqs = [c.seq for c in test_db.changes_since(start)]
+    assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    # 支出同时更新了预算
+    assert ('budgets', 'update') in _changes(test_db, start)
+
+
+def test_budget_and_category_writes_recorded(test_db):
+    start = test_db.latest_change_seq()
+    budget = Budget(user_id="u_1", month="2024-03", amount=800)
+    assert budget.save()
+    budget.amount = 900
+    assert budget.save()
+    category = Category(name='咖啡', type='支出类', icon='☕', user_id="u_1")
+    assert category.add_custom_category()
+    category.name = '咖啡茶饮'
+    assert category.update()
+    assert category.delete()
+
+    assert _changes(test_db, start) == [
+        ('budgets', 'insert'), ('budgets', 'update'),
+        ('categories', 'insert'), ('categories', 'update'), ('categories', 'delete'),
+    ]
+
+
+def test_changes_since_filters_and_pages(test_db, add_transaction):
+    test_db.execute_query(
+        "INSERT INTO users (user_id, username, password) VALUES (?, ?, ?)", ("u_2", "other", "pw"), commit=True
+    )
+    start = test_db.latest_change_seq()
+    add_transaction(500, "2024-01-06", type='收入', category_id='cat_9')
+    other = Transaction(amount=10, type='收入', category_id='cat_9', date="2024-01-06", user_id="u_2")
+    assert other.add_transaction()
+
+    assert [c.user_id for c in test_db.changes_since(start, user_id="u_2")] == ["u_2"]
+    first = test_db.changes_since(start, limit=1)
+    rest = test_db.changes_since(first[-1].seq)
+    assert [c.user_id for c in first + rest] == ["u_1", "u_2"]
+
+
+def test_prune_change_log_keeps_sequence(test_db, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+    latest = test_db.latest_change_seq()
+
+    assert test_db.prune_change_log(latest) > 0
+    assert test_db.changes_since(0) == []
+
+    add_transaction(20, "2024-01-06 12:00:00")
+    # 删除后序号不会复用
+    assert test_db.changes_since(0)[0].seq > latest
@@ -0,0 +1,61 @@
+import sys
+import os
+import json
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from user import User
+from transaction import Transaction
+from exporter import export_json
+
+"""
+数据导出测试
+验证流式导出的内容、进度回调与取消
+"""
+
+
+@pytest.fixture
+def user(temp_db):
+    """在临时数据库中创建带交易记录的测试用户"""
+    user = User(username="tester", password="pw", monthly_budget=1000)
+    assert user.register()
+
+    rows = [{'amount': i + 1, 'type': '支出', 'category_id': 'cat_1', 'date': f"2024-01-{i % 28 + 1:02d}",
+             'note': f"第{i}笔", 'user_id': user.user_id} for i in range(25)]
+    rows.append({'amount': 5, 'type': '支出', 'category_id': 'missing', 'date': "2024-02-01",
+                 'user_id': user.user_id})
+    Transaction.bulk_add(rows)
+    return user
+
+
+def test_export_json_streams_all_rows(user, tmp_path):
+    path = str(tmp_path / "export.json")
+    reports = []
+
+    assert export_json(user, path, progress=lambda done, total: reports.append((done, total)), batch_size=10)
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['user'] == {'username': "tester", 'monthly_budget': 1000}
+    assert len(data['transactions']) == 26
+    assert data['transactions'][0]['category'] == "未知"
+    assert {t['category'] for t in data['transactions'][1:]} == {"餐饮"}
+    assert [b['month'] for b in data['budgets']] == ["2024-02", "2024-01"]
+    assert reports == [(10, 26), (20, 26), (26, 26)]
+    assert not os.path.exists(path + '.part')
+
+
+def test_export_json_cancel_leaves_no_file(user, tmp_path):
+    path = str(tmp_path / "export.json")
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    assert export_json(user, path, cancel_event=cancel_event, batch_size=10) is False
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + '.part')
@@ -0,0 +1,172 @@
+import sys
+import os
+from decimal import Decimal
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from transaction import Transaction
+from budget import Budget
+from importer import CategoryRules, import_statement, parse_csv, parse_ofx, parse_qif, _OccurrenceCounter
+
+"""
+银行流水导入测试
+验证CSV/OFX/QIF解析、分类规则匹配和重复导入去重
+"""
+
+CSV_CONTENT = """交易日期,摘要,金额,流水号
+2024-01-05 12:00:00,星巴克咖啡,-35.00,
+2024-01-05 12:00:00,星巴克咖啡,-35.00,
+2024/01/06,工资,"8,000.00",
+2024-01-07,地铁,(4.00),
+"""
+
+OFX_CONTENT = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000[-5:EST]
+<TRNAMT>-12.50
+<FITID>A001
+<NAME>Coffee Shop
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>100.00<FITID>A002<NAME>Salary</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF_CONTENT = """!Type:Bank
+D01/05/2024
+T-20.00
+PGrocery
+^
+D1/6'24
+T300.00
+PRefund
+^
+"""
+
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_parse_csv(tmp_path):
+    records = list(parse_csv(_write(tmp_path, "s.csv", CSV_CONTENT)))
+
+    assert [(r['type'], float(r['amount'])) for r in records] == [
+        ('支出', 35.0), ('支出', 35.0), ('收入', 8000.0), ('支出', 4.0)
+    ]
+    assert records[0]['note'] == "星巴克咖啡"
+
+
+def test_parse_ofx(tmp_path):
+    records = list(parse_ofx(_write(tmp_path, "s.ofx", OFX_CONTENT)))
+
+    assert [(r['date'], r['type'], float(r['amount']), r['ref']) for r in records] == [
+        ("2024-01-05 12:00:00", '支出', 12.5, "A001"),
+        ("2024-01-06 00:00:00", '收入', 100.0, "A002"),
+    ]
+
+
+def test_parse_qif(tmp_path):
+    records = list(parse_qif(_write(tmp_path, "s.qif", QIF_CONTENT)))
+
+    assert [(r['date'], r['type'], r['note']) for r in records] == [
+        ("2024-01-05 00:00:00", '支出', "Grocery"),
+        ("2024-01-06 00:00:00", '收入', "Refund"),
+    ]
+
+
+def test_category_rules():
+    rules = CategoryRules([("咖啡", "cat_1"), (r"re:^地铁|公交", "cat_2")])
+
+    assert rules.match("星巴克咖啡", '支出') == "cat_1"
+    assert rules.match("地铁", '支出') == "cat_2"
+    assert rules.match("工资", '收入') == "cat_12"
+    assert rules.match("", '支出') == "cat_8"
+
+
+def test_import_statement_skips_duplicates(test_db, tmp_path):
+    path = _write(tmp_path, "s.csv", CSV_CONTENT)
+    rules = CategoryRules([("咖啡", "cat_1"), ("地铁", "cat_2"), ("工资", "cat_9")])
+
+    # 同一天两笔相同的咖啡消费都应导入
+    assert import_statement(path, "u_1", rules=rules, chunk_size=2) == 4
+    assert import_statement(path, "u_1", rules=rules) == 0
+
+    transactions = Transaction.get_transactions_by_user("u_1")
+    assert sorted(t.category_id for t in transactions) == ["cat_1", "cat_1", "cat_2", "cat_9"]
+    assert Budget(user_id="u_1", month="2024-01").spent == 74
+
+
+def test_import_ofx_dedup_by_fitid(test_db, tmp_path):
+    path = _write(tmp_path, "s.ofx", OFX_CONTENT)
+
+    assert import_statement(path, "u_1") == 2
+    assert import_statement(path, "u_1") == 0
+
+
+def test_refund_and_purchase_get_distinct_fingerprints(test_db, tmp_path):
+    # 同一天同金额同备注的退款和消费是两笔不同的交易，分两次导入也不应被当作重复
+    purchase = _write(tmp_path, "purchase.csv", "交易日期,摘要,金额,流水号\n2024-01-05,网购,-99.00,\n")
+    refund = _write(tmp_path, "refund.csv", "交易日期,摘要,金额,流水号\n2024-01-05,网购,99.00,\n")
+
+    assert import_statement(purchase, "u_1") == 1
+    assert import_statement(refund, "u_1") == 1
+    assert import_statement(refund, "u_1") == 0
+    assert sorted(t.type for t in Transaction.get_transactions_by_user("u_1")) == ['支出', '收入']
+
+
+def test_non_adjacent_duplicates_counted_per_import(test_db, tmp_path):
+    # 相同的记录在文件中不相邻（中间隔着其他日期）时也应分别导入
+    path = _write(tmp_path, "s.csv", """交易日期,摘要,金额,流水号
+2024-01-05,地铁,-4.00,
+2024-01-06,午餐,-20.00,
+2024-01-05,地铁,-4.00,
+""")
+
+    assert import_statement(path, "u_1") == 3
+    assert import_statement(path, "u_1") == 0
+    assert Budget(user_id="u_1", month="2024-01").spent == 28
+
+
+def test_bad_records_are_skipped_without_aborting_import(test_db, tmp_path, capsys):
+    # 坏记录夹在正常记录之间：只跳过坏记录，前后的记录照常导入
+    csv_path = _write(tmp_path, "s.csv", """交易日期,摘要,金额,流水号
+2024-01-05,午餐,-20.00,
+2024-01-05,坏金额,NaN,
+2024-01-05,溢出,-1e999999,
+2024-13-45,坏日期,-5.00,
+2024-01-06,晚餐,-30.00,
+""")
+    ofx_path = _write(tmp_path, "s.ofx", """<OFX><BANKTRANLIST>
+<STMTTRN><DTPOSTED>20240107<TRNAMT>-12.50<FITID>B001<NAME>Coffee</STMTTRN>
+<STMTTRN><DTPOSTED>20241340<TRNAMT>-9.00<FITID>B002<NAME>Bad date</STMTTRN>
+<STMTTRN><DTPOSTED>20240108<TRNAMT>-7.50<FITID>B003<NAME>Tea</STMTTRN>
+</BANKTRANLIST></OFX>
+""")
+
+    assert import_statement(csv_path, "u_1") == 2
+    assert "3 条记录" in capsys.readouterr().out
+    assert import_statement(ofx_path, "u_1") == 2
+    assert "1 条记录" in capsys.readouterr().out
+    assert Budget(user_id="u_1", month="2024-01").spent == 70
+
+
+def test_occurrence_counter_keeps_only_current_date_in_memory():
+    counter = _OccurrenceCounter()
+    try:
+        for day in range(1, 29):
+            date = f"2024-02-{day:02d} 00:00:00"
+            assert [counter.next(date, '支出', Decimal('4'), "地铁") for _ in range(3)] == [0, 1, 2]
+            assert len(counter._counts) == 1
+
+        # 乱序账单回到已转存的日期时继续计数
+        assert counter.next("2024-02-03 00:00:00", '支出', Decimal('4.00'), "地铁") == 3
+        assert counter.next("2024-02-03 00:00:00", '收入', Decimal('4'), "地铁") == 0
+    finally:
+        counter.close()
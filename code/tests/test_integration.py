@@ -12,6 +12,17 @@ from database import db_manager
 TEST_DB_FILE = "test_finance_integration.db"
 
 
+def _remove_db_files():
+    """删除测试数据库文件及 WAL 模式的 -wal/-shm 附属文件"""
+    for path in (TEST_DB_FILE, TEST_DB_FILE + "-wal", TEST_DB_FILE + "-shm"):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except PermissionError:
+            # 若被占用则跳过
+            pass
+
+
 @pytest.fixture(scope="function")
 def test_db(monkeypatch):
     """
@@ -20,12 +31,7 @@ def test_db(monkeypatch):
     """
 
     # 如果旧文件存在，先尝试删除
-    if os.path.exists(TEST_DB_FILE):
-        try:
-            os.remove(TEST_DB_FILE)
-        except PermissionError:
-            # 若被占用，强制关闭并重试
-            pass
+    _remove_db_files()
 
     # 强制让 db_manager 使用测试数据库路径
     monkeypatch.setattr(db_manager, "db_path", TEST_DB_FILE)
@@ -35,12 +41,9 @@ def test_db(monkeypatch):
 
     yield db_manager  # 将数据库管理器实例提供给测试用例
 
-    # 测试结束后清理
-    try:
-        if os.path.exists(TEST_DB_FILE):
-            os.remove(TEST_DB_FILE)
-    except PermissionError:
-        pass
+    # 测试结束后先关闭连接（WAL 写回数据库），再删除数据库及 -wal/-shm 文件
+    db_manager.close()
+    _remove_db_files()
 
 
 # -------------------- 测试 1：验证交易持久化 --------------------
@@ -0,0 +1,49 @@
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from money import to_cents, from_cents, parse_money
+
+"""
+金额模块测试
+验证元与整数分之间的转换和舍入
+"""
+
+
+@pytest.mark.parametrize("value, cents", [
+    (0, 0),
+    (12, 1200),
+    (0.1, 10),
+    (19.99, 1999),
+    (1.005, 101),
+    ("2.345", 235),
+    (Decimal("-3.5"), -350),
+    (None, None),
+])
+def test_to_cents(value, cents):
+    assert to_cents(value) == cents
+
+
+def test_from_cents_round_trip():
+    assert from_cents(1250) == Decimal("12.50")
+    assert str(from_cents(5)) == "0.05"
+    assert from_cents(None) is None
+    assert to_cents(from_cents(123456789)) == 123456789
+
+
+def test_sum_has_no_drift():
+    assert from_cents(sum(to_cents(0.1) for _ in range(100000))) == Decimal("10000.00")
+
+
+def test_parse_money():
+    assert parse_money(" 12.345 ") == Decimal("12.35")
+    for text in ("abc", "", "nan", "inf"):
+        with pytest.raises(ValueError):
+            parse_money(text)
@@ -0,0 +1,35 @@
+import sys
+import os
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from period import period_range
+
+
+@pytest.mark.parametrize("period, expected", [
+    ("2024-01-31", ("2024-01-31", "2024-02-01")),
+    ("2024-02-29", ("2024-02-29", "2024-03-01")),
+    ("2024-01", ("2024-01-01", "2024-02-01")),
+    ("2023-12", ("2023-12-01", "2024-01-01")),
+    ("2024", ("2024-01-01", "2025-01-01")),
+])
+def test_period_range(period, expected):
+    assert period_range(period) == expected
+
+
+def test_period_range_bounds_match_stored_dates():
+    start, end = period_range("2024-01")
+    assert start <= "2024-01-01 00:00:00" < end
+    assert start <= "2024-01-31 23:59:59" < end
+    assert not (start <= "2024-02-01 00:00:00" < end)
+
+
+@pytest.mark.parametrize("period", ["", "2024-1", "2024-13", "20240101"])
+def test_period_range_invalid(period):
+    with pytest.raises(ValueError):
+        period_range(period)
@@ -28,11 +28,10 @@ class TestStatistics:
 
     @patch('finance_stats.db_manager')
     def test_calculate_daily_stats_success(self, mock_db):
-        mock_db.execute_query.side_effect = [
-            [(1000,)],
-            [(200,)],
-            [(1, 'Food', 'icon', 200)],
-            [(2, 'Salary', 'icon', 1000)]
+        # 汇总表中的金额单位为分
+        mock_db.execute_query.return_value = [
+            ('支出', 1, 'Food', 'icon', '', 20000),
+            ('收入', 2, 'Salary', 'icon', '', 100000)
         ]
 
         result = self.stats.calculate_daily_stats('2023-12-01')
@@ -41,12 +40,12 @@ class TestStatistics:
         assert result['total_expense'] == 200
         assert result['balance'] == 800
         assert result['category_stats']['expense'][0]['name'] == 'Food'
+        # 一次分组查询完成全部统计
+        assert mock_db.execute_query.call_count == 1
 
     @patch('finance_stats.db_manager')
     def test_calculate_daily_stats_default_date(self, mock_db):
-        mock_db.execute_query.side_effect = [
-            [(0,)], [(0,)], [], []
-        ]
+        mock_db.execute_query.return_value = []
 
         self.stats.calculate_daily_stats()
         today = datetime.now().strftime('%Y-%m-%d')
@@ -65,17 +64,33 @@ class TestStatistics:
 
     @patch('finance_stats.db_manager')
     def test_calculate_monthly_stats_success(self, mock_db):
-        mock_db.execute_query.side_effect = [
-            [(5000,)],
-            [(3000,)],
-            [('2023-12-01', '收入', 5000), ('2023-12-02', '支出', 1000)],
-            [(1, 'Food', 'icon', 3000)],
-            [(2, 'Salary', 'icon', 5000)]
+        mock_db.execute_query.return_value = [
+            ('收入', 2, 'Salary', 'icon', '2023-12-01', 500000),
+            ('支出', 1, 'Food', 'icon', '2023-12-02', 100000),
+            ('支出', 1, 'Food', 'icon', '2023-12-03', 200000),
         ]
 
         res = self.stats.calculate_monthly_stats("2023-12")
         assert res['balance'] == 2000
         assert res['daily_stats'][0]['income'] == 5000
+        assert [d['date'] for d in res['daily_stats']] == ['2023-12-01', '2023-12-02', '2023-12-03']
+        assert res['category_stats']['expense'] == [
+            {'category_id': 1, 'name': 'Food', 'icon': 'icon', 'amount': 3000}
+        ]
+        assert mock_db.execute_query.call_count == 1
+
+    @patch('finance_stats.db_manager')
+    def test_calculate_monthly_stats_deleted_category(self, mock_db):
+        """分类已删除的交易计入总额，但不出现在分类统计中"""
+        mock_db.execute_query.return_value = [
+            ('支出', 1, 'Food', 'icon', '2023-12-01', 10000),
+            ('支出', 'gone', None, None, '2023-12-01', 5000),
+        ]
+
+        res = self.stats.calculate_monthly_stats("2023-12")
+        assert res['total_expense'] == 150
+        assert res['daily_stats'] == [{'date': '2023-12-01', 'income': 0, 'expense': 150}]
+        assert len(res['category_stats']['expense']) == 1
 
     @patch('finance_stats.db_manager.execute_query', side_effect=Exception("DB"))
     def test_calculate_monthly_stats_exception(self, mock_db):
@@ -88,17 +103,15 @@ class TestStatistics:
 
     @patch('finance_stats.db_manager')
     def test_calculate_yearly_stats_success(self, mock_db):
-        mock_db.execute_query.side_effect = [
-            [(10000,)],                      # 年收入
-            [(5000,)],                       # 年支出
-            [('2023-01', '收入', 2000)],     # monthly stats
-            [(1, "Food", "icon", 5000)],     # expense
-            [(2, "Salary", "icon", 10000)]   # income
+        mock_db.execute_query.return_value = [
+            ('收入', 2, "Salary", "icon", '2023-01', 1000000),   # 年收入
+            ('支出', 1, "Food", "icon", '2023-01', 500000),      # 年支出
         ]
 
         res = self.stats.calculate_yearly_stats('2023')
         assert res['balance'] == 5000
         assert len(res['monthly_stats']) == 1
+        assert res['monthly_stats'][0] == {'month': '2023-01', 'income': 10000, 'expense': 5000}
 
     @patch('finance_stats.db_manager.execute_query', side_effect=Exception("DB Lost"))
     def test_calculate_yearly_stats_exception(self, mock_db):
@@ -213,3 +226,99 @@ class TestStatistics:
     @patch('finance_stats.db_manager.execute_query', side_effect=Exception("DB"))
     def test_get_trends_exception(self, mock_db):
         assert self.stats.get_trends(3) == []
+
+
+# ============================================================
+# 7. 统计结果缓存
+# ============================================================
+
+from finance_stats import StatsCache, stats_cache
+from database import db_manager
+from category import Category
+from transaction import Transaction
+
+
+class TestStatsCache:
+
+    def test_lru_eviction(self):
+        cache = StatsCache(max_entries=2)
+        cache.put('a', {'v': 1})
+        cache.put('b', {'v': 2})
+        assert cache.get('a') == {'v': 1}
+        cache.put('c', {'v': 3})
+
+        # b 最久未使用，被淘汰
+        assert cache.get('b') is None
+        assert cache.get('a') == {'v': 1}
+        assert cache.get('c') == {'v': 3}
+        assert len(cache) == 2
+
+    def test_memory_bound(self):
+        cache = StatsCache(max_bytes=2000)
+        for i in range(20):
+            cache.put(i, {'rows': list(range(20))})
+
+        assert 0 < len(cache) < 20
+        assert cache.size_bytes <= 2000
+        # 单个结果超过上限时不缓存
+        cache.put('big', {'rows': list(range(1000))})
+        assert cache.get('big') is None
+
+    def test_returns_copies(self):
+        cache = StatsCache()
+        cache.put('a', {'rows': [1]})
+        cache.get('a')['rows'].append(2)
+        assert cache.get('a') == {'rows': [1]}
+
+
+@pytest.fixture
+def cached_db(test_db):
+    """在临时数据库上清空统计缓存"""
+    stats_cache.clear()
+    yield test_db
+    stats_cache.clear()
+
+
+def _add(amount, category_id='cat_1'):
+    assert Transaction(amount=amount, type='支出', category_id=category_id,
+                       date="2024-01-05 12:00:00", user_id="u_1").add_transaction()
+
+
+def test_repeat_stats_served_from_cache(cached_db):
+    _add(30)
+    first = Statistics("u_1").calculate_monthly_stats("2024-01")
+
+    with patch.object(Statistics, '_aggregate', side_effect=AssertionError("不应重新计算")):
+        stats = Statistics("u_1")
+        assert stats.calculate_monthly_stats("2024-01") == first
+        assert stats.total_expense == 30
+
+
+def test_writes_invalidate_cached_stats(cached_db):
+    category = Category(name='咖啡', type='支出类', icon='☕', user_id="u_1")
+    assert category.add_custom_category()
+    _add(30, category.category_id)
+    stats = Statistics("u_1")
+    assert stats.calculate_monthly_stats("2024-01")['total_expense'] == 30
+    assert stats.calculate_yearly_stats("2024")['total_expense'] == 30
+
+    _add(20, category.category_id)
+    assert stats.calculate_monthly_stats("2024-01")['total_expense'] == 50
+    assert stats.calculate_yearly_stats("2024")['total_expense'] == 50
+
+    # 修改分类名称同样使缓存失效
+    category.name = '咖啡茶饮'
+    assert category.update()
+    result = stats.calculate_monthly_stats("2024-01")
+    assert result['category_stats']['expense'][0]['name'] == '咖啡茶饮'
+
+
+def test_data_version_is_per_user(cached_db):
+    db_manager.execute_query(
+        "INSERT INTO users (user_id, username, password) VALUES (?, ?, ?)", ("u_2", "other", "pw"), commit=True
+    )
+    before = db_manager.get_data_version("u_2")
+    _add(30)
+
+    assert db_manager.get_data_version("u_2") == before
+    assert db_manager.get_data_version("u_1") > before
@@ -0,0 +1,346 @@
+import sys
+import os
+import sqlite3
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from database import db_manager
+from transaction import Transaction
+from budget import Budget
+from records import TransactionRecord, BudgetRecord
+
+"""
+交易记录模块测试
+验证交易的增删改及其对月度预算的影响
+"""
+
+
+def test_add_transaction_updates_budget(test_db, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+    add_transaction(20, "2024-01-06")
+    add_transaction(500, "2024-01-06", type='收入', category_id='cat_9')
+
+    budget = Budget(user_id="u_1", month="2024-01")
+    assert budget.amount == 1000
+    assert budget.spent == 50
+
+
+def test_edit_transaction_moves_budget_month(test_db, add_transaction):
+    transaction = add_transaction(30, "2024-01-05 12:00:00")
+
+    transaction.date = "2024-02-01 08:00:00"
+    transaction.amount = 40
+    assert transaction.edit_transaction()
+
+    assert Budget(user_id="u_1", month="2024-01").spent == 0
+    assert Budget(user_id="u_1", month="2024-02").spent == 40
+
+
+def test_edit_within_month_without_budget_row(test_db, add_transaction):
+    transaction = add_transaction(20, "2024-01-05 12:00:00")
+    test_db.execute_query("DELETE FROM budgets", commit=True)
+
+    # 该月没有预算记录时按更新后的交易重新汇总，不能再叠加差值
+    transaction.amount = 30
+    assert transaction.edit_transaction()
+
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+
+
+def test_delete_transaction_updates_budget(test_db, add_transaction):
+    keep = add_transaction(30, "2024-01-05 12:00:00")
+    drop = add_transaction(20, "2024-01-06 12:00:00")
+
+    assert drop.delete_transaction()
+
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+    assert Transaction.get_transaction_by_id(drop.transaction_id) is None
+    assert Transaction.get_transaction_by_id(keep.transaction_id) is not None
+
+
+def test_edit_or_delete_other_users_transaction_is_noop(test_db, add_transaction):
+    test_db.execute_query(
+        "INSERT INTO users (user_id, username, password, monthly_budget) VALUES (?, ?, ?, ?)",
+        ("u_2", "other", "pw", 100000),
+        commit=True
+    )
+    transaction = add_transaction(30, "2024-01-05 12:00:00")
+
+    # 其他用户编辑、删除该交易：不修改记录，也不调整任何预算
+    other = Transaction(transaction_id=transaction.transaction_id, amount=500, type='支出',
+                        category_id='cat_1', date="2024-01-05 12:00:00", user_id="u_2")
+    assert other.edit_transaction() is False
+    assert other.delete_transaction() is False
+
+    assert Transaction.get_transaction_by_id(transaction.transaction_id).amount == 30
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+    assert test_db.execute_query(
+        "SELECT COUNT(*) FROM budgets WHERE user_id = 'u_2'") == [(0,)]
+
+
+def test_edit_or_delete_missing_transaction_is_noop(test_db, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+
+    missing = Transaction(transaction_id="missing", amount=20, type='支出',
+                          category_id='cat_1', date="2024-01-06 12:00:00", user_id="u_1")
+    assert missing.edit_transaction() is False
+    assert missing.delete_transaction() is False
+
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+
+
+def test_add_transaction_is_atomic(test_db, monkeypatch):
+    # 预算更新失败时交易记录也不应写入
+    monkeypatch.setattr(Budget, "apply_spent_delta", staticmethod(lambda *args: False))
+    transaction = Transaction(amount=30, type='支出', category_id='cat_1',
+                              date="2024-01-05", user_id="u_1")
+
+    assert transaction.add_transaction() is False
+    assert Transaction.get_transactions_by_user("u_1") == []
+
+
+def _rollups(test_db):
+    return test_db.execute_query(
+        "SELECT day, type, category_id, total, count FROM daily_rollups WHERE user_id = ? ORDER BY day, type",
+        ("u_1",)
+    )
+
+
+def test_rollups_follow_writes(test_db, add_transaction):
+    first = add_transaction(30, "2024-01-05 12:00:00")
+    add_transaction(20, "2024-01-05 18:00:00")
+    # 汇总金额以分存储
+    assert _rollups(test_db) == [("2024-01-05", "支出", "cat_1", 5000, 2)]
+
+    first.date = "2024-01-06 09:00:00"
+    first.category_id = "cat_2"
+    assert first.edit_transaction()
+    assert _rollups(test_db) == [
+        ("2024-01-05", "支出", "cat_1", 2000, 1),
+        ("2024-01-06", "支出", "cat_2", 3000, 1),
+    ]
+
+    assert first.delete_transaction()
+    assert _rollups(test_db) == [("2024-01-05", "支出", "cat_1", 2000, 1)]
+
+
+def test_rebuild_rollups_matches_incremental(test_db, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+    add_transaction(500, "2024-01-06", type='收入', category_id='cat_9')
+    incremental = _rollups(test_db)
+
+    test_db.execute_query("DELETE FROM daily_rollups", commit=True)
+    version = test_db.get_data_version("u_1")
+    assert test_db.rebuild_rollups() == 2
+    assert _rollups(test_db) == incremental
+    # 重建后统计缓存失效
+    assert test_db.get_data_version("u_1") > version
+
+
+def test_budget_spent_uses_deltas(test_db, monkeypatch, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+
+    # 预算记录已存在后，写入路径只按差值更新，不再重新汇总
+    def no_recompute(self):
+        raise AssertionError("update_spent should not be called")
+    monkeypatch.setattr(Budget, "update_spent", no_recompute)
+
+    second = add_transaction(20, "2024-01-06 12:00:00")
+    second.amount = 25
+    assert second.edit_transaction()
+    assert Budget(user_id="u_1", month="2024-01").spent == 55
+
+    assert second.delete_transaction()
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+
+
+def test_reconcile_repairs_drift(test_db, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+    add_transaction(40, "2024-02-05 12:00:00")
+    test_db.execute_query(
+        "UPDATE budgets SET spent = 99900 WHERE user_id = ? AND month = ?",
+        ("u_1", "2024-01"),
+        commit=True
+    )
+
+    repaired = Budget.reconcile("u_1")
+
+    assert [(month, spent, actual) for _, month, spent, actual in repaired] == [("2024-01", 999, 30)]
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+    assert Budget.reconcile("u_1") == []
+
+
+def test_normalize_dates():
+    from transaction import normalize_dates
+    assert normalize_dates([
+        "2024-01-05 12:00:00", "2024-01-05", "2024-01-05 12:30", "2024/01/05", "bad", None
+    ]) == [
+        "2024-01-05 12:00:00", "2024-01-05 00:00:00", "2024-01-05 12:30:00", "2024-01-05 00:00:00", None, None
+    ]
+
+
+def test_normalize_dates_rejects_invalid_standard_looking_values():
+    from transaction import normalize_dates
+    assert normalize_dates([
+        "2024-13-45 12:00:00", "2024-02-30 12:00:00", "2024-01-05 25:00:00", "2024/01/05-12:00:00",
+        "2024-01-05T12:00:00", "2024-02-29 23:59:59", "2023-02-29 00:00:00", "２０２４-01-05 12:00:00",
+    ]) == [
+        None, None, None, None, "2024-01-05 12:00:00", "2024-02-29 23:59:59", None, "2024-01-05 12:00:00"
+    ]
+
+
+def test_bulk_add_batches_and_recomputes_budgets(test_db, monkeypatch):
+    rows = [
+        {'amount': 10, 'type': '支出', 'category_id': 'cat_1', 'date': f"2024-01-{day:02d}", 'user_id': 'u_1'}
+        for day in range(1, 26)
+    ]
+    rows.append({'amount': 5, 'type': '支出', 'category_id': 'cat_1', 'date': "2024-02-01 08:00", 'user_id': 'u_1'})
+    rows.append({'amount': 5, 'type': '支出', 'category_id': 'cat_1', 'date': "not a date", 'user_id': 'u_1'})
+
+    recomputed = []
+    original = Budget.update_spent
+
+    def tracking_update(self):
+        recomputed.append(self.month)
+        return original(self)
+    monkeypatch.setattr(Budget, "update_spent", tracking_update)
+
+    reports = []
+    imported = Transaction.bulk_add(rows, chunk_size=10, progress=lambda *args: reports.append(args))
+
+    assert imported == 26
+    assert [r[0] for r in reports] == [10, 20, 26]
+    assert sorted(recomputed) == ["2024-01", "2024-02"]
+    assert Budget(user_id="u_1", month="2024-01").spent == 250
+    assert Budget(user_id="u_1", month="2024-02").spent == 5
+    assert len(Transaction.get_transactions_by_user("u_1")) == 26
+
+
+def _bulk_rows(count):
+    for day in range(1, count + 1):
+        yield {'amount': 10, 'type': '支出', 'category_id': 'cat_1', 'date': f"2024-01-{day:02d}", 'user_id': 'u_1'}
+
+
+def test_bulk_add_source_error_writes_read_rows_and_raises(test_db):
+    def failing_source():
+        yield from _bulk_rows(5)
+        raise OSError("读取中断")
+
+    # 前3条已写入一块，其余2条在抛出前写入
+    with pytest.raises(OSError):
+        Transaction.bulk_add(failing_source(), chunk_size=3)
+
+    assert len(Transaction.get_transactions_by_user("u_1")) == 5
+    assert Budget(user_id="u_1", month="2024-01").spent == 50
+
+
+def test_bulk_add_write_error_rolls_back_chunk_and_raises(test_db, monkeypatch):
+    original = db_manager.execute_many
+    calls = []
+
+    def failing_execute_many(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("disk I/O error")
+        return original(*args, **kwargs)
+    monkeypatch.setattr(db_manager, "execute_many", failing_execute_many)
+
+    with pytest.raises(sqlite3.OperationalError):
+        Transaction.bulk_add(_bulk_rows(8), chunk_size=3)
+
+    # 第一块保留，出错的第二块整体回滚，之后不再写入
+    assert len(Transaction.get_transactions_by_user("u_1")) == 3
+    assert Budget(user_id="u_1", month="2024-01").spent == 30
+
+
+def test_transactions_with_category_single_query(test_db, monkeypatch, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00", category_id='cat_1')
+    add_transaction(500, "2024-01-06 12:00:00", type='收入', category_id='cat_9')
+    add_transaction(10, "2024-01-07 12:00:00", category_id='cat_missing')
+
+    calls = []
+    for name in ("execute_query", "iter_query"):
+        original = getattr(db_manager, name)
+        monkeypatch.setattr(db_manager, name,
+                            lambda *args, _original=original, **kwargs: calls.append(args) or _original(*args, **kwargs))
+
+    transactions = Transaction.get_transactions_with_category("u_1")
+
+    assert len(calls) == 1
+    assert [t.category_name for t in transactions] == [None, '工资', '餐饮']
+    assert transactions[2].category_icon is not None
+    assert [t.amount for t in Transaction.get_transactions_with_category("u_1", transaction_type='支出')] == [10, 30]
+
+
+def test_transactions_pagination(test_db, add_transaction):
+    for day in range(1, 6):
+        add_transaction(day, f"2024-01-0{day} 12:00:00")
+        add_transaction(day + 10, f"2024-01-0{day} 12:00:00")
+
+    everything = Transaction.get_transactions_by_user("u_1")
+    assert len(everything) == 10
+
+    first = Transaction.get_transactions_by_user("u_1", limit=3)
+    second = Transaction.get_transactions_by_user("u_1", limit=3, offset=3)
+    assert [t.transaction_id for t in first + second] == [t.transaction_id for t in everything[:6]]
+
+    # 游标翻页读完全部记录，同一时间的记录既不重复也不遗漏
+    pages, cursor = [], {}
+    while True:
+        page = Transaction.get_transactions_with_category("u_1", limit=4, **cursor)
+        if not page:
+            break
+        pages.extend(page)
+        cursor = {"after_date": page[-1].date, "after_id": page[-1].transaction_id}
+    assert [t.transaction_id for t in pages] == [t.transaction_id for t in everything]
+
+
+def test_iter_transactions_streams_in_batches(test_db, monkeypatch, add_transaction):
+    for day in range(1, 8):
+        add_transaction(day, f"2024-01-0{day} 12:00:00")
+
+    batches = []
+    original = db_manager.iter_query
+    monkeypatch.setattr(db_manager, "iter_query",
+                        lambda *args, **kwargs: batches.append(kwargs["batch_size"]) or original(*args, **kwargs))
+
+    rows = Transaction.iter_transactions("u_1", batch_size=3)
+    assert next(rows).amount == 7
+    assert [t.amount for t in rows] == [6, 5, 4, 3, 2, 1]
+    assert batches == [3]
+    assert [t.amount for t in Transaction.get_transactions_by_user("u_1", limit=2)] == [7, 6]
+
+
+def test_iter_transactions_close_releases_connection(test_db, add_transaction):
+    add_transaction(1, "2024-01-01 12:00:00")
+    add_transaction(2, "2024-01-02 12:00:00")
+
+    # 提前关闭生成器后连接归还连接池，写入不受影响
+    for _ in range(test_db.pool_size + 1):
+        rows = Transaction.iter_transactions("u_1", batch_size=1)
+        next(rows)
+        rows.close()
+    add_transaction(3, "2024-01-03 12:00:00")
+    assert len(Transaction.get_transactions_by_user("u_1")) == 3
+
+
+def test_read_paths_return_records(test_db, add_transaction):
+    add_transaction(30, "2024-01-05 12:00:00")
+
+    record = Transaction.get_transactions_by_user("u_1")[0]
+    assert isinstance(record, TransactionRecord)
+    assert not hasattr(record, "__dict__")
+    assert (record.amount, record.category_name) == (30, None)
+    assert Transaction.get_transactions_with_category("u_1")[0].category_name == "餐饮"
+
+    budget = Budget.get_all_budgets("u_1")[0]
+    assert isinstance(budget, BudgetRecord)
+    assert (budget.month, budget.spent, budget.get_remaining()) == ("2024-01", 30, 970)
+
+
+# -------------------- 变更日志 --------------------
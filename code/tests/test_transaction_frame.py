@@ -0,0 +1,103 @@
+import sys
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from transaction import Transaction
+from transaction_frame import TransactionFrame
+
+"""
+列式交易数据测试
+验证载入的列类型，以及分组、累计余额、滚动求和的结果
+"""
+
+
+@pytest.fixture
+def frame(temp_db):
+    """在临时数据库中写入一组交易并载入"""
+    rows = [
+        {'amount': 1000, 'type': '收入', 'category_id': 'cat_9', 'date': "2024-01-01 09:00:00"},
+        {'amount': 12.5, 'type': '支出', 'category_id': 'cat_1', 'date': "2024-01-01 12:00:00"},
+        {'amount': 7.25, 'type': '支出', 'category_id': 'cat_1', 'date': "2024-01-03 18:00:00"},
+        {'amount': 300, 'type': '支出', 'category_id': 'cat_2', 'date': "2024-02-10 10:00:00"},
+        {'amount': 0.1, 'type': '支出', 'category_id': 'cat_1', 'date': "2024-02-11 10:00:00"},
+    ]
+    Transaction.bulk_add([dict(row, user_id="u_1") for row in rows])
+    return TransactionFrame.load("u_1")
+
+
+def test_columns(frame):
+    assert len(frame) == 5
+    assert frame.amounts.dtype == np.int64
+    assert frame.amounts.tolist() == [100000, 1250, 725, 30000, 10]
+    assert frame.dates.dtype == np.dtype('datetime64[s]')
+    assert frame.is_income.tolist() == [True, False, False, False, False]
+    assert frame.categories[frame.category_codes].tolist() == ['cat_9', 'cat_1', 'cat_1', 'cat_2', 'cat_1']
+
+
+def test_group_by_day_and_month(frame):
+    days, income, expense = frame.group_by_day()
+    assert days.astype(str).tolist() == ['2024-01-01', '2024-01-03', '2024-02-10', '2024-02-11']
+    assert income.tolist() == [100000, 0, 0, 0]
+    assert expense.tolist() == [1250, 725, 30000, 10]
+
+    months, income, expense = frame.group_by_month()
+    assert months.astype(str).tolist() == ['2024-01', '2024-02']
+    assert expense.tolist() == [1975, 30010]
+
+
+def test_group_by_category(frame):
+    categories, totals, shares = frame.group_by_category()
+    assert categories.tolist() == ['cat_2', 'cat_1']
+    assert totals.tolist() == [30000, 1985]
+    assert shares.sum() == pytest.approx(1)
+
+    categories, totals, _ = frame.group_by_category(income=True)
+    assert (categories.tolist(), totals.tolist()) == (['cat_9'], [100000])
+
+
+def test_balance_and_rolling_sum(frame):
+    _, balance = frame.cumulative_balance()
+    assert balance.tolist() == [100000, 98750, 98025, 68025, 68015]
+
+    days, totals = frame.rolling_sum(3)
+    assert len(days) == 42
+    assert days[0] == np.datetime64('2024-01-01')
+    assert totals[:4].tolist() == [1250, 1250, 1975, 725]
+    assert totals[-2:].tolist() == [30000, 30010]
+
+
+def test_sums_are_exact_integer_cents():
+    # 超过 float64 精确表示范围（2**53）的合计仍按整数分精确累加
+    big = 2 ** 53
+    frame = TransactionFrame(
+        amounts=np.array([big, 1, 1], dtype=np.int64),
+        dates=np.array(["2024-01-01 09:00:00", "2024-01-01 10:00:00", "2024-01-02 10:00:00"],
+                       dtype='datetime64[s]'),
+        category_codes=np.array([0, 0, 1], dtype=np.int32),
+        categories=np.array(['cat_1', 'cat_2']),
+        is_income=np.zeros(3, dtype=bool),
+    )
+
+    _, totals, _ = frame.group_by_category()
+    assert totals.dtype == np.int64
+    assert totals.tolist() == [big + 1, 1]
+    _, daily = frame.daily_series()
+    assert daily.dtype == np.int64
+    assert daily.tolist() == [big + 1, 1]
+
+
+def test_empty_frame(temp_db):
+    frame = TransactionFrame.load("u_1")
+
+    assert len(frame) == 0
+    assert frame.group_by_month()[0].size == 0
+    assert frame.group_by_category()[0].size == 0
+    assert frame.rolling_sum(7)[1].size == 0
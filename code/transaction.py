@@ -4,10 +4,71 @@
 交易记录模块
 实现交易相关的业务逻辑
 """
+import re
+import time
 import uuid
 from datetime import datetime
 from database import db_manager
 from budget import Budget
+from records import TransactionRecord, row_factory
+from money import to_cents, from_cents, MAX_CENTS
+
+
+# 交易列表查询的行构造函数
+_transaction_row = row_factory(TransactionRecord)
+
+# 批量导入时支持的日期格式（fromisoformat 无法解析时再逐个尝试）
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d']
+
+# 合法的'YYYY-MM-DD HH:MM:SS'标准格式，29 至 31 日是否存在与月份有关，不在此匹配而交给 parse_date 判断
+_STANDARD_DATE = re.compile(
+    r'\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|1\d|2[0-8]) (?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d', re.ASCII
+)
+
+
+def parse_date(value):
+    """把单个日期值规范为'YYYY-MM-DD HH:MM:SS'，无法解析时返回None"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_dates(values):
+    """批量规范日期
+
+    银行流水中同一日期会重复出现很多次，每个不同的原始值只解析一次；
+    已是标准格式的字符串直接使用，不经过 datetime 解析。
+
+    Args:
+        values: 日期值序列，元素为字符串或datetime
+
+    Returns:
+        list: 规范后的日期字符串，无法解析的位置为None
+    """
+    cache = {}
+    result = []
+    for value in values:
+        if isinstance(value, str) and _STANDARD_DATE.fullmatch(value):
+            result.append(value)
+            continue
+        key = value if isinstance(value, str) else repr(value)
+        if key not in cache:
+            cache[key] = parse_date(value)
+        result.append(cache[key])
+    return result
 
 
 class Transaction:
@@ -15,7 +76,10 @@ class Transaction:
 
     def __init__(self, transaction_id=None, amount=None, type=None, category_id=None,
                  date=None, note=None, user_id=None):
-        """初始化交易对象"""
+        """初始化交易对象
+
+        amount 为金额（元），可以是 Decimal、int、float 或数字字符串，写入时转换为整数分
+        """
         self.transaction_id = transaction_id
         self.amount = amount
         self.type = type  # 收入/支出
@@ -55,23 +119,25 @@ class Transaction:
             else:
                 self.date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # 插入交易数据
-            db_manager.execute_query(
-                '''INSERT INTO transactions 
-                (transaction_id, amount, type, category_id, date, note, user_id) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                (self.transaction_id, self.amount, self.type, self.category_id,
-                 self.date, self.note, self.user_id),
-                commit=True
-            )
-            
-            # 如果是支出，更新预算
-            if self.type == '支出':
-                # 提取月份
-                month = self.date.split('-')[0] + '-' + self.date.split('-')[1]
-                # 更新预算支出
-                budget = Budget(user_id=self.user_id, month=month)
-                budget.update_spent()
+            # 插入记录与更新预算在同一个工作单元中完成，只提交一次
+            with db_manager.transaction():
+                # 插入交易数据
+                db_manager.execute_query(
+                    '''INSERT INTO transactions 
+                    (transaction_id, amount, type, category_id, date, note, user_id) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                    (self.transaction_id, to_cents(self.amount), self.type, self.category_id,
+                     self.date, self.note, self.user_id),
+                    commit=True
+                )
+                
+                # 如果是支出，按差值更新预算
+                if self.type == '支出':
+                    # 提取月份
+                    month = self.date.split('-')[0] + '-' + self.date.split('-')[1]
+                    # 更新预算支出
+                    if not Budget.apply_spent_delta(self.user_id, month, self.amount):
+                        raise RuntimeError("更新预算失败")
             
             return True
         except Exception as e:
@@ -85,34 +151,42 @@ class Transaction:
             bool: 编辑是否成功
         """
         try:
-            # 获取原交易记录以更新预算
-            old_transaction = Transaction.get_transaction_by_id(self.transaction_id)
-            old_month = None
-            if old_transaction and old_transaction.type == '支出':
-                old_month = old_transaction.date.split('-')[0] + '-' + old_transaction.date.split('-')[1]
-            
-            # 更新交易记录
-            db_manager.execute_query(
-                '''UPDATE transactions 
-                SET amount = ?, type = ?, category_id = ?, date = ?, note = ? 
-                WHERE transaction_id = ? AND user_id = ?''',
-                (self.amount, self.type, self.category_id, self.date,
-                 self.note, self.transaction_id, self.user_id),
-                commit=True
-            )
-            
-            # 更新预算
-            # 1. 如果原记录是支出，更新原月份预算
-            if old_month:
-                budget = Budget(user_id=self.user_id, month=old_month)
-                budget.update_spent()
-            
-            # 2. 如果新记录是支出，更新新月份预算
-            if self.type == '支出':
-                new_month = self.date.split('-')[0] + '-' + self.date.split('-')[1]
-                if new_month != old_month:
-                    budget = Budget(user_id=self.user_id, month=new_month)
-                    budget.update_spent()
+            with db_manager.transaction():
+                # 获取该用户的原交易记录以更新预算，不存在或属于其他用户时不做修改
+                old_transaction = Transaction.get_transaction_by_id(self.transaction_id, self.user_id)
+                if old_transaction is None:
+                    return False
+                old_month = None
+                if old_transaction.type == '支出':
+                    old_month = old_transaction.date.split('-')[0] + '-' + old_transaction.date.split('-')[1]
+                
+                # 更新交易记录，没有更新到记录时不调整预算
+                updated = db_manager.execute_query(
+                    '''UPDATE transactions 
+                    SET amount = ?, type = ?, category_id = ?, date = ?, note = ? 
+                    WHERE transaction_id = ? AND user_id = ?''',
+                    (to_cents(self.amount), self.type, self.category_id, self.date,
+                     self.note, self.transaction_id, self.user_id),
+                    commit=True
+                )
+                if not updated:
+                    return False
+                
+                # 按差值更新预算，每个月份只调整一次：
+                # 该月没有预算记录时 apply_spent_delta 会按更新后的交易重新汇总，再叠加差值会重复计算
+                deltas = {}
+                # 1. 如果原记录是支出，从原月份预算中扣除
+                if old_month:
+                    deltas[old_month] = -old_transaction.amount
+                
+                # 2. 如果新记录是支出，计入新月份预算
+                if self.type == '支出':
+                    new_month = self.date.split('-')[0] + '-' + self.date.split('-')[1]
+                    deltas[new_month] = deltas.get(new_month, 0) + self.amount
+                
+                for month, delta in deltas.items():
+                    if not Budget.apply_spent_delta(self.user_id, month, delta):
+                        raise RuntimeError("更新预算失败")
             
             return True
         except Exception as e:
@@ -126,32 +200,244 @@ class Transaction:
             bool: 删除是否成功
         """
         try:
-            # 获取交易记录以更新预算
-            transaction = Transaction.get_transaction_by_id(self.transaction_id)
-            month = None
-            if transaction and transaction.type == '支出':
-                month = transaction.date.split('-')[0] + '-' + transaction.date.split('-')[1]
-            
-            # 删除交易记录
-            db_manager.execute_query(
-                "DELETE FROM transactions WHERE transaction_id = ? AND user_id = ?",
-                (self.transaction_id, self.user_id),
-                commit=True
-            )
-            
-            # 更新预算
-            if month:
-                budget = Budget(user_id=self.user_id, month=month)
-                budget.update_spent()
+            with db_manager.transaction():
+                # 获取该用户的交易记录以更新预算，不存在或属于其他用户时不做修改
+                transaction = Transaction.get_transaction_by_id(self.transaction_id, self.user_id)
+                if transaction is None:
+                    return False
+                month = None
+                if transaction.type == '支出':
+                    month = transaction.date.split('-')[0] + '-' + transaction.date.split('-')[1]
+                
+                # 删除交易记录，没有删除到记录时不调整预算
+                deleted = db_manager.execute_query(
+                    "DELETE FROM transactions WHERE transaction_id = ? AND user_id = ?",
+                    (self.transaction_id, self.user_id),
+                    commit=True
+                )
+                if not deleted:
+                    return False
+                
+                # 按差值更新预算
+                if month:
+                    if not Budget.apply_spent_delta(self.user_id, month, -transaction.amount):
+                        raise RuntimeError("更新预算失败")
             
             return True
         except Exception as e:
             print(f"删除交易记录失败: {e}")
             return False
 
+    @staticmethod
+    def bulk_add(transactions, chunk_size=1000, progress=None):
+        """批量导入交易记录
+
+        按 chunk_size 分块，每块在一个工作单元中用 executemany 写入；
+        全部写入后，每个受影响的 (用户, 月份) 预算只重新汇总一次。
+
+        Args:
+            transactions: 可迭代的 Transaction 对象或字典（键与 Transaction 属性同名，
+                字典可额外带 fingerprint 键用于去重）
+            chunk_size: 每个工作单元写入的条数
+            progress: 进度回调，每写完一块调用 progress(已导入条数, 已用秒数, 每秒条数)
+
+        Returns:
+            int: 成功导入的条数
+
+        Raises:
+            Exception: 读取来源数据出错时，先写入出错前已读取的记录再抛出原异常；
+                写入某一块出错时该块整体回滚后抛出。两种情况下已提交的块都会保留，
+                受影响的预算照常重新汇总
+        """
+        imported = 0
+        skipped = 0
+        months = set()
+        started = time.perf_counter()
+
+        def flush(chunk):
+            nonlocal imported, skipped
+            dates = normalize_dates([item[3] for item in chunk])
+            rows = []
+            for (amount, type, category_id, _, note, user_id, fingerprint), date in zip(chunk, dates):
+                try:
+                    cents = to_cents(amount)
+                except (ArithmeticError, ValueError, TypeError):
+                    cents = None
+                if cents is not None and abs(cents) > MAX_CENTS:
+                    cents = None
+                if date is None or cents is None or not type or not category_id or not user_id:
+                    skipped += 1
+                    continue
+                rows.append((str(uuid.uuid4()), cents, type, category_id, date, note, user_id, fingerprint))
+                if type == '支出':
+                    months.add((user_id, date[:7]))
+
+            # 带指纹且已导入过的记录被唯一索引拦截，不计入导入条数
+            with db_manager.transaction():
+                inserted = db_manager.execute_many(
+                    '''INSERT OR IGNORE INTO transactions 
+                    (transaction_id, amount, type, category_id, date, note, user_id, fingerprint) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                    rows
+                )
+            imported += inserted
+            skipped += len(rows) - inserted
+
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(imported, elapsed, imported / elapsed if elapsed > 0 else 0)
+
+        chunk = []
+        try:
+            for trans in transactions:
+                if isinstance(trans, dict):
+                    chunk.append((trans.get('amount'), trans.get('type'), trans.get('category_id'),
+                                  trans.get('date'), trans.get('note'), trans.get('user_id'),
+                                  trans.get('fingerprint')))
+                else:
+                    chunk.append((trans.amount, trans.type, trans.category_id,
+                                  trans.date, trans.note, trans.user_id, None))
+                if len(chunk) >= chunk_size:
+                    pending, chunk = chunk, []
+                    flush(pending)
+            pending, chunk = chunk, []
+            if pending:
+                flush(pending)
+        except Exception:
+            # chunk 非空说明是读取来源数据时出错，已读取的记录先写入再抛出；
+            # 写入出错时该块已在工作单元中回滚，chunk 为空
+            if chunk:
+                flush(chunk)
+            raise
+        finally:
+            # 每个受影响的月份预算只重新汇总一次
+            for user_id, month in sorted(months):
+                Budget(user_id=user_id, month=month).update_spent()
+            # 大批量写入后及时把 WAL 写回数据库，避免日志文件持续增长
+            if imported:
+                try:
+                    db_manager.checkpoint()
+                except Exception as e:
+                    print(f"WAL检查点失败: {e}")
+            if skipped:
+                print(f"批量导入跳过 {skipped} 条无效或重复记录")
+
+        return imported
+
+    @staticmethod
+    def _build_filters(user_id, start_date=None, end_date=None, transaction_type=None,
+                       category_id=None, min_amount=None, max_amount=None,
+                       after_date=None, after_id=None):
+        """构建交易查询的 WHERE 子句，交易表别名为 t
+
+        Returns:
+            tuple: (WHERE 子句, 参数列表)
+        """
+        query = " WHERE t.user_id = ?"
+        params = [user_id]
+        
+        if start_date:
+            query += " AND t.date >= ?"
+            params.append(start_date)
+        
+        if end_date:
+            query += " AND t.date <= ?"
+            params.append(end_date)
+        
+        if transaction_type:
+            query += " AND t.type = ?"
+            params.append(transaction_type)
+        
+        if category_id:
+            query += " AND t.category_id = ?"
+            params.append(category_id)
+        
+        if min_amount is not None:
+            query += " AND t.amount >= ?"
+            params.append(to_cents(min_amount))
+        
+        if max_amount is not None:
+            query += " AND t.amount <= ?"
+            params.append(to_cents(max_amount))
+        
+        # 游标分页：从上一页最后一条记录之后继续，按 (user_id, date, transaction_id) 索引定位
+        if after_date is not None:
+            if after_id is not None:
+                query += " AND (t.date, t.transaction_id) < (?, ?)"
+                params.extend([after_date, after_id])
+            else:
+                query += " AND t.date < ?"
+                params.append(after_date)
+        
+        return query, params
+
+    @staticmethod
+    def _build_page(limit=None, offset=None):
+        """构建排序与分页子句
+
+        按日期、交易ID倒序排列，保证同一时间的多条记录顺序稳定，游标分页不会漏读或重复。
+
+        Returns:
+            tuple: (ORDER BY/LIMIT 子句, 参数列表)
+        """
+        query = " ORDER BY t.date DESC, t.transaction_id DESC"
+        params = []
+        
+        if limit is not None or offset:
+            query += " LIMIT ?"
+            params.append(limit if limit is not None else -1)
+        
+        if offset:
+            query += " OFFSET ?"
+            params.append(offset)
+        
+        return query, params
+
+    @staticmethod
+    def iter_transactions(user_id, start_date=None, end_date=None, transaction_type=None,
+                          category_id=None, min_amount=None, max_amount=None,
+                          limit=None, offset=None, after_date=None, after_id=None,
+                          with_category=False, batch_size=500):
+        """按条件流式读取交易记录
+
+        通过游标每次 fetchmany 一批，由 row_factory 直接构造只读记录，内存占用与交易总数无关。
+        迭代期间占用一个数据库连接，迭代结束或生成器关闭时归还。
+        查询失败时异常直接抛出。
+
+        Args:
+            user_id 至 after_id: 同 get_transactions_by_user
+            with_category: 是否关联分类，为True时记录带 category_name 和 category_icon
+            batch_size: 每批读取的行数
+
+        Yields:
+            TransactionRecord: 只读交易记录，按日期倒序
+        """
+        where, params = Transaction._build_filters(
+            user_id, start_date, end_date, transaction_type, category_id, min_amount, max_amount,
+            after_date, after_id
+        )
+        page, page_params = Transaction._build_page(limit, offset)
+        if with_category:
+            query = ("SELECT t.transaction_id, t.amount, t.type, t.category_id, t.date, t.note, t.user_id, "
+                     "c.name, c.icon "
+                     "FROM transactions t LEFT JOIN categories c ON t.category_id = c.category_id"
+                     + where + page)
+        else:
+            query = ("SELECT t.transaction_id, t.amount, t.type, t.category_id, t.date, t.note, t.user_id, "
+                     "NULL, NULL "
+                     "FROM transactions t" + where + page)
+        
+        rows = db_manager.iter_query(query, params + page_params, batch_size=batch_size,
+                                     row_factory=_transaction_row)
+        try:
+            yield from rows
+        finally:
+            rows.close()
+
     @staticmethod
     def get_transactions_by_user(user_id, start_date=None, end_date=None, transaction_type=None,
-                                category_id=None, min_amount=None, max_amount=None):
+                                category_id=None, min_amount=None, max_amount=None,
+                                limit=None, offset=None, after_date=None, after_id=None):
         """根据条件查询交易记录
         
         Args:
@@ -162,76 +448,62 @@ class Transaction:
             category_id: 分类ID
             min_amount: 最小金额
             max_amount: 最大金额
+            limit: 最多返回的条数，None表示不限
+            offset: 跳过的条数
+            after_date: 游标分页，上一页最后一条记录的日期
+            after_id: 游标分页，上一页最后一条记录的交易ID
         
         Returns:
-            list: 交易记录列表
+            list: TransactionRecord 列表，按日期倒序
         """
         try:
-            # 构建查询条件
-            query = "SELECT * FROM transactions WHERE user_id = ?"
-            params = [user_id]
-            
-            if start_date:
-                query += " AND date >= ?"
-                params.append(start_date)
-            
-            if end_date:
-                query += " AND date <= ?"
-                params.append(end_date)
-            
-            if transaction_type:
-                query += " AND type = ?"
-                params.append(transaction_type)
-            
-            if category_id:
-                query += " AND category_id = ?"
-                params.append(category_id)
-            
-            if min_amount is not None:
-                query += " AND amount >= ?"
-                params.append(min_amount)
-            
-            if max_amount is not None:
-                query += " AND amount <= ?"
-                params.append(max_amount)
-            
-            query += " ORDER BY date DESC"
-            
-            transactions_data = db_manager.execute_query(query, params)
-            
-            transactions = []
-            for data in transactions_data:
-                transaction = Transaction(
-                    transaction_id=data[0],
-                    amount=data[1],
-                    type=data[2],
-                    category_id=data[3],
-                    date=data[4],
-                    note=data[5],
-                    user_id=data[6]
-                )
-                transactions.append(transaction)
-            
-            return transactions
+            return list(Transaction.iter_transactions(
+                user_id, start_date, end_date, transaction_type, category_id, min_amount, max_amount,
+                limit, offset, after_date, after_id
+            ))
+        except Exception as e:
+            print(f"查询交易记录失败: {e}")
+            return []
+
+    @staticmethod
+    def get_transactions_with_category(user_id, start_date=None, end_date=None, transaction_type=None,
+                                       category_id=None, min_amount=None, max_amount=None,
+                                       limit=None, offset=None, after_date=None, after_id=None):
+        """根据条件查询交易记录，并在同一条查询中关联分类名称和图标
+        
+        参数与 get_transactions_by_user 相同。分类不存在时 category_name 为None。
+        
+        Returns:
+            list: TransactionRecord 列表，带 category_name 和 category_icon
+        """
+        try:
+            return list(Transaction.iter_transactions(
+                user_id, start_date, end_date, transaction_type, category_id, min_amount, max_amount,
+                limit, offset, after_date, after_id, with_category=True
+            ))
         except Exception as e:
             print(f"查询交易记录失败: {e}")
             return []
 
     @staticmethod
-    def get_transaction_by_id(transaction_id):
+    def get_transaction_by_id(transaction_id, user_id=None):
         """根据ID获取交易记录
         
         Args:
             transaction_id: 交易记录ID
+            user_id: 用户ID，指定时只返回该用户的记录
         
         Returns:
             Transaction: 交易记录对象
         """
         try:
-            transaction_data = db_manager.execute_query(
-                "SELECT * FROM transactions WHERE transaction_id = ?",
-                (transaction_id,)
-            )
+            query = ("SELECT transaction_id, amount, type, category_id, date, note, user_id "
+                     "FROM transactions WHERE transaction_id = ?")
+            params = (transaction_id,)
+            if user_id is not None:
+                query += " AND user_id = ?"
+                params += (user_id,)
+            transaction_data = db_manager.execute_query(query, params)
             
             if not transaction_data:
                 return None
@@ -239,7 +511,7 @@ class Transaction:
             data = transaction_data[0]
             return Transaction(
                 transaction_id=data[0],
-                amount=data[1],
+                amount=from_cents(data[1]),
                 type=data[2],
                 category_id=data[3],
                 date=data[4],
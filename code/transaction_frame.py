@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式交易数据模块
+把用户的交易一次性载入 NumPy 数组，趋势、累计余额、分类占比等多年分析
+都在内存中向量化计算，不再为每个视图单独查询。
+
+依赖可选的 numpy，未安装时导入本模块不会出错，载入数据时才会提示安装。
+"""
+from database import db_manager
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于运行环境
+    np = None
+
+
+def _require_numpy():
+    """检查 numpy 是否可用"""
+    if np is None:
+        raise RuntimeError("列式分析需要安装 numpy：pip install numpy")
+
+
+class TransactionFrame:
+    """列式交易数据
+
+    各列长度相同，按日期升序排列：
+        amounts: int64，金额（分），始终为正
+        dates: datetime64[s]，交易时间
+        category_codes: int32，分类编码，对应 categories 中的分类ID
+        is_income: bool，收入为True，支出为False
+    """
+
+    def __init__(self, amounts, dates, category_codes, categories, is_income):
+        """初始化列式数据，通常通过 TransactionFrame.load 创建"""
+        _require_numpy()
+        self.amounts = amounts
+        self.dates = dates
+        self.category_codes = category_codes
+        self.categories = categories
+        self.is_income = is_income
+
+    @classmethod
+    def load(cls, user_id, start_date=None, end_date=None, batch_size=10000):
+        """载入用户的交易记录
+
+        按批读取后直接转换为数组，不构造逐条的交易对象。
+
+        Args:
+            user_id: 用户ID
+            start_date: 开始日期（含）
+            end_date: 结束日期（不含）
+            batch_size: 每批读取的行数
+
+        Returns:
+            TransactionFrame: 列式数据
+        """
+        _require_numpy()
+        query = '''SELECT amount, date, category_id, type = '收入'
+            FROM transactions WHERE user_id = ?'''
+        params = [user_id]
+        if start_date:
+            query += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND date < ?"
+            params.append(end_date)
+        query += " ORDER BY date, transaction_id"
+
+        amounts, dates, category_ids, is_income = [], [], [], []
+        for row in db_manager.iter_query(query, params, batch_size=batch_size):
+            amounts.append(row[0])
+            dates.append(row[1])
+            category_ids.append(row[2] or '')
+            is_income.append(row[3])
+
+        categories, codes = np.unique(np.array(category_ids, dtype=str), return_inverse=True)
+        return cls(
+            amounts=np.array(amounts, dtype=np.int64),
+            dates=np.array(dates, dtype='datetime64[s]'),
+            category_codes=codes.astype(np.int32).reshape(-1),
+            categories=categories,
+            is_income=np.array(is_income, dtype=bool),
+        )
+
+    def __len__(self):
+        """交易条数"""
+        return len(self.amounts)
+
+    @property
+    def signed_amounts(self):
+        """带符号金额（分），收入为正、支出为负"""
+        return np.where(self.is_income, self.amounts, -self.amounts)
+
+    def _group(self, keys):
+        """按给定键分组汇总收入和支出
+
+        数据已按日期排序，日/月键同样有序，只需找出键变化的位置再分段求和，无需再排序。
+
+        Returns:
+            tuple: (分组键, 收入合计, 支出合计)，金额单位为分
+        """
+        if not len(self):
+            return keys, np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        income = np.add.reduceat(np.where(self.is_income, self.amounts, 0), starts)
+        expense = np.add.reduceat(np.where(self.is_income, 0, self.amounts), starts)
+        return keys[starts], income, expense
+
+    def group_by_day(self):
+        """按日汇总
+
+        Returns:
+            tuple: (日期 datetime64[D], 收入合计, 支出合计)，只包含有交易的日期
+        """
+        return self._group(self.dates.astype('datetime64[D]'))
+
+    def group_by_month(self):
+        """按月汇总
+
+        Returns:
+            tuple: (月份 datetime64[M], 收入合计, 支出合计)
+        """
+        return self._group(self.dates.astype('datetime64[M]'))
+
+    def group_by_category(self, income=False):
+        """按分类汇总某一类型的金额
+
+        Args:
+            income: True 汇总收入，False 汇总支出
+
+        Returns:
+            tuple: (分类ID数组, 金额合计, 占该类型总额的比例)，按金额降序
+        """
+        mask = self.is_income if income else ~self.is_income
+        # bincount 的 weights 会转成 float64，大额累加可能丢失分位，直接按整数分累加
+        totals = np.zeros(len(self.categories), dtype=np.int64)
+        np.add.at(totals, self.category_codes[mask], self.amounts[mask])
+        present = np.nonzero(totals)[0]
+        order = present[np.argsort(-totals[present], kind='stable')]
+        grand_total = totals.sum()
+        shares = totals[order] / grand_total if grand_total else np.zeros(len(order))
+        return self.categories[order], totals[order], shares
+
+    def cumulative_balance(self):
+        """逐笔累计余额
+
+        Returns:
+            tuple: (交易时间, 截至该笔交易的余额)，金额单位为分
+        """
+        return self.dates, np.cumsum(self.signed_amounts)
+
+    def daily_series(self, income=False):
+        """连续的按日序列，没有交易的日期补零
+
+        Args:
+            income: True 为收入序列，False 为支出序列
+
+        Returns:
+            tuple: (日期 datetime64[D], 每日金额)
+        """
+        if not len(self):
+            return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64)
+        days = self.dates.astype('datetime64[D]')
+        offsets = (days - days[0]).astype(np.int64)
+        mask = self.is_income if income else ~self.is_income
+        totals = np.zeros(int(offsets[-1]) + 1, dtype=np.int64)
+        np.add.at(totals, offsets[mask], self.amounts[mask])
+        return days[0] + np.arange(len(totals)), totals
+
+    def rolling_sum(self, window, income=False):
+        """按日滚动求和，例如近30天支出
+
+        Args:
+            window: 窗口天数
+            income: True 为收入，False 为支出
+
+        Returns:
+            tuple: (日期 datetime64[D], 截至当日（含）的窗口内合计)
+        """
+        days, totals = self.daily_series(income)
+        cumulative = np.concatenate(([0], np.cumsum(totals)))
+        start = np.maximum(np.arange(1, len(totals) + 1) - window, 0)
+        return days, cumulative[1:] - cumulative[start]
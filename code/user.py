@@ -7,13 +7,15 @@
 import hashlib
 import uuid
 from database import db_manager
+from period import period_range
+from money import to_cents, from_cents
 
 
 class User:
     """用户类，负责用户信息管理和身份验证"""
 
     def __init__(self, user_id=None, username=None, password=None, monthly_budget=0):
-        """初始化用户对象"""
+        """初始化用户对象，月度预算单位为元"""
         self.user_id = user_id
         self.username = username
         self.password = password  # 存储加密后的密码
@@ -49,7 +51,7 @@ class User:
             db_manager.execute_query(
                 '''INSERT INTO users (user_id, username, password, monthly_budget) 
                 VALUES (?, ?, ?, ?)''',
-                (self.user_id, self.username, hashed_password, self.monthly_budget),
+                (self.user_id, self.username, hashed_password, to_cents(self.monthly_budget or 0)),
                 commit=True
             )
             
@@ -81,7 +83,7 @@ class User:
             
             # 更新用户对象信息
             self.user_id = stored_user_id
-            self.monthly_budget = stored_budget
+            self.monthly_budget = from_cents(stored_budget)
             
             return True
         except Exception as e:
@@ -92,13 +94,14 @@ class User:
         """设置月度预算
         
         Args:
-            budget_amount: 预算金额
+            budget_amount: 预算金额（元）
         """
         try:
-            self.monthly_budget = budget_amount
+            cents = to_cents(budget_amount)
+            self.monthly_budget = from_cents(cents)
             db_manager.execute_query(
                 "UPDATE users SET monthly_budget = ? WHERE user_id = ?",
-                (budget_amount, self.user_id),
+                (cents, self.user_id),
                 commit=True
             )
             return True
@@ -122,10 +125,11 @@ class User:
                 month = datetime.now().strftime('%Y-%m')
             
             # 查询该月总支出
+            start, end = period_range(month)
             total_expense = db_manager.execute_query(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                WHERE user_id = ? AND type = '支出' AND date LIKE ?''',
-                (self.user_id, f"{month}%"),
+                '''SELECT COALESCE(SUM(total), 0) FROM daily_rollups 
+                WHERE user_id = ? AND type = '支出' AND day >= ? AND day < ?''',
+                (self.user_id, start, end),
             )[0][0]
             
             # 先检查是否有月度预算设置
@@ -134,10 +138,11 @@ class User:
                 (self.user_id, month)
             )
             
+            # 金额均以整数分比较
             if budget_data:
                 budget_amount = budget_data[0][0]
             else:
-                budget_amount = self.monthly_budget
+                budget_amount = to_cents(self.monthly_budget or 0)
             
             return total_expense > budget_amount
         except Exception as e:
@@ -164,7 +169,7 @@ class User:
                 return None
             
             user_id, username, monthly_budget = user_data[0]
-            return User(user_id=user_id, username=username, monthly_budget=monthly_budget)
+            return User(user_id=user_id, username=username, monthly_budget=from_cents(monthly_budget))
         except Exception as e:
             print(f"获取用户信息失败: {e}")
             return None
\ No newline at end of file